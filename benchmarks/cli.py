@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Measure the latency of khard processes like mail and phone clients start
+them.
+
+Every command line is run in a new python interpreter against generated
+address books (see benchmarks.corpus).  "Cold" runs start with an empty
+cache directory, so the config and all vcard files are parsed, "warm" runs
+reuse the cache of an earlier run.  The page cache of the operating system
+is not dropped, so the vcard files are read from memory in both cases.
+
+For every run the wall time of the process, the time to import khard.khard
+and the maximum resident set size of the process are recorded.  The median
+of the runs is written as JSON and can be checked against a baseline:
+
+    python -m benchmarks.cli -o baseline.json
+    python -m benchmarks.cli --baseline baseline.json --threshold 15
+
+The exit status is 1 if a time or the RSS grew by more than the threshold.
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import khard
+from khard import helpers
+from khard.version import khard_version
+
+from . import corpus
+
+
+# The command lines to measure, "{uid}" is replaced by the uid of a contact.
+COMMANDS = (("email --parsable", ["email", "--parsable", "miller"]),
+            ("phone --parsable", ["phone", "--parsable", "1234"]),
+            ("list", ["list"]),
+            ("birthdays", ["birthdays"]),
+            ("details --uid", ["details", "--uid", "{uid}"]))
+
+# The script that runs khard in the new interpreter.  The measurements are
+# written to the file given as the first argument.
+_DRIVER = """
+import json, resource, sys, time
+start = time.perf_counter()
+from khard import khard
+imported = time.perf_counter()
+status = 0
+try:
+    khard.main(sys.argv[2:])
+except SystemExit as err:
+    status = err.code if isinstance(err.code, int) else int(bool(err.code))
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+with open(sys.argv[1], "w") as fh:
+    json.dump({"import": imported - start, "status": status,
+               "rss": rss if sys.platform == "darwin" else rss * 1024}, fh)
+"""
+
+# the measurements that are compared to the baseline
+METRICS = ("wall", "import", "rss")
+
+
+def run_khard(argv, environment):
+    """Run khard in a new python interpreter.
+
+    The output of khard is discarded.
+
+    :param argv: the command line arguments for khard
+    :type argv: list(str)
+    :param environment: the environment of the process
+    :type environment: dict(str, str)
+    :returns: the wall time and import time in seconds, the maximum RSS in
+        bytes and the exit status of khard
+    :rtype: dict
+    """
+    with tempfile.NamedTemporaryFile("r", suffix=".json") as result:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", _DRIVER, result.name] + argv,
+                       env=environment, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, check=True)
+        wall = time.perf_counter() - start
+        measurements = json.load(result)
+    measurements["wall"] = wall
+    return measurements
+
+
+def summarize(runs):
+    """Combine the measurements of several runs.
+
+    :param runs: the measurements as returned by run_khard()
+    :type runs: list(dict)
+    :returns: the median of each metric and the exit status of the last run
+    :rtype: dict
+    """
+    summary = {metric: statistics.median(run[metric] for run in runs)
+               for metric in METRICS}
+    summary["runs"] = len(runs)
+    summary["status"] = runs[-1]["status"]
+    return summary
+
+
+class Runner:
+    """Run the khard command lines against one corpus in an isolated
+    environment."""
+
+    def __init__(self, directory, config_file):
+        """
+        :param directory: a directory for the caches of the runs
+        :type directory: str
+        :param config_file: the khard config file for the corpus
+        :type config_file: str
+        """
+        self._directory = directory
+        self._cold_runs = 0
+        self.environment = dict(os.environ, KHARD_CONFIG=config_file)
+        # khard is imported from the same place as in this process
+        source = os.path.dirname(os.path.dirname(os.path.abspath(
+            khard.__file__)))
+        self.environment["PYTHONPATH"] = os.pathsep.join(
+            [source] + [path for path in
+                        [os.environ.get("PYTHONPATH")] if path])
+        # a running daemon would answer the commands
+        self.environment["XDG_RUNTIME_DIR"] = directory
+
+    def _cache_dir(self, name):
+        path = os.path.join(self._directory, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def cold(self, argv, repeat):
+        """Run a command line with empty caches.
+
+        :param argv: the command line arguments for khard
+        :type argv: list(str)
+        :param repeat: the number of runs
+        :type repeat: int
+        :returns: the summary of the runs
+        :rtype: dict
+        """
+        runs = []
+        for _ in range(repeat):
+            self._cold_runs += 1
+            environment = dict(self.environment, XDG_CACHE_HOME=self._cache_dir(
+                "cold-{}".format(self._cold_runs)))
+            runs.append(run_khard(argv, environment))
+        return summarize(runs)
+
+    def warm(self, argv, repeat):
+        """Run a command line with the caches filled by an earlier run.
+
+        :param argv: the command line arguments for khard
+        :type argv: list(str)
+        :param repeat: the number of runs
+        :type repeat: int
+        :returns: the summary of the runs
+        :rtype: dict
+        """
+        environment = dict(self.environment,
+                           XDG_CACHE_HOME=self._cache_dir("warm"))
+        # fill the caches
+        run_khard(argv, environment)
+        return summarize([run_khard(argv, environment)
+                          for _ in range(repeat)])
+
+
+def find_regressions(baseline, results, threshold):
+    """Compare the results to a baseline.
+
+    :param baseline: the results of an earlier run
+    :type baseline: dict
+    :param results: the current results
+    :type results: dict
+    :param threshold: the allowed growth of each metric in percent
+    :type threshold: float
+    :returns: the table rows of the comparison and whether any metric grew
+        by more than the threshold
+    :rtype: tuple(list(list(str)), bool)
+    """
+    rows = [["Size", "Command", "Phase", "Metric", "Baseline", "Now",
+             "Change", ""]]
+    regression = False
+    for size, commands in results["results"].items():
+        for command, phases in commands.items():
+            for phase, summary in phases.items():
+                try:
+                    old = baseline["results"][size][command][phase]
+                except KeyError:
+                    continue
+                for metric in METRICS:
+                    before, after = old[metric], summary[metric]
+                    change = (after / before - 1) * 100 if before else 0
+                    failed = change > threshold
+                    regression = regression or failed
+                    rows.append([size, command, phase, metric,
+                                 _format(metric, before),
+                                 _format(metric, after),
+                                 "{:+.1f} %".format(change),
+                                 "REGRESSION" if failed else ""])
+    return rows, regression
+
+
+def _format(metric, value):
+    if metric == "rss":
+        return "{:.1f} MiB".format(value / 2**20)
+    return "{:.1f} ms".format(value * 1000)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Measure the latency of khard subcommands in new "
+        "processes.")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="write the results as JSON to this file")
+    parser.add_argument("--baseline", metavar="FILE",
+                        type=argparse.FileType(),
+                        help="compare the results to an earlier run")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="the growth in percent of a time or the RSS "
+                        "compared to the baseline that is reported as a "
+                        "regression (default: 10)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                        help="the numbers of contacts to generate "
+                        "(default: 1000 10000)")
+    parser.add_argument("--cold-runs", type=int, default=3,
+                        help="runs with empty caches (default: 3)")
+    parser.add_argument("--warm-runs", type=int, default=5,
+                        help="runs with filled caches (default: 5)")
+    parser.add_argument("--only", metavar="COMMAND", action="append",
+                        choices=[name for name, _ in COMMANDS],
+                        help="only run this command, can be given several "
+                        "times")
+    parser.add_argument("--set", metavar="OPTION=VALUE", action="append",
+                        default=[],
+                        help="set an option of the vcard section of the khard"
+                        " config, like cache=no or parse_workers=1")
+    parser.add_argument("--corpus-dir", metavar="DIR",
+                        help="keep the generated corpora in this directory to "
+                        "reuse them in the next run")
+    corpus.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.cold_runs < 1 or args.warm_runs < 1:
+        parser.error("--cold-runs and --warm-runs must be at least 1")
+    try:
+        args.set = dict(option.split("=", 1) for option in args.set)
+    except ValueError:
+        parser.error("--set needs OPTION=VALUE")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    corpus_options = corpus.corpus_options(args)
+    output = {"khard": khard_version,
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "date": datetime.datetime.now().isoformat(timespec="seconds"),
+              "corpus": corpus_options,
+              "options": {"cold_runs": args.cold_runs,
+                          "warm_runs": args.warm_runs, "vcard": args.set},
+              "results": {}}
+    with contextlib.ExitStack() as stack:
+        corpus_dir = args.corpus_dir or stack.enter_context(
+            tempfile.TemporaryDirectory(prefix="khard-corpus-"))
+        for size in args.sizes:
+            path = os.path.join(corpus_dir, str(size))
+            print("Generating {} contacts in {}".format(size, path),
+                  file=sys.stderr)
+            corpus.generate(path, size, **corpus_options)
+            uid = next(uid for uid, _, broken in
+                       corpus.cards(size, **corpus_options) if not broken)
+            with tempfile.TemporaryDirectory(prefix="khard-cli-") as tmp:
+                config_file = os.path.join(tmp, "khard.conf")
+                corpus.write_config(config_file, {"corpus": path}, **args.set)
+                runner = Runner(tmp, config_file)
+                results = output["results"][str(size)] = {}
+                for name, argv in COMMANDS:
+                    if args.only and name not in args.only:
+                        continue
+                    argv = [arg.format(uid=uid) for arg in argv]
+                    results[name] = {
+                        "cold": runner.cold(argv, args.cold_runs),
+                        "warm": runner.warm(argv, args.warm_runs)}
+                    print("{:>7} {:<18} cold {:>9.1f} ms  warm {:>9.1f} ms"
+                          .format(size, name,
+                                  results[name]["cold"]["wall"] * 1000,
+                                  results[name]["warm"]["wall"] * 1000),
+                          file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(output, fh, indent=2)
+    if args.baseline:
+        rows, regression = find_regressions(json.load(args.baseline), output,
+                                            args.threshold)
+        print(helpers.pretty_print(rows))
+        if regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
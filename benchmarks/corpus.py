@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""Generate synthetic vdir address books to measure khard with.
+
+The generated contacts only depend on the given parameters and the seed, so
+the same corpus can be generated again on another machine to compare
+results.  Run "python -m benchmarks.corpus --help" for the options.
+"""
+
+import argparse
+import json
+import os
+import random
+import uuid
+
+
+# Increase this whenever the generated cards change.
+VERSION = 1
+
+_FIRST_NAMES = ("Alice", "Bob", "Carol", "David", "Emma", "Frank", "Grace",
+                "Henry", "Irene", "Jack", "Karen", "Liam", "Mia", "Noah",
+                "Olivia", "Paul", "Quinn", "Rachel", "Sam", "Tina")
+_LAST_NAMES = ("Smith", "Miller", "Jones", "Brown", "Wilson", "Taylor",
+               "Clark", "Walker", "Young", "Hall", "Allen", "King", "Wright",
+               "Scott", "Green", "Baker", "Adams", "Nelson", "Hill", "Moore")
+# names with accents, other scripts and wide characters
+_NON_ASCII_FIRST_NAMES = ("Jürgen", "Zoë", "Łukasz", "Søren", "José",
+                          "Ольга", "Ἀλέξανδρος", "太郎", "지민", "Ngọc")
+_NON_ASCII_LAST_NAMES = ("Müller", "Brontë", "Wałęsa", "Ørsted", "Núñez",
+                         "Иванова", "Παπαδόπουλος", "山田", "김", "Nguyễn")
+_ORGANISATIONS = ("Acme", "Globex", "Initech", "Umbrella", "Hooli",
+                  "Stark Industries", "Wayne Enterprises", "Cyberdyne")
+_TITLES = ("Engineer", "Manager", "Director", "Consultant", "Researcher")
+_CITIES = (("Berlin", "10115", "Germany"), ("Paris", "75001", "France"),
+           ("London", "SW1A 1AA", "United Kingdom"),
+           ("New York", "10001", "USA"), ("Tokyo", "100-0001", "Japan"))
+_PHONE_TYPES = ("cell", "home", "work", "work,voice", "fax")
+_EMAIL_TYPES = ("home", "work", "internet")
+_ADDRESS_TYPES = ("home", "work")
+_LABELS = ("custom", "private line", "assistant", "holiday home")
+
+
+def _version(rng, v4_ratio):
+    return "4.0" if rng.random() < v4_ratio else "3.0"
+
+
+def _birthday(rng, version):
+    month, day = rng.randint(1, 12), rng.randint(1, 28)
+    if rng.random() < 0.1:
+        # without a year, vCard 3.0 only has a text value for that
+        if version == "4.0":
+            return "BDAY:--%02d%02d" % (month, day)
+        return "BDAY;VALUE=text:%02d.%02d." % (day, month)
+    return "BDAY:%04d-%02d-%02d" % (rng.randint(1930, 2010), month, day)
+
+
+def _typed_property(rng, number, name, email, city):
+    """Create the nth phone number, email address or post address of a card.
+
+    :returns: the property
+    :rtype: str
+    """
+    kind = number % 3
+    if kind == 0:
+        type = rng.choice(_PHONE_TYPES)
+        return "TEL;TYPE={}:+{} {} {}".format(
+            type, rng.randint(1, 99), rng.randint(10, 999),
+            rng.randint(100000, 9999999))
+    if kind == 1:
+        type = rng.choice(_EMAIL_TYPES)
+        local, domain = email.split("@")
+        if number > 1:
+            local += str(number)
+        return "EMAIL;TYPE={}:{}@{}".format(type, local, domain)
+    type = rng.choice(_ADDRESS_TYPES)
+    city, code, country = city
+    return "ADR;TYPE={}:;;{} Street {};{};;{};{}".format(
+        type, name, rng.randint(1, 200), city, code, country)
+
+
+def generate_card(rng, index, properties=6, v4_ratio=0.5, label_ratio=0.2,
+                  non_ascii_ratio=0.1):
+    """Generate the text of one vCard.
+
+    :param rng: the source of randomness
+    :type rng: random.Random
+    :param index: the number of the card in the corpus, it makes email
+        addresses unique
+    :type index: int
+    :param properties: the number of phone numbers, email addresses and post
+        addresses of the card
+    :type properties: int
+    :param v4_ratio: the share of vCard 4.0 cards, the rest is 3.0
+    :type v4_ratio: float
+    :param label_ratio: the share of typed properties that have a custom
+        label in an X-ABLABEL group
+    :type label_ratio: float
+    :param non_ascii_ratio: the share of cards with non ascii names
+    :type non_ascii_ratio: float
+    :returns: the uid and the text of the card
+    :rtype: tuple(str, str)
+    """
+    version = _version(rng, v4_ratio)
+    uid = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    if rng.random() < non_ascii_ratio:
+        first = rng.choice(_NON_ASCII_FIRST_NAMES)
+        last = rng.choice(_NON_ASCII_LAST_NAMES)
+    else:
+        first = rng.choice(_FIRST_NAMES)
+        last = rng.choice(_LAST_NAMES)
+    organisation = rng.choice(_ORGANISATIONS)
+    email = "contact{}@{}.example.org".format(
+        index, organisation.split()[0].lower())
+    city = rng.choice(_CITIES)
+    lines = ["BEGIN:VCARD", "VERSION:" + version, "UID:" + uid,
+             "N:{};{};;;".format(last, first), "FN:{} {}".format(first, last)]
+    if rng.random() < 0.3:
+        lines.append("NICKNAME:" + first[:3])
+    lines.append("ORG:" + organisation)
+    lines.append("TITLE:" + rng.choice(_TITLES))
+    group = 0
+    for number in range(properties):
+        line = _typed_property(rng, number, last, email, city)
+        if rng.random() < label_ratio:
+            # the label replaces the type
+            group += 1
+            name, value = line.split(";", 1)[0], line.split(":", 1)[1]
+            lines.append("item{}.{}:{}".format(group, name, value))
+            lines.append("item{}.X-ABLABEL:{}".format(group,
+                                                     rng.choice(_LABELS)))
+        else:
+            lines.append(line)
+    if rng.random() < 0.7:
+        lines.append(_birthday(rng, version))
+    if rng.random() < 0.2:
+        lines.append("NOTE:Met at the conference in {}.".format(city[0]))
+    lines.append("END:VCARD")
+    return uid, "\r\n".join(lines) + "\r\n"
+
+
+def break_card(rng, text):
+    """Damage a card so that it can not be parsed.
+
+    :param rng: the source of randomness
+    :type rng: random.Random
+    :param text: the text of a valid card
+    :type text: str
+    :returns: the damaged card
+    :rtype: str
+    """
+    if rng.random() < 0.5:
+        # truncated, for example by a failed sync
+        return text[:len(text) // 2]
+    # a line that is not a property
+    lines = text.split("\r\n")
+    lines.insert(3, "this is not a property")
+    return "\r\n".join(lines)
+
+
+def cards(count, seed=0, properties=6, v4_ratio=0.5, label_ratio=0.2,
+          non_ascii_ratio=0.1, broken_ratio=0.001):
+    """Generate the cards of a corpus.
+
+    The parameters are the same as for generate().
+
+    :returns: the uid and the text of each card and whether it is broken
+    :rtype: generator(tuple(str, str, bool))
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        uid, text = generate_card(rng, index, properties, v4_ratio,
+                                  label_ratio, non_ascii_ratio)
+        broken = rng.random() < broken_ratio
+        if broken:
+            text = break_card(rng, text)
+        yield uid, text, broken
+
+
+def generate(path, count, seed=0, properties=6, v4_ratio=0.5,
+             label_ratio=0.2, non_ascii_ratio=0.1, broken_ratio=0.001):
+    """Generate a vdir with synthetic contacts.
+
+    A file corpus.json with the parameters is written next to the cards.  If
+    it already exists with the same parameters the corpus is not generated
+    again.
+
+    :param path: the directory to write the vcard files to, it is created if
+        needed
+    :type path: str
+    :param count: the number of vcard files
+    :type count: int
+    :param seed: the seed for the random generator
+    :type seed: int
+    :param properties: see generate_card()
+    :type properties: int
+    :param v4_ratio: see generate_card()
+    :type v4_ratio: float
+    :param label_ratio: see generate_card()
+    :type label_ratio: float
+    :param non_ascii_ratio: see generate_card()
+    :type non_ascii_ratio: float
+    :param broken_ratio: the share of cards that can not be parsed
+    :type broken_ratio: float
+    :returns: the parameters of the corpus
+    :rtype: dict
+    """
+    parameters = {"version": VERSION, "count": count, "seed": seed,
+                  "properties": properties, "v4_ratio": v4_ratio,
+                  "label_ratio": label_ratio,
+                  "non_ascii_ratio": non_ascii_ratio,
+                  "broken_ratio": broken_ratio}
+    manifest = os.path.join(path, "corpus.json")
+    try:
+        with open(manifest) as fh:
+            if json.load(fh) == parameters:
+                return parameters
+    except (OSError, ValueError):
+        pass
+    os.makedirs(path, exist_ok=True)
+    for entry in os.scandir(path):
+        if entry.name.endswith(".vcf"):
+            os.remove(entry.path)
+    for uid, text, _ in cards(count, seed, properties, v4_ratio,
+                              label_ratio, non_ascii_ratio, broken_ratio):
+        with open(os.path.join(path, uid + ".vcf"), "w", encoding="utf-8",
+                  newline="") as fh:
+            fh.write(text)
+    with open(manifest, "w") as fh:
+        json.dump(parameters, fh, indent=2)
+    return parameters
+
+
+def write_config(filename, address_books, **options):
+    """Write a khard config file for generated address books.
+
+    Unparsable cards are skipped so that the broken cards of a corpus do not
+    stop khard.
+
+    :param filename: the path of the config file
+    :type filename: str
+    :param address_books: the paths of the address books by name
+    :type address_books: dict(str, str)
+    :param options: further options for the vcard section
+    :type options: str
+    :returns: None
+    """
+    options = dict({"skip_unparsable": "yes"}, **options)
+    lines = ["[general]", "editor = /bin/true", "merge_editor = /bin/true",
+             "[vcard]"]
+    lines += ["{} = {}".format(key, value) for key, value in options.items()]
+    lines.append("[addressbooks]")
+    for name, path in address_books.items():
+        lines += ["[[{}]]".format(name), "path = " + os.path.abspath(path)]
+    with open(filename, "w") as fh:
+        fh.write("\n".join(lines) + "\n")
+
+
+def add_arguments(parser):
+    """Add the options of the corpus generator to an argument parser.
+
+    :param parser: the parser to add the options to
+    :type parser: argparse.ArgumentParser
+    :returns: None
+    """
+    group = parser.add_argument_group("corpus options")
+    group.add_argument("--seed", type=int, default=0,
+                       help="seed for the random generator (default: 0)")
+    group.add_argument("--properties", type=int, default=6,
+                       help="phone numbers, email and post addresses per card"
+                       " (default: 6)")
+    group.add_argument("--v4-ratio", type=float, default=0.5,
+                       help="share of vCard 4.0 cards (default: 0.5)")
+    group.add_argument("--label-ratio", type=float, default=0.2,
+                       help="share of properties with an X-ABLABEL "
+                       "(default: 0.2)")
+    group.add_argument("--non-ascii-ratio", type=float, default=0.1,
+                       help="share of cards with non ascii names "
+                       "(default: 0.1)")
+    group.add_argument("--broken-ratio", type=float, default=0.001,
+                       help="share of unparsable cards (default: 0.001)")
+
+
+def corpus_options(args):
+    """Extract the options of the corpus generator from parsed arguments.
+
+    :param args: the arguments parsed by a parser set up with add_arguments()
+    :type args: argparse.Namespace
+    :returns: keyword arguments for generate()
+    :rtype: dict
+    """
+    return {"seed": args.seed, "properties": args.properties,
+            "v4_ratio": args.v4_ratio, "label_ratio": args.label_ratio,
+            "non_ascii_ratio": args.non_ascii_ratio,
+            "broken_ratio": args.broken_ratio}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a vdir address book with synthetic contacts.")
+    parser.add_argument("path", help="the directory for the vcard files")
+    parser.add_argument("-n", "--count", type=int, default=1000,
+                        help="number of contacts (default: 1000)")
+    parser.add_argument("--config", metavar="FILE",
+                        help="also write a khard config file for the corpus")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    generate(args.path, args.count, **corpus_options(args))
+    if args.config:
+        write_config(args.config, {"corpus": args.path})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""Measure the time and memory of the expensive parts of khard.
+
+For every corpus size a synthetic address book is generated (see
+benchmarks.corpus) and the benchmarks are run against it.  The results are
+written as JSON and can be compared to the results of an earlier run:
+
+    python -m benchmarks.run -o new.json --compare old.json
+
+Each benchmark is run on a freshly loaded address book first ("first") and
+then repeated ("best" is the fastest repetition).  Properties of contacts
+that khard memoizes are only computed in the first run, so "first" is the
+time a single khard invocation needs.  The peak memory is measured with
+tracemalloc in a separate pass on another freshly loaded address book.
+"""
+
+import argparse
+import contextlib
+import datetime
+import functools
+import gc
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from khard import helpers
+from khard import khard
+from khard import query
+from khard.address_book import VdirAddressBook
+from khard.config import Config
+from khard.version import khard_version
+
+from . import corpus
+
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark.
+
+    The decorated function gets the State of the benchmark run and returns
+    the function to measure.
+
+    :param name: the name of the benchmark in the results
+    :type name: str
+    :returns: the decorator
+    :rtype: callable
+    """
+    def decorator(function):
+        BENCHMARKS.append((name, function))
+        return function
+    return decorator
+
+
+class State:
+    """The address book and settings the benchmarks work on."""
+
+    def __init__(self, path, config_file, workers=1, io_threads=0):
+        self.path = path
+        self.config_file = config_file
+        self.workers = workers
+        self.io_threads = io_threads
+        self._book = None
+
+    def new_book(self):
+        """Create a new address book for the corpus without loading it.
+
+        :returns: the address book
+        :rtype: address_book.VdirAddressBook
+        """
+        return VdirAddressBook("corpus", self.path, skip=True,
+                               workers=self.workers,
+                               io_threads=self.io_threads)
+
+    @property
+    def book(self):
+        """The loaded address book, it is shared by the benchmarks."""
+        if self._book is None:
+            self._book = self.new_book()
+            self._book.load()
+        return self._book
+
+    @property
+    def contacts(self):
+        """The contacts of the address book sorted like khard lists them."""
+        return khard.sort_contacts(list(self.book.contacts.values()))
+
+    def reset(self):
+        """Forget the loaded address book."""
+        self._book = None
+
+
+@benchmark("load")
+def _load(state):
+    def run():
+        state.new_book().load()
+    return run
+
+
+def _search(state, search, method="all"):
+    def run():
+        state.book.search(search, method)
+    return run
+
+
+@benchmark("search all")
+def _search_all(state):
+    return _search(state, "miller")
+
+
+@benchmark("search all digits")
+def _search_all_digits(state):
+    return _search(state, "12345")
+
+
+@benchmark("search name")
+def _search_name(state):
+    return _search(state, "alice", "name")
+
+
+@benchmark("search uid")
+def _search_uid(state):
+    return _search(state, "abc", "uid")
+
+
+@benchmark("search query")
+def _search_query(state):
+    return _search(state, query.parse(["name:smith", "email:acme"]))
+
+
+@benchmark("short uids")
+def _short_uids(state):
+    def run():
+        # the short uids are computed once per address book
+        state.book._short_uids = None
+        state.book.get_short_uid_dict()
+    return run
+
+
+def _sort(state, **kwargs):
+    contacts = list(state.book.contacts.values())
+
+    def run():
+        khard.sort_contacts(contacts, **kwargs)
+    return run
+
+
+@benchmark("sort first name")
+def _sort_first_name(state):
+    return _sort(state, sort="first_name")
+
+
+@benchmark("sort last name")
+def _sort_last_name(state):
+    return _sort(state, sort="last_name", reverse=True)
+
+
+@benchmark("sort grouped")
+def _sort_grouped(state):
+    return _sort(state, group=True)
+
+
+@benchmark("print_vcard")
+def _print_vcard(state):
+    contacts = state.contacts
+
+    def run():
+        for contact in contacts:
+            contact.print_vcard()
+    return run
+
+
+def _subcommand(state, function):
+    contacts = state.contacts
+    if khard.config is None or khard.config.filename != state.config_file:
+        khard.config = Config(state.config_file)
+
+    def run():
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(devnull):
+            try:
+                function(contacts)
+            except SystemExit:
+                # nothing was found
+                pass
+    return run
+
+
+def _register_subcommand(name, function):
+    benchmark(name)(lambda state: _subcommand(state, function))
+
+
+# The subcommands are called like khard calls them without search terms.
+for _parsable in (False, True):
+    _suffix = " --parsable" if _parsable else ""
+    _register_subcommand("list" + _suffix, functools.partial(
+        lambda parsable, contacts: khard.list_subcommand(contacts, parsable),
+        _parsable))
+    _register_subcommand("email" + _suffix, functools.partial(
+        lambda parsable, contacts: khard.email_subcommand(
+            ".*", contacts, parsable, False), _parsable))
+    _register_subcommand("phone" + _suffix, functools.partial(
+        lambda parsable, contacts: khard.phone_subcommand(
+            ".*", contacts, parsable), _parsable))
+    _register_subcommand("postaddress" + _suffix, functools.partial(
+        lambda parsable, contacts: khard.post_address_subcommand(
+            ".*", contacts, parsable), _parsable))
+    _register_subcommand("birthdays" + _suffix, functools.partial(
+        lambda parsable, contacts: khard.birthdays_subcommand(
+            contacts, parsable), _parsable))
+
+
+def measure_time(run, repeat):
+    """Measure the run time of a function.
+
+    :param run: the function to measure
+    :type run: callable
+    :param repeat: how often to run the function
+    :type repeat: int
+    :returns: the run time of each run in seconds
+    :rtype: list(float)
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def measure_memory(run):
+    """Measure the peak of the memory allocated while a function runs.
+
+    :param run: the function to measure
+    :type run: callable
+    :returns: the peak memory in bytes above the memory allocated before
+    :rtype: int
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def run_benchmarks(state, names, repeat=3, memory=True, log=None):
+    """Run benchmarks on one corpus.
+
+    :param state: the corpus to run the benchmarks on
+    :type state: State
+    :param names: the names of the benchmarks to run
+    :type names: list(str)
+    :param repeat: how often to run each benchmark
+    :type repeat: int
+    :param memory: whether to measure the peak memory
+    :type memory: bool
+    :param log: a function to report progress to
+    :type log: callable
+    :returns: the results by benchmark name
+    :rtype: dict(str, dict)
+    """
+    results = {}
+    state.reset()
+    for name, function in BENCHMARKS:
+        if name not in names:
+            continue
+        try:
+            times = measure_time(function(state), repeat)
+        except Exception as err:
+            # a broken benchmark should not stop the others
+            results[name] = {"error": "{}: {}".format(type(err).__name__,
+                                                      err)}
+            if log:
+                log("{:<24} {}".format(name, results[name]["error"]))
+            continue
+        results[name] = {"first": times[0], "best": min(times),
+                         "mean": sum(times) / len(times)}
+        if log:
+            log("{:<24} {:>10.2f} ms".format(name, times[0] * 1000))
+    if memory:
+        state.reset()
+        for name, function in BENCHMARKS:
+            if name in results and "error" not in results[name]:
+                results[name]["peak_memory"] = measure_memory(function(state))
+    state.reset()
+    return results
+
+
+def compare(old, new):
+    """Compare the results of two benchmark runs.
+
+    :param old: the earlier results
+    :type old: dict
+    :param new: the current results
+    :type new: dict
+    :returns: the table rows with the first run times and their ratio
+    :rtype: list(list(str))
+    """
+    rows = [["Benchmark", "Size", "Before", "After", "Change"]]
+    for size, results in new["results"].items():
+        old_results = old["results"].get(size, {})
+        for name, result in results.items():
+            if "first" not in result or \
+                    "first" not in old_results.get(name, {}):
+                continue
+            before = old_results[name]["first"]
+            after = result["first"]
+            change = "{:+.1f} %".format((after / before - 1) * 100) \
+                if before else ""
+            rows.append([name, size, "{:.2f} ms".format(before * 1000),
+                         "{:.2f} ms".format(after * 1000), change])
+    return rows
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Run the khard benchmarks on generated address books.")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="FILE", type=argparse.FileType(),
+                        help="compare the results to an earlier run")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000],
+                        help="the numbers of contacts to generate "
+                        "(default: 1000 10000 100000)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="how often to run each benchmark (default: 3)")
+    parser.add_argument("--only", metavar="REGEX",
+                        help="only run the benchmarks matching this regex")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="do not measure the peak memory")
+    parser.add_argument("--corpus-dir", metavar="DIR",
+                        help="keep the generated corpora in this directory to "
+                        "reuse them in the next run")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="parse_workers for loading (default: 1)")
+    parser.add_argument("--io-threads", type=int, default=0,
+                        help="io_threads for loading (default: 0)")
+    corpus.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [name for name, _ in BENCHMARKS
+             if not args.only or re.search(args.only, name)]
+    corpus_options = corpus.corpus_options(args)
+    output = {"khard": khard_version,
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "date": datetime.datetime.now().isoformat(timespec="seconds"),
+              "corpus": corpus_options,
+              "options": {"repeat": args.repeat, "workers": args.workers,
+                          "io_threads": args.io_threads},
+              "results": {}}
+    with contextlib.ExitStack() as stack:
+        directory = args.corpus_dir or stack.enter_context(
+            tempfile.TemporaryDirectory(prefix="khard-benchmark-"))
+        for size in args.sizes:
+            path = os.path.join(directory, str(size))
+            print("Generating {} contacts in {}".format(size, path),
+                  file=sys.stderr)
+            corpus.generate(path, size, **corpus_options)
+            config_file = os.path.join(directory,
+                                       "khard-{}.conf".format(size))
+            corpus.write_config(config_file, {"corpus": path})
+            state = State(path, config_file, args.workers, args.io_threads)
+            output["results"][str(size)] = run_benchmarks(
+                state, names, args.repeat, not args.no_memory,
+                lambda line: print(line, file=sys.stderr))
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(output, fh, indent=2)
+    if args.compare:
+        print(helpers.pretty_print(compare(json.load(args.compare), output)))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,12 @@ class Actions:
         "addressbooks": ["abooks"],
         "birthdays":    ["bdays"],
         "copy":         ["cp"],
+        "daemon":       [],
         "details":      ["show"],
         "email":        [],
         "export":       [],
         "filename":     ["file"],
+        "import":       [],
         "list":         ["ls"],
         "merge":        [],
         "modify":       ["edit", "ed"],
@@ -2,15 +2,119 @@
 """A simple class to load and manage the vcard files from disk."""
 
 import abc
-import glob
+import bisect
+import collections
+import functools
+import itertools
+import locale
 import logging
 import os
 import re
 import sys
 
-import vobject.base
-
+from . import instrumentation
+from .cache import ContactCache
 from .carddav_object import CarddavObject
+from .lookup import EmailAddressIndex, PhoneNumberIndex
+from .query import Query, source_filter
+from .search_index import SearchIndex, SearchIndexError, literal_terms
+
+
+def _read_vcard_file(filename):
+    """Read a vcard file in one go.
+
+    On Linux the kernel is asked to read the whole file ahead, which saves
+    round trips on network file systems.  The contents are not decoded so
+    that the threads that read ahead only do i/o.
+
+    :param filename: the path of the file
+    :type filename: str
+    :returns: the raw contents of the file
+    :rtype: bytes
+    :throws: IOError
+    """
+    with open(filename, "rb") as filehandle:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(filehandle.fileno(), 0, 0,
+                             os.POSIX_FADV_WILLNEED)
+        return filehandle.read()
+
+
+def _decode_vcard_file(data, encoding):
+    """Decode the contents of a vcard file like open(filename).read() does.
+
+    :param data: the raw contents of the file
+    :type data: bytes
+    :param encoding: the encoding of text files
+    :type encoding: str
+    :returns: the contents with universal newlines
+    :rtype: str
+    """
+    text = data.decode(encoding)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _load_errors():
+    """The exceptions that are raised if a vcard file can not be read or
+    parsed.
+
+    This is a function so that vobject, which is slow to import, is only
+    imported when an error occurred.
+
+    :returns: the exception classes
+    :rtype: tuple(type)
+    """
+    import vobject.base
+    return (IOError, vobject.base.ParseError)
+
+
+def _make_cache_entry(card):
+    """Collect the data about a contact that is stored in the cache.
+
+    :param card: the contact
+    :type card: CarddavObject
+    :returns: the header fields, the pickled vcard, the email addresses and
+        the fingerprint together with the settings it depends on
+    :rtype: dict
+    """
+    import pickle
+    return {"header": card.get_header(),
+            "vcard": pickle.dumps(card.vcard, pickle.HIGHEST_PROTOCOL),
+            "emails": EmailAddressIndex.get_addresses(card),
+            "sort_keys": {sort: card.get_sort_key(sort)
+                          for sort in ("first_name", "last_name")},
+            "fingerprint": (CarddavObject.get_fingerprint_settings(
+                card.supported_private_objects, card.localize_dates),
+                            card.fingerprint())}
+
+
+def _parse_vcard_files(filenames, private_objects, localize_dates):
+    """Parse vcard files into data that can be send between processes.
+
+    This is run in the worker processes of VdirAddressBook.load.
+
+    :param filenames: the paths of the vcard files
+    :type filenames: list(str)
+    :param private_objects: see AddressBook.__init__
+    :type private_objects: list(str)
+    :param localize_dates: see AddressBook.__init__
+    :type localize_dates: bool
+    :returns: for each file the same data that is stored in the cache or
+        the exception that occurred while reading or parsing it
+    :rtype: list(dict or Exception)
+    """
+    results = []
+    for filename in filenames:
+        try:
+            card = CarddavObject.from_file(None, filename, private_objects,
+                                           localize_dates)
+        except _load_errors() as err:
+            results.append(err)
+        else:
+            results.append(_make_cache_entry(card))
+    return results
 
 
 class AddressBookParseError(Exception):
@@ -41,14 +145,30 @@ class AddressBook(metaclass=abc.ABCMeta):
         self._loaded = False
         self.contacts = {}
         self._short_uids = None
+        self._sorted_uids = None
         self.name = name
         self._private_objects = private_objects
         self._localize_dates = localize_dates
         self._skip = skip
+        self.search_index = None
+        self._phone_index = None
+        self._email_index = None
+        self._sort_key = None
 
     def __str__(self):
         return self.name
 
+    @property
+    def sort_key(self):
+        """The key to sort address books by name.
+
+        :rtype: str
+        """
+        if self._sort_key is None:
+            from unidecode import unidecode
+            self._sort_key = unidecode(self.name).lower()
+        return self._sort_key
+
     def __eq__(self, other):
         return isinstance(other, type(self)) and self.name == other.name
 
@@ -75,6 +195,98 @@ class AddressBook(metaclass=abc.ABCMeta):
                 break
         return sum
 
+    def _find_candidates(self, terms, columns):
+        """Find the contacts that might match the given search terms.
+
+        If a search index is available it is used to narrow down the contacts,
+        otherwise all contacts are returned.
+
+        :param terms: the literal search terms or None if the query is not a
+            simple list of terms
+        :type terms: list(str) or NoneType
+        :param columns: the fields of the search index to use
+        :type columns: list(str)
+        :returns: the candidates in the order they where loaded
+        :rtype: iterable(carddav_object.CarddavObject)
+        """
+        uids = self._index_candidates(terms, columns) if terms else None
+        if uids is not None:
+            return [contact for uid, contact in self.contacts.items()
+                    if uid in uids]
+        return self.contacts.values()
+
+    def _index_candidates(self, terms, columns):
+        """Look up the uids of the contacts that might match the given search
+        terms in the search index.
+
+        :param terms: the literal search terms
+        :type terms: list(str)
+        :param columns: the fields of the search index to use
+        :type columns: list(str)
+        :returns: the uids of the candidates or None if there is no usable
+            search index
+        :rtype: set(str) or NoneType
+        """
+        if self.search_index is None:
+            return None
+        try:
+            return self.search_index.candidates(terms, columns)
+        except SearchIndexError as err:
+            logging.warning("Disabling the search index of address book "
+                            "%s: %s", self.name, err)
+            self.search_index = None
+            return None
+
+    def _term_candidates(self, term):
+        """Find the uids of the contacts that might match a term of a search
+        query.
+
+        :param term: the search term
+        :type term: query.Term
+        :returns: the uids of the candidates or None if all contacts have to
+            be checked
+        :rtype: set(str) or NoneType
+        """
+        if term.field == "uid":
+            return {uid for uid in self.contacts if uid.startswith(term.text)}
+        digits = re.sub(r"\D", "", term.text)
+        if term.field == "name":
+            lookups = [([term.text], ["name"])]
+        elif term.field == "org":
+            # The units of organisations are printed on separate lines.
+            lookups = [(term.text.split(", "), ["details"])]
+        elif term.field == "phone" and len(digits) >= 3:
+            # Phone numbers can be written with different separators.
+            lookups = [([term.text], ["details"]),
+                       ([digits], ["clean_details"])]
+        elif term.field is None and len(digits) >= 3:
+            lookups = [([term.text], ["details", "clean_details"])]
+        else:
+            lookups = [([term.text], ["details"])]
+        result = set()
+        for terms, columns in lookups:
+            uids = self._index_candidates(terms, columns)
+            if uids is None:
+                return None
+            result |= uids
+        return result
+
+    def _search_query(self, query):
+        """Search for contacts matching a parsed search query.
+
+        The indexes are used to find candidates for the terms of the query
+        where possible, only the candidates are checked against the query.
+
+        :param query: the query to search for
+        :type query: query.Query
+        :yields: all found contacts
+        :rtype: generator(carddav_object.CarddavObject)
+        """
+        uids = query.candidates(self._term_candidates)
+        for uid, contact in self.contacts.items():
+            if (uids is None or uid in uids) and query.matches(contact):
+                yield contact
+
     def _search_all(self, query):
         """Search in all fields for contacts matching query.
 
@@ -84,8 +296,16 @@ class AddressBook(metaclass=abc.ABCMeta):
         :rtype: generator(carddav_object.CarddavObject)
 
         """
+        terms = literal_terms(query)
+        if terms == []:
+            # The query matches everything.
+            yield from self.contacts.values()
+            return
+        digits = len(re.sub(r"\D", "", query)) >= 3
         regexp = re.compile(query, re.IGNORECASE | re.DOTALL)
-        for contact in self.contacts.values():
+        for contact in self._find_candidates(
+                terms, ["details", "clean_details"] if digits else
+                ["details"]):
             # search in all contact fields
             contact_details = contact.print_vcard()
             if regexp.search(contact_details) is not None:
@@ -95,7 +315,7 @@ class AddressBook(metaclass=abc.ABCMeta):
                 clean_contact_details = re.sub("[^a-zA-Z0-9\n]", "",
                                                contact_details)
                 if regexp.search(clean_contact_details) is not None \
-                        and len(re.sub(r"\D", "", query)) >= 3:
+                        and digits:
                     yield contact
 
     def _search_names(self, query):
@@ -107,8 +327,13 @@ class AddressBook(metaclass=abc.ABCMeta):
         :rtype: generator(carddav_object.CarddavObject)
 
         """
+        terms = literal_terms(query)
+        if terms == []:
+            # The query matches everything.
+            yield from self.contacts.values()
+            return
         regexp = re.compile(query, re.IGNORECASE | re.DOTALL)
-        for contact in self.contacts.values():
+        for contact in self._find_candidates(terms, ["name"]):
             # only search in contact name
             if regexp.search(contact.formatted_name) is not None:
                 yield contact
@@ -136,11 +361,12 @@ class AddressBook(metaclass=abc.ABCMeta):
     def search(self, query, method="all"):
         """Search this address book for contacts matching the query.
 
-        The method can be one of "all", "name" and "uid".  The backend for this
-        address book migth be load()ed if needed.
+        The method can be one of "all", "name" and "uid".  It is ignored if
+        the query is a parsed search query.  The backend for this address book
+        migth be load()ed if needed.
 
         :param query: the query to search for
-        :type query: str
+        :type query: str or query.Query
         :param method: the type of fileds to use when seaching
         :type method: str
         :returns: all found contacts
@@ -150,7 +376,9 @@ class AddressBook(metaclass=abc.ABCMeta):
         logging.debug('address book %s, searching with %s', self.name, query)
         if not self._loaded:
             self.load(query)
-        if method == "all":
+        if isinstance(query, Query):
+            search_function = self._search_query
+        elif method == "all":
             search_function = self._search_all
         elif method == "name":
             search_function = self._search_names
@@ -159,7 +387,8 @@ class AddressBook(metaclass=abc.ABCMeta):
         else:
             raise ValueError('Only the search methods "all", "name" and "uid" '
                              'are supported.')
-        return list(search_function(query))
+        with instrumentation.timer("search", self.name):
+            return list(search_function(query))
 
     def get_short_uid_dict(self, query=None):
         """Create a dictionary of shortend UIDs for all contacts.
@@ -175,30 +404,157 @@ class AddressBook(metaclass=abc.ABCMeta):
         if self._short_uids is None:
             if not self._loaded:
                 self.load(query)
-            if not self.contacts:
-                self._short_uids = {}
-            elif len(self.contacts) == 1:
-                self._short_uids = {uid[0:1]: contact
-                                    for uid, contact in self.contacts.items()}
-            else:
-                self._short_uids = {}
-                sorted_uids = sorted(self.contacts)
-                # Prepare for the loop; the first and last items are handled
-                # seperatly.
-                item0, item1 = sorted_uids[:2]
-                same1 = self._compare_uids(item0, item1)
-                self._short_uids[item0[:same1 + 1]] = self.contacts[item0]
-                for item_new in sorted_uids[2:]:
-                    # shift the items and the common prefix lenght one further
-                    item0, item1 = item1, item_new
-                    same0, same1 = same1, self._compare_uids(item0, item1)
-                    # compute the final prefix length for item1
-                    same = max(same0, same1)
-                    self._short_uids[item0[:same + 1]] = self.contacts[item0]
-                # Save the last item.
-                self._short_uids[item1[:same1 + 1]] = self.contacts[item1]
+            self._sorted_uids = sorted(self.contacts)
+            self._short_uids = {}
+            self._set_short_uids(0, len(self._sorted_uids), True)
         return self._short_uids
 
+    def _set_short_uids(self, start, stop, add):
+        """Add or delete the short uids of a range of the sorted uids.
+
+        The shortend uid of a contact only depends on the previous and the
+        next uid in sorted order.
+
+        :param start: the first index in self._sorted_uids
+        :type start: int
+        :param stop: the index after the last index in self._sorted_uids
+        :type stop: int
+        :param add: add the short uids if True, delete them otherwise
+        :type add: bool
+        :returns: None
+        """
+        uids = self._sorted_uids
+        for index in range(max(start, 0), min(stop, len(uids))):
+            same = 0
+            if index > 0:
+                same = self._compare_uids(uids[index - 1], uids[index])
+            if index + 1 < len(uids):
+                same = max(same, self._compare_uids(uids[index],
+                                                    uids[index + 1]))
+            short_uid = uids[index][:same + 1]
+            if add:
+                self._short_uids[short_uid] = self.contacts[uids[index]]
+            else:
+                del self._short_uids[short_uid]
+
+    def _add_contact(self, contact):
+        """Add a contact and update the short uids and indexes that where
+        already built.
+
+        :param contact: the contact to add, its uid must not be in use
+        :type contact: carddav_object.CarddavObject
+        :returns: None
+        """
+        uid = contact.uid
+        self.contacts[uid] = contact
+        if self._short_uids is not None:
+            index = bisect.bisect_left(self._sorted_uids, uid)
+            self._set_short_uids(index - 1, index + 1, False)
+            self._sorted_uids.insert(index, uid)
+            self._set_short_uids(index - 1, index + 2, True)
+        if self._phone_index is not None:
+            self._phone_index.add_contact(contact)
+        if self._email_index is not None:
+            self._email_index.add_contact(
+                contact, self._get_email_addresses(contact))
+
+    def _remove_contact(self, contact):
+        """Remove a contact and update the short uids and indexes that where
+        already built.
+
+        :param contact: the contact to remove
+        :type contact: carddav_object.CarddavObject
+        :returns: None
+        """
+        uid = contact.uid
+        if self._short_uids is not None:
+            index = bisect.bisect_left(self._sorted_uids, uid)
+            self._set_short_uids(index - 1, index + 2, False)
+            del self._sorted_uids[index]
+            self._set_short_uids(index - 1, index + 1, True)
+        if self._phone_index is not None:
+            self._phone_index.remove_contact(contact)
+        if self._email_index is not None:
+            self._email_index.remove_contact(contact)
+        del self.contacts[uid]
+
+    def get_phone_number_index(self, country_code="", trunk_prefix="0"):
+        """Get an index of the phone numbers of all contacts.
+
+        The index is build on first use and kept for later calls with the same
+        arguments.  The address book will be load()ed if needed.
+
+        :param country_code: see lookup.PhoneNumberIndex
+        :type country_code: str
+        :param trunk_prefix: see lookup.PhoneNumberIndex
+        :type trunk_prefix: str
+        :returns: the phone number index
+        :rtype: lookup.PhoneNumberIndex
+        """
+        if not self._loaded:
+            self.load()
+        if self._phone_index is None or \
+                self._phone_index.settings != (country_code, trunk_prefix):
+            self._phone_index = PhoneNumberIndex(country_code, trunk_prefix)
+            for contact in self.contacts.values():
+                self._phone_index.add_contact(contact)
+        return self._phone_index
+
+    def _get_email_addresses(self, contact):
+        """Get the email addresses of a contact for the email index.
+
+        :param contact: the contact
+        :type contact: carddav_object.CarddavObject
+        :returns: see lookup.EmailAddressIndex.get_addresses
+        :rtype: list(tuple(str, str))
+        """
+        return EmailAddressIndex.get_addresses(contact)
+
+    def get_email_address_index(self):
+        """Get an index of the email addresses of all contacts.
+
+        The index is build on first use.  The address book will be load()ed
+        if needed.
+
+        :returns: the email address index
+        :rtype: lookup.EmailAddressIndex
+        """
+        if not self._loaded:
+            self.load()
+        if self._email_index is None:
+            self._email_index = EmailAddressIndex()
+            for contact in self.contacts.values():
+                self._email_index.add_contact(
+                    contact, self._get_email_addresses(contact))
+        return self._email_index
+
+    def get_identical_contacts(self):
+        """Find groups of contacts with identical content.
+
+        The contacts are grouped by their fingerprint so this is linear in the
+        number of contacts.  The address book will be load()ed if needed.
+
+        :returns: all groups of at least two identical contacts
+        :rtype: list(list(carddav_object.CarddavObject))
+        """
+        if not self._loaded:
+            self.load()
+        return self._group_identical_contacts(self.contacts.values())
+
+    @staticmethod
+    def _group_identical_contacts(contacts):
+        """Group contacts by their fingerprint.
+
+        :param contacts: the contacts to group
+        :type contacts: iterable(carddav_object.CarddavObject)
+        :returns: all groups of at least two identical contacts
+        :rtype: list(list(carddav_object.CarddavObject))
+        """
+        groups = collections.OrderedDict()
+        for contact in contacts:
+            groups.setdefault(contact.fingerprint(), []).append(contact)
+        return [group for group in groups.values() if len(group) > 1]
+
     def get_short_uid(self, uid):
         """Get the shortend UID for the given UID.
 
@@ -236,12 +592,32 @@ class VdirAddressBook(AddressBook):
     direcotry on disk.
     """
 
-    def __init__(self, name, path, **kwargs):
+    # Parsing fewer files than this in parallel does not pay off the cost of
+    # starting the worker processes.
+    _parallel_threshold = 200
+
+    def __init__(self, name, path, use_cache=False, use_search_index=False,
+                 lazy=False, workers=1, io_threads=0, **kwargs):
         """
         :param name: the name to identify the address book
         :type name: str
         :param path: the path to the backing structure on disk
         :type path: str
+        :param use_cache: keep the parsed vCards in a cache on disk to speed
+            up loading
+        :type use_cache: bool
+        :param use_search_index: maintain a full text index on disk to speed
+            up searching
+        :type use_search_index: bool
+        :param lazy: only scan the header fields of vcard files that are not
+            cached and parse them completely when they are needed
+        :type lazy: bool
+        :param workers: the number of processes that parse vcard files in
+            parallel, 0 means one per cpu
+        :type workers: int
+        :param io_threads: the number of threads that read vcard files ahead
+            of parsing them, 0 reads them on demand
+        :type io_threads: int
         :param **kwargs: further arguments for the parent constructor
         """
         self.path = os.path.expanduser(path)
@@ -249,42 +625,375 @@ class VdirAddressBook(AddressBook):
             raise FileNotFoundError("[Errno 2] The path {} to the address book"
                                     " {} does not exist.".format(path, name))
         super().__init__(name, **kwargs)
+        self.cache = ContactCache(self.path) if use_cache else None
+        self._lazy = lazy
+        self._workers = workers or os.cpu_count() or 1
+        self._io_threads = io_threads
+        self._stats = {}
+        self._file_stats = {}
+        self._dir_entries = {}
+        self._cached_email_addresses = {}
+        self._contacts_by_filename = {}
+        if use_search_index:
+            if SearchIndex.available():
+                self.search_index = SearchIndex(self.path, repr(
+                    (name, list(self._private_objects),
+                     self._localize_dates)))
+            else:
+                logging.warning("Your sqlite version does not support FTS5 "
+                                "with the trigram tokenizer, the search index "
+                                "for address book %s is disabled.", name)
 
-    def _find_vcard_files(self, search=None, search_in_source_files=False):
-        """Find all vcard files inside this address book.
+    def _list_vcard_files(self):
+        """List all vcard files in the directory of this address book.
 
-        If a search string is given only files which contents match that will
-        be returned.
+        If the cache is enabled and the directory did not change since the
+        cache was written the directory is not scanned again.  Otherwise the
+        stat results of the directory scan are kept for _stat().
 
-        :param search: a regular expression to limit the results
-        :type search: str
-        :param search_in_source_files: apply search regexp directly on the .vcf
-            files to speed up parsing (less accurate)
-        :type search_in_source_files: bool
-        :returns: the paths of the vcard files
-        :rtype: generator
+        :returns: the paths of all vcard files
+        :rtype: list(str)
+        """
+        if self.cache is not None:
+            files = self.cache.list_files()
+            if files is not None:
+                return files
+        files = []
+        if hasattr(os, "scandir"):
+            for entry in os.scandir(self.path):
+                # like glob.glob("*.vcf") hidden files are ignored
+                if entry.name.endswith(".vcf") and \
+                        not entry.name.startswith("."):
+                    filename = os.path.join(self.path, entry.name)
+                    files.append(filename)
+                    self._dir_entries[filename] = entry
+        else:
+            # python 3.4
+            files = [os.path.join(self.path, name)
+                     for name in os.listdir(self.path)
+                     if name.endswith(".vcf") and not name.startswith(".")]
+        if self.cache is not None:
+            self.cache.set_files(files)
+        return files
+
+    def _stat(self, filename):
+        """Get the stat result of a file, reusing the result of the
+        directory scan or of an earlier call if possible.
+
+        :param filename: the path of the file
+        :type filename: str
+        :returns: the stat result
+        :rtype: os.stat_result
+        :throws: OSError
+        """
+        stat = self._file_stats.get(filename)
+        if stat is None:
+            entry = self._dir_entries.pop(filename, None)
+            stat = entry.stat() if entry is not None else os.stat(filename)
+            self._file_stats[filename] = stat
+        return stat
+
+    def _needs_parsing(self, filename):
+        """Check if a vcard file has to be parsed or if it can be loaded from
+        the cache.
+
+        :param filename: the path of the vcard file
+        :type filename: str
+        :returns: weather the file has to be read and parsed
+        :rtype: bool
+        """
+        if self.cache is None:
+            return True
+        try:
+            return self.cache.get(filename, self._stat(filename)) is None
+        except OSError:
+            # the error is reported when the file is loaded
+            return True
+
+    def _read_files(self, filenames):
+        """Read the contents of files in a thread pool.
+
+        Up to a few files per thread are read ahead of the file that is
+        currently consumed so that the i/o overlaps with parsing.  The
+        contents are decoded by the thread that consumes them.
+
+        :param filenames: the paths of the files to read
+        :type filenames: list(str)
+        :returns: the file name and the contents of each file, in the given
+            order, or the exception raised while reading it
+        :rtype: generator(tuple(str, str or IOError))
+        """
+        encoding = locale.getpreferredencoding(False)
+        if self._io_threads < 1 or len(filenames) < 2:
+            for filename in filenames:
+                try:
+                    data = _read_vcard_file(filename)
+                except IOError as err:
+                    yield filename, err
+                else:
+                    instrumentation.count("bytes read", len(data), self.name)
+                    yield filename, _decode_vcard_file(data, encoding)
+            return
+        import concurrent.futures
+        pending = collections.deque()
+        files = iter(filenames)
+        with concurrent.futures.ThreadPoolExecutor(self._io_threads) as pool:
+            for filename in itertools.islice(files, self._io_threads * 4):
+                pending.append(
+                    (filename, pool.submit(_read_vcard_file, filename)))
+            while pending:
+                filename, future = pending.popleft()
+                for next_filename in itertools.islice(files, 1):
+                    pending.append((next_filename, pool.submit(
+                        _read_vcard_file, next_filename)))
+                try:
+                    data = future.result()
+                except IOError as err:
+                    yield filename, err
+                else:
+                    instrumentation.count("bytes read", len(data), self.name)
+                    yield filename, _decode_vcard_file(data, encoding)
+
+    def _parse_in_parallel(self, filenames):
+        """Parse vcard files in worker processes.
+
+        Nothing is done if there are too few files to parse.
+
+        :param filenames: the paths of the vcard files to parse
+        :type filenames: list(str)
+        :returns: the result of _parse_vcard_files for each parsed file, by
+            file name
+        :rtype: dict(str: dict or Exception)
+        """
+        if self._workers < 2 or len(filenames) < self._parallel_threshold:
+            return {}
+        if self.cache is not None or self.search_index is not None:
+            # The stat results have to be taken before the files are read.
+            for filename in filenames:
+                try:
+                    self._stat(filename)
+                except OSError:
+                    pass
+        size = -(-len(filenames) // (self._workers * 4))
+        chunks = [filenames[i:i + size]
+                  for i in range(0, len(filenames), size)]
+        logging.debug("Parsing %d files of address book %s in %d processes",
+                      len(filenames), self.name, self._workers)
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(self._workers) as pool:
+            results = pool.map(_parse_vcard_files, chunks,
+                               itertools.repeat(self._private_objects),
+                               itertools.repeat(self._localize_dates))
+            parsed = dict(zip(filenames,
+                              itertools.chain.from_iterable(results)))
+        if instrumentation.enabled:
+            # the files were read by the worker processes
+            for filename in filenames:
+                try:
+                    instrumentation.count("bytes read",
+                                          self._stat(filename).st_size,
+                                          self.name)
+                except OSError:
+                    pass
+        return parsed
+
+    def _load_card(self, filename, parsed=None, contents=None):
+        """Load one vcard file, using the cache if possible.
 
+        Cached vcards are only unpickled when a field other than the header
+        fields of the contact is needed.
+
+        :param filename: the path of the vcard file
+        :type filename: str
+        :param parsed: the result of _parse_vcard_files for the file if it was
+            parsed in another process
+        :type parsed: dict or Exception
+        :param contents: the contents of the file if they where already read
+            or the exception raised while reading it
+        :type contents: str or IOError
+        :returns: the loaded contact
+        :rtype: CarddavObject
+        :throws: IOError, vobject.base.ParseError
         """
-        files = glob.glob(os.path.join(self.path, "*.vcf"))
-        if search and search_in_source_files:
-            for filename in files:
-                with open(filename, "r") as filehandle:
-                    if re.search(search, filehandle.read(),
-                                 re.IGNORECASE | re.DOTALL):
-                        yield filename
+        if isinstance(parsed, Exception):
+            raise parsed
+        if isinstance(contents, Exception):
+            raise contents
+        if self.cache is None and self.search_index is None:
+            stat = None
+        else:
+            stat = self._stat(filename)
+            self._stats[filename] = ContactCache.stat_key(stat)
+        if parsed is not None:
+            instrumentation.count("files parsed", 1, self.name)
+            entry = parsed
+            if self.cache is not None:
+                self.cache.put(filename, stat, **entry)
+        elif self.cache is not None:
+            entry = self.cache.get(filename, stat)
         else:
-            yield from files
+            instrumentation.count("files parsed", 1, self.name)
+            return CarddavObject.from_file(self, filename,
+                                           self._private_objects,
+                                           self._localize_dates, self._lazy,
+                                           contents)
+        if entry is not None:
+            import pickle
+            if parsed is None:
+                instrumentation.count("files from cache", 1, self.name)
+            self._cached_email_addresses[filename] = entry["emails"]
+            settings, fingerprint = entry["fingerprint"]
+            if settings != CarddavObject.get_fingerprint_settings(
+                    self._private_objects, self._localize_dates):
+                fingerprint = None
+            return CarddavObject.from_header(
+                self, filename, entry["header"],
+                functools.partial(pickle.loads, entry["vcard"]),
+                self._private_objects, self._localize_dates, fingerprint,
+                entry["sort_keys"])
+        instrumentation.count("files parsed", 1, self.name)
+        card = CarddavObject.from_file(self, filename, self._private_objects,
+                                       self._localize_dates,
+                                       contents=contents)
+        entry = _make_cache_entry(card)
+        self._cached_email_addresses[filename] = entry["emails"]
+        self.cache.put(filename, stat, **entry)
+        return card
+
+    def _get_email_addresses(self, contact):
+        try:
+            return self._cached_email_addresses[contact.filename]
+        except KeyError:
+            return super()._get_email_addresses(contact)
+
+    def _update_search_index(self, complete):
+        """Synchronize the search index with the loaded contacts.
+
+        If the index can not be used it is disabled for this address book.
+
+        :param complete: weather all vcard files where loaded
+        :type complete: bool
+        :returns: None
+        """
+        try:
+            updated = self.search_index.update(self.contacts.values(),
+                                               self._stats, complete)
+        except SearchIndexError as err:
+            logging.warning("Disabling the search index of address book %s: "
+                            "%s", self.name, err)
+            self.search_index = None
+        else:
+            logging.debug("Updated %d entries in the search index of address "
+                          "book %s", updated, self.name)
+
+    def update_file(self, filename):
+        """Load a new or changed vcard file without loading the other files
+        again.
+
+        The contact that was loaded from the file before is replaced.  The
+        short uids, the phone number and email address indexes, the cache and
+        the search index are updated incrementally.  Nothing is done if the
+        address book was not loaded yet.
+
+        :param filename: the path of the vcard file
+        :type filename: str
+        :returns: the loaded contact or None if it could not be loaded
+        :rtype: CarddavObject or NoneType
+        """
+        if not self._loaded:
+            return None
+        old = self._contacts_by_filename.pop(filename, None)
+        if old is not None:
+            self._remove_contact(old)
+        self._cached_email_addresses.pop(filename, None)
+        try:
+            card = self._load_card(filename)
+        except _load_errors() as err:
+            logging.warning("Could not load the vcard file %s of address "
+                            "book %s: %s", filename, self.name, err)
+            self.remove_file(filename)
+            return None
+        finally:
+            self._file_stats.pop(filename, None)
+        uid = card.uid
+        if not uid:
+            logging.warning("Card %s from address book %s has no UID and will "
+                            "not be availbale.", card, self.name)
+            return None
+        elif uid in self.contacts:
+            logging.warning("Card %s and %s from address book %s have the "
+                            "same UID. The former will not be availbale.",
+                            card, self.contacts[uid], self.name)
+            return None
+        self._contacts_by_filename[filename] = card
+        self._add_contact(card)
+        if self.search_index is not None:
+            try:
+                self.search_index.update_contact(card,
+                                                 self._stats.get(filename))
+            except SearchIndexError as err:
+                logging.warning("Disabling the search index of address book "
+                                "%s: %s", self.name, err)
+                self.search_index = None
+        return card
+
+    def remove_file(self, filename):
+        """Remove the contact of a deleted vcard file.
+
+        The short uids, the phone number and email address indexes, the cache
+        and the search index are updated incrementally.  Nothing is done if
+        the address book was not loaded yet.
+
+        :param filename: the path of the vcard file
+        :type filename: str
+        :returns: None
+        """
+        if not self._loaded:
+            return
+        contact = self._contacts_by_filename.pop(filename, None)
+        if contact is not None:
+            self._remove_contact(contact)
+        self._cached_email_addresses.pop(filename, None)
+        self._stats.pop(filename, None)
+        if self.cache is not None:
+            self.cache.remove(filename)
+        if self.search_index is not None:
+            try:
+                self.search_index.remove(filename)
+            except SearchIndexError as err:
+                logging.warning("Disabling the search index of address book "
+                                "%s: %s", self.name, err)
+                self.search_index = None
+
+    def update_files(self, filenames):
+        """Bring the contacts of some vcard files up to date.
+
+        Existing files are loaded with update_file(), missing files are
+        removed with remove_file().
+
+        :param filenames: the paths of the vcard files that changed
+        :type filenames: iterable(str)
+        :returns: None
+        """
+        for filename in filenames:
+            if os.path.exists(filename):
+                self.update_file(filename)
+            else:
+                self.remove_file(filename)
+        if self._loaded and self.cache is not None:
+            self.cache.save()
 
     def load(self, query=None, search_in_source_files=False):
         """Load all vcard files in this address book from disk.
 
-        If a search string is given only files which contents match that will
+        If a search query is given only files which contents match that will
         be loaded.
 
-        :param query: a regular expression to limit the results
-        :type query: str
-        :param search_in_source_files: apply search regexp directly on the .vcf
-            files to speed up parsing (less accurate)
+        :param query: a regular expression or a parsed search query to limit
+            the results
+        :type query: str or query.Query
+        :param search_in_source_files: apply the search query directly on the
+            .vcf files to speed up parsing (less accurate)
         :type search_in_source_files: bool
         :returns: the number of successfully loaded cards and the number of
             errors
@@ -295,16 +1004,44 @@ class VdirAddressBook(AddressBook):
             return
         logging.debug('Loading Vdir %s with query %s', self.name, query)
         errors = 0
-        for filename in self._find_vcard_files(
-                search=query, search_in_source_files=search_in_source_files):
+        search = source_filter(query) if query and search_in_source_files \
+            else None
+        with instrumentation.timer("file discovery", self.name):
+            files = self._list_vcard_files()
+        instrumentation.count("files found", len(files), self.name)
+        if search:
+            # all files are read to search them
+            parsed = {}
+            to_read = files
+        else:
+            to_parse = [filename for filename in files
+                        if self._needs_parsing(filename)]
+            parsed = self._parse_in_parallel(to_parse)
+            to_read = [filename for filename in to_parse
+                       if filename not in parsed]
+        contents = self._read_files(to_read)
+        next_contents = next(contents, (None, None))
+        filenames = []
+        for filename in files:
+            text = None
+            if next_contents[0] == filename:
+                text = next_contents[1]
+                next_contents = next(contents, (None, None))
+            if search and not isinstance(text, Exception) and \
+                    not search(text):
+                instrumentation.count("skipped by prefilter", 1, self.name)
+                continue
+            filenames.append(filename)
             try:
-                card = CarddavObject.from_file(self, filename,
-                                               self._private_objects,
-                                               self._localize_dates)
-            except (IOError, vobject.base.ParseError) as err:
+                with instrumentation.span("load file", threshold=True,
+                                          file=filename):
+                    card = self._load_card(filename, parsed.get(filename),
+                                           text)
+            except _load_errors() as err:
                 verb = "open" if isinstance(err, IOError) else "parse"
                 logging.debug("Error: Could not %s file %s\n%s", verb,
                               filename, err)
+                instrumentation.count("parse errors", 1, self.name)
                 if self._skip:
                     errors += 1
                 else:
@@ -329,7 +1066,18 @@ class VdirAddressBook(AddressBook):
                         self.contacts[uid], self.name)
                 else:
                     self.contacts[uid] = card
+                    self._contacts_by_filename[filename] = card
         self._loaded = True
+        self._file_stats = {}
+        self._dir_entries = {}
+        if self.cache is not None:
+            # Entries for files that were filtered out are still valid.
+            if not (query and search_in_source_files):
+                self.cache.retain(filenames)
+            self.cache.save()
+        if self.search_index is not None:
+            self._update_search_index(
+                complete=not (query and search_in_source_files))
         if errors:
             logging.warning(
                 "%d of %d vCard files of address book %s could not be parsed.",
@@ -376,6 +1124,21 @@ class AddressBookCollection(AddressBook):
         logging.debug('Loded %s contacts from address book %s.',
                       len(self.contacts), self.name)
 
+    def get_identical_contacts(self):
+        """Find groups of contacts with identical content in all backing
+        address books.
+
+        In contrast to self.contacts contacts with the same UID from different
+        address books are all included.
+
+        :returns: all groups of at least two identical contacts
+        :rtype: list(list(carddav_object.CarddavObject))
+        """
+        if not self._loaded:
+            self.load()
+        return self._group_identical_contacts(itertools.chain.from_iterable(
+            abook.contacts.values() for abook in self._abooks))
+
     def get_abook(self, name):
         """Get one of the backing abdress books by its name,
 
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""Persistent on disk caches for the parsed vCards of vdir address books and
+the validated config file."""
+
+import hashlib
+import logging
+import os
+import pickle
+import time
+
+from atomicwrites import atomic_write
+
+from .version import khard_version
+
+
+def get_cache_dir():
+    """Find the directory where khard stores its cache files.
+
+    :returns: the path to the cache directory
+    :rtype: str
+    """
+    xdg_cache_home = os.getenv("XDG_CACHE_HOME",
+                               os.path.expanduser("~/.cache"))
+    return os.path.join(xdg_cache_home, "khard")
+
+
+class ContactCache:
+    """Cache the parsed vCards of one vdir on disk.
+
+    Entries are keyed by the file name of the vCard and are only reused if the
+    modification time, size and inode of the file did not change.  The list of
+    file names in the vdir is stored together with the modification time of
+    the directory so that the directory does not need to be scanned again if
+    it did not change.
+    """
+
+    # Increase this whenever the format of the cache file changes.
+    version = 5
+    # Directory modification times that are closer to the time of saving the
+    # cache than this are not trusted because the directory might be changed
+    # again within the resolution of the file system time stamps.
+    _racy_interval = 2
+
+    def __init__(self, directory, cache_dir=None):
+        """
+        :param directory: the path of the vdir that should be cached
+        :type directory: str
+        :param cache_dir: the directory to store the cache file in, defaults
+            to $XDG_CACHE_HOME/khard
+        :type cache_dir: str
+        """
+        self.directory = directory
+        self._abspath = os.path.abspath(directory)
+        key = hashlib.sha1(self._abspath.encode("utf-8")).hexdigest()
+        self.filename = os.path.join(cache_dir or get_cache_dir(),
+                                     key + ".pickle")
+        self._entries = None
+        self._files = None
+        self._dir_mtime = None
+        self._dirty = False
+
+    @staticmethod
+    def stat_key(stat):
+        """Compute the key that identifies a certain version of a file.
+
+        :param stat: the stat result of the file
+        :type stat: os.stat_result
+        :returns: the values that have to match for an entry to be valid
+        :rtype: tuple(int, int, int)
+        """
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _read(self):
+        """Read the cache file from disk if that was not done before."""
+        if self._entries is not None:
+            return
+        self._entries = {}
+        try:
+            with open(self.filename, "rb") as filehandle:
+                data = pickle.load(filehandle)
+        except FileNotFoundError:
+            return
+        except Exception as err:
+            logging.debug("Ignoring unreadable cache file %s: %s",
+                          self.filename, err)
+            return
+        if not isinstance(data, dict) or data.get("version") != self.version \
+                or data.get("directory") != self._abspath:
+            logging.debug("Ignoring outdated cache file %s", self.filename)
+            return
+        self._entries = data["entries"]
+        self._files = data["files"]
+        self._dir_mtime = data["dir_mtime"]
+
+    def list_files(self):
+        """Get the cached list of vCard files if the directory did not change.
+
+        :returns: the full paths of all vCard files or None if the directory
+            has to be scanned again
+        :rtype: list(str) or NoneType
+        """
+        self._read()
+        if self._files is None or self._dir_mtime is None:
+            return None
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return None
+        if mtime != self._dir_mtime:
+            return None
+        return [os.path.join(self.directory, name) for name in self._files]
+
+    def set_files(self, files):
+        """Store the list of vCard files for the current directory state.
+
+        :param files: the full paths of all vCard files in the directory
+        :type files: list(str)
+        :returns: None
+        """
+        self._read()
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and \
+                time.time() - mtime / 1e9 < self._racy_interval:
+            mtime = None
+        files = [os.path.basename(name) for name in files]
+        if files != self._files or mtime != self._dir_mtime:
+            self._files = files
+            self._dir_mtime = mtime
+            self._dirty = True
+
+    def get(self, filename, stat):
+        """Get the cached data for a file if the file did not change.
+
+        :param filename: the path of the vCard file
+        :type filename: str
+        :param stat: the current stat result for the file
+        :type stat: os.stat_result
+        :returns: the cached data or None
+        :rtype: dict or NoneType
+        """
+        self._read()
+        entry = self._entries.get(os.path.basename(filename))
+        if entry is not None and entry["stat"] == self.stat_key(stat):
+            return entry
+        return None
+
+    def put(self, filename, stat, **data):
+        """Store data for a file in the cache.
+
+        :param filename: the path of the vCard file
+        :type filename: str
+        :param stat: the stat result of the file at the time the data was
+            computed
+        :type stat: os.stat_result
+        :param **data: the data to cache, all values must be picklable
+        :returns: None
+        """
+        self._read()
+        data["stat"] = self.stat_key(stat)
+        self._entries[os.path.basename(filename)] = data
+        self._dirty = True
+
+    def remove(self, filename):
+        """Remove the entry for a file.
+
+        :param filename: the path of the vCard file
+        :type filename: str
+        :returns: None
+        """
+        self._read()
+        if self._entries.pop(os.path.basename(filename), None) is not None:
+            self._dirty = True
+
+    def retain(self, filenames):
+        """Remove all entries for files that are not listed.
+
+        :param filenames: the paths of all files that still exist
+        :type filenames: iterable(str)
+        :returns: None
+        """
+        self._read()
+        keep = {os.path.basename(name) for name in filenames}
+        for name in set(self._entries) - keep:
+            del self._entries[name]
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk if it was changed.
+
+        Errors are logged and otherwise ignored as the cache is only an
+        optimization.
+
+        :returns: None
+        """
+        if not self._dirty:
+            return
+        data = {"version": self.version, "directory": self._abspath,
+                "dir_mtime": self._dir_mtime, "files": self._files,
+                "entries": self._entries}
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            with atomic_write(self.filename, mode="wb",
+                              overwrite=True) as filehandle:
+                pickle.dump(data, filehandle, pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PicklingError) as err:
+            logging.debug("Could not write cache file %s: %s", self.filename,
+                          err)
+        else:
+            self._dirty = False
+
+
+class ConfigCache:
+    """Cache the validated contents of the config file on disk.
+
+    The cached values are only used if the modification time, size and inode
+    of the config file and the version of khard did not change.  They only
+    depend on the contents of the file: the environment is not part of the
+    key because the values that depend on it ($EDITOR, $MERGE_EDITOR, $PATH
+    and "~" in address book paths) are resolved after the config is loaded.
+    Such values must not be added to the cached config.
+    """
+
+    # Increase this whenever the validation of the config file changes.
+    version = 1
+
+    def __init__(self, config_file, cache_dir=None):
+        """
+        :param config_file: the path of the config file
+        :type config_file: str
+        :param cache_dir: the directory to store the cache file in, defaults
+            to $XDG_CACHE_HOME/khard
+        :type cache_dir: str
+        """
+        self._abspath = os.path.abspath(config_file)
+        key = hashlib.sha1(self._abspath.encode("utf-8")).hexdigest()
+        self.filename = os.path.join(cache_dir or get_cache_dir(),
+                                     "config-" + key + ".pickle")
+
+    def _stat(self):
+        try:
+            return os.stat(self._abspath)
+        except OSError:
+            return None
+
+    def load(self):
+        """Load the cached config if the config file did not change.
+
+        :returns: the sections of the config or None
+        :rtype: dict or NoneType
+        """
+        stat = self._stat()
+        if stat is None:
+            return None
+        try:
+            with open(self.filename, "rb") as filehandle:
+                data = pickle.load(filehandle)
+        except FileNotFoundError:
+            return None
+        except Exception as err:
+            logging.debug("Ignoring unreadable cache file %s: %s",
+                          self.filename, err)
+            return None
+        if not isinstance(data, dict) or data.get("version") != self.version \
+                or data.get("khard_version") != khard_version \
+                or data.get("config_file") != self._abspath \
+                or data.get("stat") != ContactCache.stat_key(stat):
+            logging.debug("Ignoring outdated cache file %s", self.filename)
+            return None
+        return data["config"]
+
+    def save(self, config):
+        """Store the validated config.
+
+        Errors are logged and otherwise ignored as the cache is only an
+        optimization.
+
+        :param config: the sections of the config, all values must be
+            picklable without importing configobj
+        :type config: dict
+        :returns: None
+        """
+        stat = self._stat()
+        # The file might be changed again within the resolution of the file
+        # system time stamps.
+        if stat is None or time.time() - stat.st_mtime_ns / 1e9 < \
+                ContactCache._racy_interval:
+            return
+        data = {"version": self.version, "khard_version": khard_version,
+                "config_file": self._abspath,
+                "stat": ContactCache.stat_key(stat), "config": config}
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            with atomic_write(self.filename, mode="wb",
+                              overwrite=True) as filehandle:
+                pickle.dump(data, filehandle, pickle.HIGHEST_PROTOCOL)
+        except (OSError, pickle.PicklingError) as err:
+            logging.debug("Could not write cache file %s: %s", self.filename,
+                          err)
@@ -8,6 +8,9 @@ which can be found here:
 """
 
 import datetime
+import functools
+import hashlib
+import io
 import locale
 import logging
 import os
@@ -16,14 +19,15 @@ import sys
 import time
 
 from atomicwrites import atomic_write
-import vobject
-
-import ruamel.yaml
-from ruamel.yaml import YAML
 
 from . import helpers
+from . import instrumentation
 from .object_type import ObjectType
 
+# vobject, ruamel.yaml and unidecode are slow to import.  They are imported in
+# the functions that use them so that commands which do not need them start
+# faster.
+
 
 def convert_to_vcard(name, value, allowed_object_type):
     """converts user input into vcard compatible data structures
@@ -57,6 +61,63 @@ def convert_to_vcard(name, value, allowed_object_type):
     raise ValueError("Error: " + name +
                      " must be a string or a list with strings.")
 
+def _copy(value):
+    """Copy the dicts and lists in a value, everything else is shared.
+
+    :param value: the value to copy
+    :type value: object
+    :returns: the copy
+    :rtype: object
+    """
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _memoize(method):
+    """Cache the result of a method of a VCardWrapper until the vCard is
+    changed by a method decorated with _mutator.
+
+    Every call returns a copy of the dicts and lists in the cached result so
+    that callers can change it without changing later results.
+
+    :param method: the method to decorate, all its arguments must be hashable
+    :type method: callable
+    :returns: the decorated method
+    :rtype: callable
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        key = (method.__name__,) + args
+        try:
+            result = self._memo[key]
+        except KeyError:
+            result = self._memo[key] = method(self, *args)
+        return _copy(result)
+    return wrapper
+
+
+def _mutator(method):
+    """Mark a method of a VCardWrapper that changes the vCard so that all
+    results cached by _memoize are discarded.
+
+    :param method: the method to decorate
+    :type method: callable
+    :returns: the decorated method
+    :rtype: callable
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._memo.clear()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._memo.clear()
+    return wrapper
+
+
 class VCardWrapper:
     """Wrapper class around a vobject.vCard object.
 
@@ -86,7 +147,13 @@ class VCardWrapper:
         :param vcard: the vCard to wrap
         :type vcard: vobject.vCard
         """
+        self._memo = {}
+        self._groups = None
         self.vcard = vcard
+        self._check_version()
+
+    def _check_version(self):
+        """Make sure the wrapped vCard has a supported version."""
         if self.version == "":
             logging.warning("Wrapping unversioned vCard object, setting "
                             "version to %s.", self._default_version)
@@ -113,6 +180,89 @@ class VCardWrapper:
         except AttributeError:
             return ""
 
+    def _get_children(self, name):
+        """Get all properties with the given name from the underlying vCard.
+
+        :param name: the name of the properties (should be UPPER case)
+        :type name: str
+        :returns: the properties in the order of the vCard
+        :rtype: list(vobject.base.ContentLine)
+        """
+        return list(self.vcard.contents.get(name.lower(), []))
+
+    def _get_group(self, group):
+        """Get all properties in the given group.
+
+        The groups of all properties are indexed on first use, the index is
+        kept up to date by _add_child and _remove_child.
+
+        :param group: the name of the group
+        :type group: str
+        :returns: the properties in the group
+        :rtype: list(vobject.base.ContentLine)
+        """
+        if self._groups is None:
+            self._groups = {}
+            for child in self.vcard.getChildren():
+                if child.group:
+                    self._groups.setdefault(child.group, []).append(child)
+        return self._groups.get(group, [])
+
+    def _add_child(self, name, group=None):
+        """Add a new property to the underlying vCard.
+
+        :param name: the name of the property
+        :type name: str
+        :param group: the group of the property
+        :type group: str
+        :returns: the new property
+        :rtype: vobject.base.ContentLine
+        """
+        child = self.vcard.add(name, group)
+        if group and self._groups is not None:
+            self._groups.setdefault(group, []).append(child)
+        return child
+
+    def _remove_child(self, child):
+        """Remove a property from the underlying vCard.
+
+        :param child: the property to remove
+        :type child: vobject.base.ContentLine
+        :returns: None
+        """
+        self.vcard.remove(child)
+        if child.group and self._groups is not None:
+            members = self._groups.get(child.group, [])
+            if child in members:
+                members.remove(child)
+
+    def _set_group(self, child, group):
+        """Move a property of the underlying vCard to a group.
+
+        :param child: the property
+        :type child: vobject.base.ContentLine
+        :param group: the name of the new group
+        :type group: str
+        :returns: None
+        """
+        if self._groups is not None:
+            if child.group and child in self._groups.get(child.group, []):
+                self._groups[child.group].remove(child)
+            self._groups.setdefault(group, []).append(child)
+        child.group = group
+
+    def _count_labelled_groups(self, prefix):
+        """Count the X-ABLABEL properties in groups starting with prefix.
+
+        :param prefix: the prefix of the group names
+        :type prefix: str
+        :returns: the number of labels
+        :rtype: int
+        """
+        return len([label for label in self._get_children("X-ABLABEL")
+                    if label.group and label.group.startswith(prefix)])
+
+    @_memoize
     def _get_multi_property(self, name):
         """Get a vCard property that can exist more than once.
 
@@ -129,15 +279,15 @@ class VCardWrapper:
         :rtype: list
         """
         values = []
-        for child in self.vcard.getChildren():
-            if child.name == name:
-                ablabel = self._get_ablabel(child)
-                if ablabel:
-                    values.append(ablabel + ": " + child.value)
-                else:
-                    values.append(child.value)
+        for child in self._get_children(name):
+            ablabel = self._get_ablabel(child)
+            if ablabel:
+                values.append(ablabel + ": " + child.value)
+            else:
+                values.append(child.value)
         return sorted(values)
 
+    @_mutator
     def _delete_vcard_object(self, name):
         """Delete all fields with the given name from the underlying vCard.
 
@@ -151,17 +301,15 @@ class VCardWrapper:
         """
         # first collect all vcard items, which should be removed
         to_be_removed = []
-        for child in self.vcard.getChildren():
-            if child.name == name:
-                if child.group:
-                    for label in self.vcard.getChildren():
-                        if label.name == "X-ABLABEL" and \
-                                label.group == child.group:
-                            to_be_removed.append(label)
-                to_be_removed.append(child)
+        for child in self._get_children(name):
+            if child.group:
+                for label in self._get_group(child.group):
+                    if label.name == "X-ABLABEL":
+                        to_be_removed.append(label)
+            to_be_removed.append(child)
         # then delete them one by one
         for item in to_be_removed:
-            self.vcard.remove(item)
+            self._remove_child(item)
 
     @staticmethod
     def _parse_type_value(types, supported_types):
@@ -208,8 +356,8 @@ class VCardWrapper:
         type_list = []
         # try to find label group for custom value type
         if object.group:
-            for label in self.vcard.getChildren():
-                if label.name == "X-ABLABEL" and label.group == object.group:
+            for label in self._get_group(object.group):
+                if label.name == "X-ABLABEL":
                     custom_type = label.value.strip()
                     if custom_type:
                         type_list.append(custom_type)
@@ -249,6 +397,7 @@ class VCardWrapper:
         return self._get_string_field("version")
 
     @version.setter
+    @_mutator
     def version(self, value):
         if value not in self._supported_versions:
             logging.warning("Setting vcard version to unsupported version %s",
@@ -256,7 +405,7 @@ class VCardWrapper:
         # All vCards should only always have one version, this is a requirement
         # for version 4 but also makes sense for all other versions.
         self._delete_vcard_object("VERSION")
-        version = self.vcard.add("version")
+        version = self._add_child("version")
         version.value = convert_to_vcard("version", value, ObjectType.string)
 
     @property
@@ -264,22 +413,25 @@ class VCardWrapper:
         return self._get_string_field("uid")
 
     @uid.setter
+    @_mutator
     def uid(self, value):
         # All vCards should only always have one UID, this is a requirement
         # for version 4 but also makes sense for all other versions.
         self._delete_vcard_object("UID")
-        uid = self.vcard.add('uid')
+        uid = self._add_child('uid')
         uid.value = convert_to_vcard("uid", value, ObjectType.string)
 
+    @_mutator
     def _update_revision(self):
         # All vCards should only always have one revision, this is a
         # requirement for version 4 but also makes sense for all other
         # versions.
         self._delete_vcard_object("REV")
-        rev = self.vcard.add('rev')
+        rev = self._add_child('rev')
         rev.value = datetime.datetime.now().strftime("%Y%mdT%H%M%SZ")
 
     @property
+    @_memoize
     def birthday(self):
         """Return the birthday as a datetime object or a string depending on
         weather it is of type text or not.  If no birthday is present in the
@@ -302,6 +454,7 @@ class VCardWrapper:
         return None
 
     @birthday.setter
+    @_mutator
     def birthday(self, date):
         """Store the given date as BDAY in the vcard.
 
@@ -312,12 +465,13 @@ class VCardWrapper:
         if value is None:
             logging.warning('Failed to set anniversary to %s', date)
             return
-        bday = self.vcard.add('bday')
+        bday = self._add_child('bday')
         bday.value = value
         if text:
             bday.params['VALUE'] = ['text']
 
     @property
+    @_memoize
     def anniversary(self):
         """:returns: contacts anniversary or None if not available
             :rtype: datetime.datetime or str
@@ -352,16 +506,14 @@ class VCardWrapper:
         """
         label = ""
         if item.group:
-            count = 0
-            for child in self.vcard.getChildren():
-                if child.group and child.group == item.group:
-                    count += 1
-                    if child.name == "X-ABLABEL":
-                        if label == "":
-                            label = child.value
-                        else:
-                            return ""
-            if count != 2:
+            members = self._get_group(item.group)
+            for child in members:
+                if child.name == "X-ABLABEL":
+                    if label == "":
+                        label = child.value
+                    else:
+                        return ""
+            if len(members) != 2:
                 label = ""
         return label
 
@@ -379,45 +531,44 @@ class VCardWrapper:
         counter = 1
         while True:
             group_name = "item%s%d" % (group_type, counter)
-            for child in self.vcard.getChildren():
-                if child.group and child.group ==  group_name:
-                    counter += 1
-                    break
+            if self._get_group(group_name):
+                counter += 1
             else:
                 return group_name
 
+    @_mutator
     def _add_labelled_object(self, obj_type, user_input, name_groups=False):
-        obj = self.vcard.add(obj_type)
         if isinstance(user_input, dict):
             if len(user_input) > 1:
                 raise ValueError("Error: %s must be a string or a dict " +\
                                  "containing one key/value pair." % obj_type)
             label = [i for i in user_input][0]
             group_name = self._get_new_group(obj_type if name_groups else "")
-            obj.group = group_name
+            obj = self._add_child(obj_type, group_name)
             obj.value = convert_to_vcard(obj_type, user_input[label],
                                                  ObjectType.string)
-            ablabel_obj = self.vcard.add('X-ABLABEL')
-            ablabel_obj.group = group_name
+            ablabel_obj = self._add_child('X-ABLABEL', group_name)
             ablabel_obj.value = label
         else:
+            obj = self._add_child(obj_type)
             obj.value = convert_to_vcard(obj_type, user_input,
                                          ObjectType.string)
 
     @anniversary.setter
+    @_mutator
     def anniversary(self, date):
         value, text = self._prepare_birthday_value(date)
         if value is None:
             logging.warning('Failed to set anniversary to %s', date)
             return
         if text:
-            anniversary = self.vcard.add('anniversary')
+            anniversary = self._add_child('anniversary')
             anniversary.params['VALUE'] = ['text']
             anniversary.value = value
         elif self.version == "4.0":
-            self.vcard.add('anniversary').value = value
+            self._add_child('anniversary').value = value
         else:
-            self.vcard.add('x-anniversary').value = value
+            self._add_child('x-anniversary').value = value
 
     def _prepare_birthday_value(self, date):
         """Prepare a value to be stored in a BDAY or ANNIVERSARY attribute.
@@ -458,6 +609,7 @@ class VCardWrapper:
         return self._get_string_field("fn")
 
     @formatted_name.setter
+    @_mutator
     def formatted_name(self, value):
         """Set the FN field to the new value.
 
@@ -469,7 +621,7 @@ class VCardWrapper:
         :type value: str
         """
         self._delete_vcard_object("FN")
-        self.vcard.add("FN").value = convert_to_vcard("FN", value,
+        self._add_child("FN").value = convert_to_vcard("FN", value,
                                                       ObjectType.string)
 
     def _get_names_part(self, part):
@@ -482,13 +634,23 @@ class VCardWrapper:
 
         """
         try:
-            the_list = getattr(self.vcard.n.value, part)
+            return self._name_part_to_list(getattr(self.vcard.n.value, part))
         except AttributeError:
             return []
-        else:
-            # check if list only contains empty strings
-            if not ''.join(the_list):
-                return []
+
+    @staticmethod
+    def _name_part_to_list(the_list):
+        """Convert a part of a vobject.vcard.Name to a list.
+
+        :param the_list: the part of the name
+        :type the_list: str or list(str)
+        :returns: the list of entries for this name part
+        :rtype: list(str)
+
+        """
+        # check if list only contains empty strings
+        if not ''.join(the_list):
+            return []
         return the_list if isinstance(the_list, list) else [the_list]
 
     def _get_name_prefixes(self):
@@ -506,6 +668,7 @@ class VCardWrapper:
     def _get_name_suffixes(self):
         return self._get_names_part("suffix")
 
+    @_memoize
     def get_first_name_last_name(self):
         """
         :rtype: str
@@ -521,6 +684,7 @@ class VCardWrapper:
             return helpers.list_to_string(names, " ")
         return self.formatted_name
 
+    @_memoize
     def get_last_name_first_name(self):
         """
         :rtype: str
@@ -543,10 +707,30 @@ class VCardWrapper:
             return helpers.list_to_string(first_and_additional_names, " ")
         return self.formatted_name
 
+    @_memoize
+    def get_sort_key(self, sort):
+        """Get the key to sort contacts by name.
+
+        :param sort: the order of the names, one of "first_name" or
+            "last_name"
+        :type sort: str
+        :returns: the transliterated and lower cased name
+        :rtype: str
+        """
+        from unidecode import unidecode
+        if sort == "first_name":
+            return unidecode(self.get_first_name_last_name()).lower()
+        if sort == "last_name":
+            return unidecode(self.get_last_name_first_name()).lower()
+        raise ValueError(
+            'sort must be "first_name" or "last_name" not {}.'.format(sort))
+
+    @_mutator
     def _add_name(self, prefix, first_name, additional_name, last_name,
                   suffix):
         # n
-        name_obj = self.vcard.add('n')
+        import vobject
+        name_obj = self._add_child('n')
         stringlist = ObjectType.string_or_list_with_strings
         name_obj.value = vobject.vcard.Name(
             prefix=convert_to_vcard("name prefix", prefix, stringlist),
@@ -570,6 +754,7 @@ class VCardWrapper:
             self.formatted_name = helpers.list_to_string(names, " ")
 
     @property
+    @_memoize
     def organisations(self):
         """
         :returns: list of organisations, sorted alphabetically
@@ -577,8 +762,9 @@ class VCardWrapper:
         """
         return self._get_multi_property("ORG")
 
+    @_mutator
     def _add_organisation(self, organisation):
-        org_obj = self.vcard.add('org')
+        org_obj = self._add_child('org')
         org_obj.value = convert_to_vcard("organisation", organisation,
                                          ObjectType.list_with_strings)
         # check if fn attribute is already present
@@ -587,115 +773,127 @@ class VCardWrapper:
             org_value = helpers.list_to_string(self.organisations[0], ", ")
             self.formatted_name = org_value.replace("\n", " ").replace("\\",
                                                                        "")
-            showas_obj = self.vcard.add('x-abshowas')
+            showas_obj = self._add_child('x-abshowas')
             showas_obj.value = "COMPANY"
 
     @property
+    @_memoize
     def titles(self):
         """
         :rtype: list(list(str))
         """
         return self._get_multi_property("TITLE")
 
+    @_mutator
     def _add_title(self, title):
-        title_obj = self.vcard.add('title')
+        title_obj = self._add_child('title')
         title_obj.value = convert_to_vcard("title", title, ObjectType.string)
 
     @property
+    @_memoize
     def roles(self):
         """
         :rtype: list(list(str))
         """
         return self._get_multi_property("ROLE")
 
+    @_mutator
     def _add_role(self, role):
-        role_obj = self.vcard.add('role')
+        role_obj = self._add_child('role')
         role_obj.value = convert_to_vcard("role", role, ObjectType.string)
 
     @property
+    @_memoize
     def nicknames(self):
         """
         :rtype: list(list(str))
         """
         return self._get_multi_property("NICKNAME")
 
+    @_mutator
     def _add_nickname(self, nickname):
-        nickname_obj = self.vcard.add('nickname')
+        nickname_obj = self._add_child('nickname')
         nickname_obj.value = convert_to_vcard("nickname", nickname,
                                               ObjectType.string)
 
     @property
+    @_memoize
     def notes(self):
         """
         :rtype: list(list(str))
         """
         return self._get_multi_property("NOTE")
 
+    @_mutator
     def _add_note(self, note):
-        note_obj = self.vcard.add('note')
+        note_obj = self._add_child('note')
         note_obj.value = convert_to_vcard("note", note, ObjectType.string)
 
     @property
+    @_memoize
     def webpages(self):
         """
         :rtype: list(str)
         """
         return self._get_multi_property("URL")
 
+    @_mutator
     def _add_webpage(self, webpage):
         self._add_labelled_object("url", webpage, True)
 
     @property
+    @_memoize
     def categories(self):
         """
         :rtype: list(str) or list(list(str))
         """
         category_list = []
-        for child in self.vcard.getChildren():
-            if child.name == "CATEGORIES":
-                value = child.value
-                category_list.append(
-                    value if isinstance(value, list) else [value])
+        for child in self._get_children("CATEGORIES"):
+            value = child.value
+            category_list.append(
+                value if isinstance(value, list) else [value])
         if len(category_list) == 1:
             return category_list[0]
         return sorted(category_list)
 
+    @_mutator
     def _add_category(self, categories):
         """ categories variable must be a list """
-        categories_obj = self.vcard.add('categories')
+        categories_obj = self._add_child('categories')
         categories_obj.value = convert_to_vcard("category", categories,
                                                 ObjectType.list_with_strings)
 
     @property
+    @_memoize
     def phone_numbers(self):
         """
         : returns: dict of type and phone number list
         :rtype: dict(str, list(str))
         """
         phone_dict = {}
-        for child in self.vcard.getChildren():
-            if child.name == "TEL":
-                # phone types
-                type = helpers.list_to_string(
-                    self._get_types_for_vcard_object(child, "voice"), ", ")
-                if type not in phone_dict:
-                    phone_dict[type] = []
-                # phone value
-                #
-                # vcard version 4.0 allows URI scheme "tel" in phone attribute value
-                # Doc: https://tools.ietf.org/html/rfc6350#section-6.4.1
-                # example: TEL;VALUE=uri;PREF=1;TYPE="voice,home":tel:+1-555-555-5555;ext=5555
-                if child.value.lower().startswith("tel:"):
-                    # cut off the "tel:" uri prefix
-                    phone_dict[type].append(child.value[4:])
-                else:
-                    # free text field
-                    phone_dict[type].append(child.value)
+        for child in self._get_children("TEL"):
+            # phone types
+            type = helpers.list_to_string(
+                self._get_types_for_vcard_object(child, "voice"), ", ")
+            if type not in phone_dict:
+                phone_dict[type] = []
+            # phone value
+            #
+            # vcard version 4.0 allows URI scheme "tel" in phone attribute value
+            # Doc: https://tools.ietf.org/html/rfc6350#section-6.4.1
+            # example: TEL;VALUE=uri;PREF=1;TYPE="voice,home":tel:+1-555-555-5555;ext=5555
+            if child.value.lower().startswith("tel:"):
+                # cut off the "tel:" uri prefix
+                phone_dict[type].append(child.value[4:])
+            else:
+                # free text field
+                phone_dict[type].append(child.value)
         # sort phone number lists
         for number_list in phone_dict.values():
             number_list.sort()
         return phone_dict
 
+    @_mutator
     def _add_phone_number(self, type, number):
         standard_types, custom_types, pref = self._parse_type_value(
             helpers.string_to_list(type, ","), self.phone_types_v4 if
@@ -708,7 +906,7 @@ class VCardWrapper:
                              "than one custom label: " +
                              helpers.list_to_string(custom_types, ", "))
         else:
-            phone_obj = self.vcard.add('tel')
+            phone_obj = self._add_child('tel')
             if self.version == "4.0":
                 phone_obj.value = "tel:%s" % convert_to_vcard(
                     "phone number", number, ObjectType.string)
@@ -723,36 +921,32 @@ class VCardWrapper:
             if standard_types:
                 phone_obj.params['TYPE'] = standard_types
             if custom_types:
-                custom_label_count = 0
-                for label in self.vcard.getChildren():
-                    if label.name == "X-ABLABEL" and label.group.startswith(
-                            "itemtel"):
-                        custom_label_count += 1
+                custom_label_count = self._count_labelled_groups("itemtel")
                 group_name = "itemtel%d" % (custom_label_count + 1)
-                phone_obj.group = group_name
-                label_obj = self.vcard.add('x-ablabel')
-                label_obj.group = group_name
+                self._set_group(phone_obj, group_name)
+                label_obj = self._add_child('x-ablabel', group_name)
                 label_obj.value = custom_types[0]
 
     @property
+    @_memoize
     def emails(self):
         """
         : returns: dict of type and email address list
         :rtype: dict(str, list(str))
         """
         email_dict = {}
-        for child in self.vcard.getChildren():
-            if child.name == "EMAIL":
-                type = helpers.list_to_string(
-                    self._get_types_for_vcard_object(child, "internet"), ", ")
-                if type not in email_dict:
-                    email_dict[type] = []
-                email_dict[type].append(child.value)
+        for child in self._get_children("EMAIL"):
+            type = helpers.list_to_string(
+                self._get_types_for_vcard_object(child, "internet"), ", ")
+            if type not in email_dict:
+                email_dict[type] = []
+            email_dict[type].append(child.value)
         # sort email address lists
         for email_list in email_dict.values():
             email_list.sort()
         return email_dict
 
+    @_mutator
     def add_email(self, type, address):
         standard_types, custom_types, pref = self._parse_type_value(
             helpers.string_to_list(type, ","), self.email_types_v4 if
@@ -765,7 +959,7 @@ class VCardWrapper:
                              "than one custom label: " +
                              helpers.list_to_string(custom_types, ", "))
         else:
-            email_obj = self.vcard.add('email')
+            email_obj = self._add_child('email')
             email_obj.value = convert_to_vcard("email address", address,
                                                ObjectType.string)
             if self.version == "4.0":
@@ -777,37 +971,32 @@ class VCardWrapper:
             if standard_types:
                 email_obj.params['TYPE'] = standard_types
             if custom_types:
-                custom_label_count = 0
-                for label in self.vcard.getChildren():
-                    if label.name == "X-ABLABEL" and label.group.startswith(
-                            "itememail"):
-                        custom_label_count += 1
+                custom_label_count = self._count_labelled_groups("itememail")
                 group_name = "itememail%d" % (custom_label_count + 1)
-                email_obj.group = group_name
-                label_obj = self.vcard.add('x-ablabel')
-                label_obj.group = group_name
+                self._set_group(email_obj, group_name)
+                label_obj = self._add_child('x-ablabel', group_name)
                 label_obj.value = custom_types[0]
 
     @property
+    @_memoize
     def post_addresses(self):
         """
         : returns: dict of type and post address list
         :rtype: dict(str, list(dict(str,list|str)))
         """
         post_adr_dict = {}
-        for child in self.vcard.getChildren():
-            if child.name == "ADR":
-                type = helpers.list_to_string(self._get_types_for_vcard_object(
-                    child, "home"), ", ")
-                if type not in post_adr_dict:
-                    post_adr_dict[type] = []
-                post_adr_dict[type].append({"box": child.value.box,
-                                            "extended": child.value.extended,
-                                            "street": child.value.street,
-                                            "code": child.value.code,
-                                            "city": child.value.city,
-                                            "region": child.value.region,
-                                            "country": child.value.country})
+        for child in self._get_children("ADR"):
+            type = helpers.list_to_string(self._get_types_for_vcard_object(
+                child, "home"), ", ")
+            if type not in post_adr_dict:
+                post_adr_dict[type] = []
+            post_adr_dict[type].append({"box": child.value.box,
+                                        "extended": child.value.extended,
+                                        "street": child.value.street,
+                                        "code": child.value.code,
+                                        "city": child.value.city,
+                                        "region": child.value.region,
+                                        "country": child.value.country})
         # sort post address lists
         for post_adr_list in post_adr_dict.values():
             post_adr_list.sort(key=lambda x: (
@@ -815,6 +1004,7 @@ class VCardWrapper:
                 helpers.list_to_string(x['street'], " ").lower()))
         return post_adr_dict
 
+    @_memoize
     def get_formatted_post_addresses(self):
         formatted_post_adr_dict = {}
         for type, post_adr_list in self.post_addresses.items():
@@ -857,6 +1047,7 @@ class VCardWrapper:
                 formatted_post_adr_dict[type].append('\n'.join(strings))
         return formatted_post_adr_dict
 
+    @_mutator
     def _add_post_address(self, type, box, extended, street, code, city,
                           region, country):
         standard_types, custom_types, pref = self._parse_type_value(
@@ -871,7 +1062,8 @@ class VCardWrapper:
                              "than one custom " "label: " +
                              helpers.list_to_string(custom_types, ", "))
         else:
-            adr_obj = self.vcard.add('adr')
+            import vobject
+            adr_obj = self._add_child('adr')
             adr_obj.value = vobject.vcard.Address(
                 box=convert_to_vcard("box address field", box,
                                      ObjectType.string_or_list_with_strings),
@@ -898,22 +1090,22 @@ class VCardWrapper:
             if standard_types:
                 adr_obj.params['TYPE'] = standard_types
             if custom_types:
-                custom_label_count = 0
-                for label in self.vcard.getChildren():
-                    if label.name == "X-ABLABEL" and label.group.startswith(
-                            "itemadr"):
-                        custom_label_count += 1
+                custom_label_count = self._count_labelled_groups("itemadr")
                 group_name = "itemadr%d" % (custom_label_count + 1)
-                adr_obj.group = group_name
-                label_obj = self.vcard.add('x-ablabel')
-                label_obj.group = group_name
+                self._set_group(adr_obj, group_name)
+                label_obj = self._add_child('x-ablabel', group_name)
                 label_obj.value = custom_types[0]
 
 
 class CarddavObject(VCardWrapper):
 
+    # These properties can be read from a vCard file with a cheap line scanner
+    # so that they are available before the file is fully parsed.
+    _header_fields = ("VERSION", "UID", "FN", "N")
+
     def __init__(self, address_book, filename, supported_private_objects,
-                 vcard_version, localize_dates):
+                 vcard_version, localize_dates, vcard=None, header=None,
+                 lazy=False, contents=None):
         """Initialize the vcard object.
 
         :param address_book: a reference to the address book where this vcard
@@ -931,16 +1123,38 @@ class CarddavObject(VCardWrapper):
         :param localize_dates: should the formatted output of anniversary and
             birthday be localized or should the isoformat be used instead
         :type localize_dates: bool
+        :param vcard: an already parsed vCard to use instead of reading the
+            file or, if header is given, a function that returns it
+        :type vcard: vobject.vCard or callable or NoneType
+        :param header: the header fields of the vCard (see _scan_header),
+            parsing the vCard is deferred until it is needed
+        :type header: dict or NoneType
+        :param lazy: only scan the header fields of the file and defer
+            parsing it until another property is needed
+        :type lazy: bool
+        :param contents: the contents of the file if they where already read
+        :type contents: str or NoneType
 
         """
-        self.vcard = None
+        self._memo = {}
+        self._groups = None
+        self._vcard = None
+        self._loader = None
+        self._header = None
         self.address_book = address_book
         self.filename = filename
         self.supported_private_objects = supported_private_objects
         self.localize_dates = localize_dates
 
         # load vcard
-        if self.filename is None:
+        if header is not None:
+            # the vcard will be loaded on first access
+            self._wrap_lazily(header, vcard)
+        elif vcard is not None:
+            # use the vcard that was already parsed elsewhere
+            super().__init__(vcard)
+        elif self.filename is None:
+            import vobject
             # create new vcard object
             super().__init__(vobject.vCard())
             # add uid
@@ -952,15 +1166,133 @@ class CarddavObject(VCardWrapper):
 
         else:
             # create vcard from .vcf file
-            with open(self.filename, "r") as file:
-                contents = file.read()
-            # create vcard object
-            try:
-                vcard = vobject.readOne(contents)
-            except Exception:
-                # if creation fails, try to repair some vcard attributes
-                vcard = vobject.readOne(self._filter_invalid_tags(contents))
-            super().__init__(vcard)
+            if contents is None:
+                with open(self.filename, "r") as file:
+                    contents = file.read()
+            header = self._scan_header(contents) if lazy else None
+            if header is None:
+                super().__init__(self._parse(contents))
+            else:
+                self._wrap_lazily(header, lambda: self._parse(contents))
+
+    @property
+    def vcard(self):
+        """The wrapped vobject.vCard, it is parsed on first access if the
+        contact was loaded lazily.
+        """
+        if self._loader is not None:
+            loader = self._loader
+            self._loader = None
+            self._vcard = loader()
+            self._header = None
+        return self._vcard
+
+    @vcard.setter
+    def vcard(self, vcard):
+        self._memo.clear()
+        self._groups = None
+        self._vcard = vcard
+        self._loader = None
+        self._header = None
+
+    def _wrap_lazily(self, header, loader):
+        """Wrap a vCard that is only loaded when it is first needed.
+
+        :param header: the header fields of the vCard
+        :type header: dict
+        :param loader: a function that returns the full vCard
+        :type loader: callable
+        :returns: None
+        """
+        self._loader = loader
+        self._header = header
+        self._check_version()
+
+    @classmethod
+    def _parse(cls, contents):
+        """Parse the contents of a vCard file.
+
+        :param contents: the contents of a .vcf file
+        :type contents: str
+        :returns: the parsed vCard
+        :rtype: vobject.vCard
+        :throws: vobject.base.ParseError
+        """
+        import vobject
+        try:
+            return vobject.readOne(contents)
+        except Exception:
+            # if creation fails, try to repair some vcard attributes
+            vcard = vobject.readOne(cls._filter_invalid_tags(contents))
+            instrumentation.count("repaired vcards")
+            return vcard
+
+    @classmethod
+    def _scan_header(cls, contents):
+        """Extract the header fields from the contents of a vCard file without
+        building the full vobject component tree.
+
+        The values are decoded the same way as vobject does it.  If the file
+        contains anything that the scanner can not handle None is returned
+        and the file has to be parsed completely.
+
+        :param contents: the contents of a .vcf file
+        :type contents: str
+        :returns: the values of the header fields by lower case field name,
+            missing fields are None
+        :rtype: dict or NoneType
+        """
+        import vobject
+        header = dict.fromkeys(field.lower() for field in cls._header_fields)
+        depth = 0
+        try:
+            for line, number in vobject.base.getLogicalLines(
+                    io.StringIO(contents), allowQP=False):
+                name, params, value, group = vobject.base.parseLine(line,
+                                                                    number)
+                name = name.upper()
+                if name == "BEGIN":
+                    depth += 1
+                    if depth > 1 or value.upper() != "VCARD":
+                        # nested or other components
+                        return None
+                elif name == "END":
+                    depth -= 1
+                    if depth != 0 or value.upper() != "VCARD":
+                        return None
+                elif depth == 0:
+                    # content after the first vCard or before BEGIN
+                    return None
+                elif name in cls._header_fields and \
+                        header[name.lower()] is None:
+                    if params:
+                        # encodings and the like are left to vobject
+                        return None
+                    if name == "N":
+                        value = vobject.vcard.Name(**dict(zip(
+                            vobject.vcard.NAME_ORDER,
+                            vobject.vcard.splitFields(value))))
+                    else:
+                        value = vobject.icalendar.stringToTextValues(
+                            value)[0]
+                    header[name.lower()] = value
+        except vobject.base.ParseError:
+            return None
+        if depth != 0 or header["version"] is None:
+            return None
+        return header
+
+    def _get_string_field(self, field):
+        if self._header is not None and field in self._header:
+            return self._header[field] or ""
+        return super()._get_string_field(field)
+
+    def _get_names_part(self, part):
+        if self._header is None:
+            return super()._get_names_part(part)
+        if self._header["n"] is None:
+            return []
+        return self._name_part_to_list(getattr(self._header["n"], part))
 
     #######################################
     # factory methods to create new contact
@@ -975,13 +1307,71 @@ class CarddavObject(VCardWrapper):
 
     @classmethod
     def from_file(cls, address_book, filename, supported_private_objects,
-                  localize_dates):
+                  localize_dates, lazy=False, contents=None):
         """
         Use this if you want to create a new contact from an existing .vcf
-        file.
+        file.  If lazy is True only the header fields are read and the file is
+        parsed when it is first needed.  If the contents of the file are
+        already known they can be given to avoid reading it again.
         """
         return cls(address_book, filename, supported_private_objects, None,
-                   localize_dates)
+                   localize_dates, lazy=lazy, contents=contents)
+
+    @classmethod
+    def from_string(cls, address_book, contents, supported_private_objects,
+                    localize_dates):
+        """
+        Use this if you want to create a contact from the text of a vCard that
+        is not stored in a file yet, e.g. one card of an imported file.
+        """
+        return cls(address_book, None, supported_private_objects, None,
+                   localize_dates, vcard=cls._parse(contents))
+
+    @classmethod
+    def from_vcard(cls, address_book, filename, vcard,
+                   supported_private_objects, localize_dates):
+        """
+        Use this if you want to create a contact from a vCard that was already
+        parsed, e.g. one that was loaded from a cache.
+        """
+        return cls(address_book, filename, supported_private_objects, None,
+                   localize_dates, vcard=vcard)
+
+    @classmethod
+    def from_header(cls, address_book, filename, header, loader,
+                    supported_private_objects, localize_dates,
+                    fingerprint=None, sort_keys=None):
+        """
+        Use this if the header fields of a contact are known, e.g. from a
+        cache, and the full vCard should only be loaded when it is needed.
+        The result of fingerprint() and the sort keys by sort order can be
+        given if they are known, too.
+        """
+        contact = cls(address_book, filename, supported_private_objects, None,
+                      localize_dates, vcard=loader, header=header)
+        if fingerprint is not None:
+            contact._memo[("fingerprint",)] = fingerprint
+        for sort, key in (sort_keys or {}).items():
+            contact._memo[("get_sort_key", sort)] = key
+        return contact
+
+    def get_header(self):
+        """Get the header fields of this contact.
+
+        :returns: the values of the fields in _header_fields that can be
+            passed to from_header
+        :rtype: dict
+        """
+        if self._header is not None:
+            return dict(self._header)
+        header = {}
+        for field in self._header_fields:
+            try:
+                header[field.lower()] = getattr(self.vcard,
+                                                field.lower()).value
+            except AttributeError:
+                header[field.lower()] = None
+        return header
 
     @classmethod
     def from_user_input(cls, address_book, user_input,
@@ -992,6 +1382,23 @@ class CarddavObject(VCardWrapper):
         contact._process_user_input(user_input)
         return contact
 
+    @classmethod
+    def from_user_data(cls, address_book, contact_data,
+                       supported_private_objects, version, localize_dates):
+        """
+        Use this if you want to create a new contact from data that is already
+        structured like the contact template, e.g. a row of an imported file.
+        The contact gets a new uid but no file name.
+        """
+        import vobject
+        vcard = vobject.vCard()
+        vcard.add("version").value = version
+        contact = cls(address_book, None, supported_private_objects, None,
+                      localize_dates, vcard=vcard)
+        contact.uid = helpers.get_random_uid()
+        contact._set_user_data(contact_data)
+        return contact
+
     @classmethod
     def from_existing_contact_with_new_user_input(cls, contact, user_input,
                                                   localize_dates):
@@ -1010,16 +1417,48 @@ class CarddavObject(VCardWrapper):
 
     def __eq__(self, other):
         return isinstance(other, CarddavObject) and \
-            self.print_vcard(show_address_book=False, show_uid=False) == \
-            other.print_vcard(show_address_book=False, show_uid=False)
+            self.fingerprint() == other.fingerprint()
 
     def __ne__(self, other):
         return not self == other
 
+    @_memoize
+    def fingerprint(self):
+        """Compute a hash of the content of this contact.
+
+        Two contacts are equal if their fingerprints are equal.  The content
+        is what print_vcard shows without address book and uid so the
+        fingerprint depends on the supported private objects and the date
+        format, see get_fingerprint_settings.
+
+        :returns: the hex digest of the content
+        :rtype: str
+        """
+        return hashlib.sha1(self.print_vcard(
+            show_address_book=False, show_uid=False).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def get_fingerprint_settings(supported_private_objects, localize_dates):
+        """Describe all settings that influence fingerprint().
+
+        Stored fingerprints can only be reused if these did not change.
+
+        :param supported_private_objects: see __init__
+        :type supported_private_objects: list(str)
+        :param localize_dates: see __init__
+        :type localize_dates: bool
+        :returns: a description of the settings
+        :rtype: str
+        """
+        return repr((list(supported_private_objects), localize_dates,
+                     locale.setlocale(locale.LC_TIME)))
+
     #####################
     # getters and setters
     #####################
 
+    @_memoize
     def _get_formatted_post_addresses(self):
         formatted_post_adr_dict = {}
         for type, post_adr_list in self.post_addresses.items():
@@ -1062,36 +1501,37 @@ class CarddavObject(VCardWrapper):
                 formatted_post_adr_dict[type].append('\n'.join(strings))
         return formatted_post_adr_dict
 
+    @_memoize
     def _get_private_objects(self):
         """
         :rtype: dict(str, list(str))
         """
         private_objects = {}
-        for child in self.vcard.getChildren():
-            if child.name.lower().startswith("x-"):
-                try:
-                    key_index = [
-                        x.lower() for x in self.supported_private_objects
-                    ].index(child.name[2:].lower())
-                except ValueError:
-                    pass
-                else:
-                    key = self.supported_private_objects[key_index]
-                    if key not in private_objects:
-                        private_objects[key] = []
-                    ablabel = self._get_ablabel(child)
-                    private_objects[key].append(ablabel + (": " if ablabel else "") + child.value)
+        seen = set()
+        for key in self.supported_private_objects:
+            # the first of several keys that only differ in case is used
+            if key.lower() in seen:
+                continue
+            seen.add(key.lower())
+            for child in self._get_children("X-" + key.upper()):
+                if key not in private_objects:
+                    private_objects[key] = []
+                ablabel = self._get_ablabel(child)
+                private_objects[key].append(ablabel + (": " if ablabel else "") + child.value)
         # sort private object lists
         for value in private_objects.values():
             value.sort()
         return private_objects
 
+    @_mutator
     def _add_private_object(self, key, value):
         self._add_labelled_object('X-' + key.upper(), value)
 
+    @_memoize
     def get_formatted_anniversary(self):
         return self._format_date_object(self.anniversary, self.localize_dates)
 
+    @_memoize
     def get_formatted_birthday(self):
         return self._format_date_object(self.birthday, self.localize_dates)
 
@@ -1144,7 +1584,8 @@ class CarddavObject(VCardWrapper):
         return contents
 
     def _process_user_input(self, input):
-        yaml_parser = YAML(typ='base')
+        import ruamel.yaml
+        yaml_parser = ruamel.yaml.YAML(typ='base')
         # parse user input string
         try:
             contact_data = yaml_parser.load(input)
@@ -1154,7 +1595,19 @@ class CarddavObject(VCardWrapper):
         else:
             if contact_data is None:
                 raise ValueError("Error: Found no contact information")
+        self._set_user_data(contact_data)
+
+    @_mutator
+    def _set_user_data(self, contact_data):
+        """Replace the data of this contact with the fields of the contact
+        template.
 
+        :param contact_data: the parsed template, mapping the field names of
+            the template to their values
+        :type contact_data: dict
+        :returns: None
+        :throws: ValueError
+        """
         # check for available data
         # at least enter name or organisation
         if not contact_data.get("First name") \
@@ -1587,48 +2040,11 @@ class CarddavObject(VCardWrapper):
                             len(longest_key) + 1, True)
 
             elif line.lower().startswith("anniversary"):
-                anniversary = self.anniversary
-                if anniversary:
-                    if isinstance(anniversary, str):
-                        strings.append("Anniversary : text= %s" % anniversary)
-                    elif (anniversary.year == 1900 and anniversary.month != 0
-                          and anniversary.day != 0 and anniversary.hour == 0
-                          and anniversary.minute == 0
-                          and anniversary.second == 0
-                          and self.version == "4.0"):
-                        strings.append("Anniversary : --%.2d-%.2d"
-                                       % (anniversary.month, anniversary.day))
-                    elif ((anniversary.tzname() and anniversary.tzname()[3:])
-                          or anniversary.hour != 0 or anniversary.minute != 0
-                          or anniversary.second != 0):
-                        strings.append("Anniversary : %s" %
-                                       anniversary.isoformat())
-                    else:
-                        strings.append("Anniversary : %.4d-%.2d-%.2d" % (
-                            anniversary.year, anniversary.month,
-                            anniversary.day))
-                else:
-                    strings.append("Anniversary : ")
+                strings.append("Anniversary : %s" % self._format_template_date(
+                    self.anniversary))
             elif line.lower().startswith("birthday"):
-                birthday = self.birthday
-                if birthday:
-                    if isinstance(birthday, str):
-                        strings.append("Birthday : text= %s" % birthday)
-                    elif birthday.year == 1900 and birthday.month != 0 and \
-                            birthday.day != 0 and birthday.hour == 0 and \
-                            birthday.minute == 0 and birthday.second == 0 and \
-                            self.version == "4.0":
-                        strings.append("Birthday : --%.2d-%.2d"
-                                       % (birthday.month, birthday.day))
-                    elif (birthday.tzname() and birthday.tzname()[3:]) or \
-                            (birthday.hour != 0 or birthday.minute != 0
-                             or birthday.second != 0):
-                        strings.append("Birthday : %s" % birthday.isoformat())
-                    else:
-                        strings.append("Birthday : %.4d-%.2d-%.2d" % (
-                            birthday.year, birthday.month, birthday.day))
-                else:
-                    strings.append("Birthday : ")
+                strings.append("Birthday : %s" % self._format_template_date(
+                    self.birthday))
             elif line.lower().startswith("categories"):
                 strings += helpers.convert_to_yaml(
                     "Categories", self.categories, 0, 11, True)
@@ -1641,6 +2057,65 @@ class CarddavObject(VCardWrapper):
         # posix standard: eof char must be \n
         return '\n'.join(strings) + "\n"
 
+    def _format_template_date(self, date):
+        """Format a birthday or anniversary like the contact template expects
+        it.
+
+        :param date: the date or the text of a date
+        :type date: datetime.datetime or str or NoneType
+        :returns: the formatted date, empty if there is none
+        :rtype: str
+        """
+        if not date:
+            return ""
+        if isinstance(date, str):
+            return "text= %s" % date
+        if date.year == 1900 and date.month != 0 and date.day != 0 and \
+                date.hour == 0 and date.minute == 0 and date.second == 0 and \
+                self.version == "4.0":
+            return "--%.2d-%.2d" % (date.month, date.day)
+        if (date.tzname() and date.tzname()[3:]) or date.hour != 0 or \
+                date.minute != 0 or date.second != 0:
+            return date.isoformat()
+        return "%.4d-%.2d-%.2d" % (date.year, date.month, date.day)
+
+    def get_user_data(self):
+        """Get the data of this contact structured like the contact template.
+
+        This is the inverse of creating a contact with from_user_data().
+        Only the fields that are set are returned, the uid is included.
+
+        :returns: the values by template field name
+        :rtype: dict
+        """
+        data = {"UID": self.uid}
+        for name, value in [
+                ("Prefix", self._get_name_prefixes()),
+                ("First name", self._get_first_names()),
+                ("Additional", self._get_additional_names()),
+                ("Last name", self._get_last_names()),
+                ("Suffix", self._get_name_suffixes()),
+                ("Nickname", self.nicknames),
+                ("Organisation", self.organisations),
+                ("Title", self.titles),
+                ("Role", self.roles),
+                ("Phone", self.phone_numbers),
+                ("Email", self.emails),
+                ("Address", {type: [
+                    {part.capitalize(): value for part, value in adr.items()
+                     if value} for adr in addresses]
+                    for type, addresses in self.post_addresses.items()}),
+                ("Private", self._get_private_objects()),
+                ("Birthday", self._format_template_date(self.birthday)),
+                ("Anniversary", self._format_template_date(
+                    self.anniversary)),
+                ("Categories", self.categories),
+                ("Webpage", self.webpages),
+                ("Note", self.notes)]:
+            if value:
+                data[name] = value
+        return data
+
     def print_vcard(self, show_address_book=True, show_uid=True):
         strings = []
 
@@ -1745,6 +2220,7 @@ class CarddavObject(VCardWrapper):
         # make sure, that every contact contains a uid
         if not self.uid:
             self.uid = helpers.get_random_uid()
+        import vobject
         try:
             with atomic_write(self.filename, overwrite=overwrite) as f:
                 f.write(self.vcard.serialize())
@@ -1,15 +1,14 @@
 # -*- coding: utf-8 -*-
 
-from distutils.spawn import find_executable
 import locale
 import os
 import re
+import shutil
 import sys
 
-import configobj
-
 from .actions import Actions
 from .address_book import AddressBookCollection, VdirAddressBook
+from .cache import ConfigCache, ContactCache
 
 
 def exit(message, prefix="Error in config file\n"):
@@ -29,6 +28,35 @@ def exit(message, prefix="Error in config file\n"):
     sys.exit(3)
 
 
+def find_executable(executable):
+    """Find the full path of an executable.
+
+    This replaces distutils.spawn.find_executable() which is slow to import.
+
+    :param executable: the name or path of the executable
+    :type executable: str
+    :returns: the path of the executable or None if it was not found
+    :rtype: str or NoneType
+    """
+    return shutil.which(executable)
+
+
+def find_config_file(config_file=""):
+    """Find the config file to use.
+
+    :param config_file: the config file given on the command line, if any
+    :type config_file: str
+    :returns: the path to the config file, it might not exist
+    :rtype: str
+    """
+    if config_file == "":
+        xdg_config_home = os.getenv("XDG_CONFIG_HOME",
+                                    os.path.expanduser("~/.config"))
+        config_file = os.getenv("KHARD_CONFIG", os.path.join(
+            xdg_config_home, "khard", "khard.conf"))
+    return config_file
+
+
 class Config:
 
     supported_vcard_versions = ("3.0", "4.0")
@@ -41,15 +69,37 @@ class Config:
         locale.setlocale(locale.LC_ALL, '')
 
         # load config file
-        if config_file == "":
-            xdg_config_home = os.getenv("XDG_CONFIG_HOME",
-                                        os.path.expanduser("~/.config"))
-            config_file = os.getenv("KHARD_CONFIG", os.path.join(
-                xdg_config_home, "khard", "khard.conf"))
+        config_file = find_config_file(config_file)
+        self.filename = config_file
         if not os.path.exists(config_file):
             exit("Config file %s not available" % config_file, prefix="")
 
-        # parse config file contents
+        # The validated config is cached, the config file is only parsed again
+        # if it changed.
+        cache = ConfigCache(config_file)
+        self.config = cache.load()
+        if self.config is None:
+            self._load_config_file(config_file)
+            self.config = self._to_dict(self.config)
+            cache.save(self.config)
+
+        self.debug = self.config["general"]["debug"]
+        self.default_action = self.config["general"]["default_action"]
+        self.sort = self.config["contact table"]["sort"]
+        # The editors are looked up when they are needed for the first time.
+        self._editor = None
+        self._merge_editor = None
+
+        self._load_address_books()
+
+    def _load_config_file(self, config_file):
+        """Parse and validate the config file and fill in default values.
+
+        :param config_file: the path of the config file
+        :type config_file: str
+        :returns: None
+        """
+        import configobj
         try:
             self.config = configobj.ConfigObj(config_file, interpolation=False)
         except configobj.ConfigObjError as err:
@@ -62,56 +112,33 @@ class Config:
         # debug
         self._convert_boolean_config_value(self.config["general"],
                                            "debug", False)
-        self.debug = self.config["general"]["debug"]
-
-        # editor
-        self.editor = self.config["general"].get("editor") \
-            or os.environ.get("EDITOR")
-        if self.editor is None:
-            exit("Set path to your preferred text editor in khard's config "
-                 "file or the $EDITOR shell variable\n"
-                 "Example for khard.conf: editor = vim")
-        self.editor = find_executable(os.path.expanduser(self.editor))
-        if self.editor is None:
-            exit("Invalid editor path or executable not found.")
-
-        # merge editor
-        self.merge_editor = self.config['general'].get("merge_editor") \
-            or os.environ.get("MERGE_EDITOR")
-        if self.merge_editor is None:
-            exit("Set path to your preferred text merge editor in khard's "
-                 "config file or the $MERGE_EDITOR shell variable\n"
-                 "Example for khard.conf: merge_editor = vimdiff")
-        self.merge_editor = find_executable(os.path.expanduser(
-            self.merge_editor))
-        if self.merge_editor is None:
-            exit("Invalid merge editor path or executable not found.")
 
         # default action
-        self.default_action = self.config["general"].get("default_action",
-                                                         "list")
-        if self.default_action is None:
+        default_action = self.config["general"].get("default_action", "list")
+        if default_action is None:
             exit("Missing default action parameter.")
-        elif self.default_action not in Actions.get_actions():
+        elif default_action not in Actions.get_actions():
             exit("Invalid value for default_action parameter\n"
                  "Possible values: %s" % ', '.join(
                      sorted(Actions.get_actions())))
+        self.config["general"]["default_action"] = default_action
 
         # contact table settings
         if "contact table" not in self.config:
             self.config['contact table'] = {}
 
         # sort contact table by first or last name
-        self.sort = self.config["contact table"].get("sort", "first_name")
-        if self.sort not in ["first_name", "last_name"]:
+        sort = self.config["contact table"].get("sort", "first_name")
+        if sort not in ["first_name", "last_name"]:
             exit("Invalid value for sort parameter\n"
                  "Possible values: first_name, last_name")
+        self.config["contact table"]["sort"] = sort
 
         # display names in contact table by first or last name
         if "display" not in self.config['contact table']:
             # if display by name attribute is not present in the config file
             # use the sort attribute value for backwards compatibility
-            self.config['contact table']['display'] = self.sort
+            self.config['contact table']['display'] = sort
         elif self.config['contact table']['display'] not in ["first_name",
                                                              "last_name"]:
             exit("Invalid value for display parameter\n"
@@ -173,6 +200,15 @@ class Config:
                     exit("A \"-\" in a private object label must be at least "
                          "surrounded by one letter or digit.")
 
+        # country calling code and trunk prefix to normalize phone numbers
+        for name, default in (("phone_country_code", ""),
+                              ("phone_trunk_prefix", "0")):
+            if name not in self.config['vcard']:
+                self.config['vcard'][name] = default
+            elif not re.match(r"^\d*$", self.config['vcard'][name]):
+                exit("Invalid value for %s parameter\n"
+                     "Only digits are allowed" % name)
+
         # preferred vcard version
         if "preferred_version" not in self.config['vcard']:
             self.config['vcard']['preferred_version'] = "3.0"
@@ -187,19 +223,65 @@ class Config:
         # skip unparsable vcards
         self._convert_boolean_config_value(self.config["vcard"],
                                            "skip_unparsable", False)
-
-        # load address books
+        # cache parsed vcards on disk
+        self._convert_boolean_config_value(self.config["vcard"], "cache",
+                                           True)
+        # maintain a full text index to speed up searching
+        self._convert_boolean_config_value(self.config["vcard"],
+                                           "search_index", False)
+        # defer parsing vcards until more than the name and uid are needed
+        self._convert_boolean_config_value(self.config["vcard"],
+                                           "lazy_parsing", False)
+
+        # number of processes to parse vcard files, 0 means one per cpu
+        workers = str(self.config['vcard'].get("parse_workers", 0))
+        if not re.match(r"^\d+$", workers):
+            exit("Invalid value for parse_workers parameter\n"
+                 "Possible values: 0 (one per cpu) or a positive number")
+        self.config['vcard']['parse_workers'] = int(workers)
+        # number of threads to read vcard files ahead of parsing them
+        threads = str(self.config['vcard'].get("io_threads", 4))
+        if not re.match(r"^\d+$", threads):
+            exit("Invalid value for io_threads parameter\n"
+                 "Possible values: 0 (no read ahead) or a positive number")
+        self.config['vcard']['io_threads'] = int(threads)
+
+        # address books
         if "addressbooks" not in self.config:
             exit('Missing main section "[addressbooks]".')
         if not self.config['addressbooks'].keys():
             exit("No address book entries available.")
+
+    @classmethod
+    def _to_dict(cls, section):
+        """Convert a config section and its subsections to plain dicts.
+
+        :param section: the config or a section of it
+        :type section: dict
+        :returns: the same items in plain dicts
+        :rtype: dict
+        """
+        return {key: cls._to_dict(value) if isinstance(value, dict) else value
+                for key, value in section.items()}
+
+    def _load_address_books(self):
+        """Create the address books that are listed in the config.
+
+        :returns: None
+        """
         section = self.config['addressbooks']
         kwargs = {'private_objects': self.get_supported_private_objects(),
                   'localize_dates': self.localize_dates(),
                   'skip': self.skip_unparsable()}
+        vdir_kwargs = dict(kwargs, use_cache=self.use_cache(),
+                           use_search_index=self.use_search_index(),
+                           lazy=self.lazy_parsing(),
+                           workers=self.parse_workers(),
+                           io_threads=self.io_threads())
         try:
             self.abook = AddressBookCollection(
-                "tmp", [VdirAddressBook(name, section[name]['path'], **kwargs)
+                "tmp", [VdirAddressBook(name, section[name]['path'],
+                                        **vdir_kwargs)
                         for name in section], **kwargs)
         except KeyError as err:
             exit('Missing path to the "{}" address book.'.format(err.args[0]))
@@ -207,6 +289,50 @@ class Config:
             exit(str(err))
         self.abooks = [self.abook.get_abook(name) for name in section]
 
+    def _find_editor(self, option, variable, description, example):
+        """Look up an editor from the config or the environment in $PATH.
+
+        This function doesn't return if the editor is not found, it calls
+        sys.exit.
+
+        :param option: the name of the option in the general section
+        :type option: str
+        :param variable: the environment variable to use if the option is not
+            set
+        :type variable: str
+        :param description: the kind of editor for error messages
+        :type description: str
+        :param example: an example value for the option
+        :type example: str
+        :returns: the path of the editor
+        :rtype: str
+        """
+        editor = self.config["general"].get(option) or os.environ.get(variable)
+        if editor is None:
+            exit("Set path to your preferred text %s in khard's config file "
+                 "or the $%s shell variable\nExample for khard.conf: %s = %s"
+                 % (description, variable, option, example))
+        editor = find_executable(os.path.expanduser(editor))
+        if editor is None:
+            exit("Invalid %s path or executable not found." % description)
+        return editor
+
+    @property
+    def editor(self):
+        """The path of the text editor."""
+        if self._editor is None:
+            self._editor = self._find_editor("editor", "EDITOR", "editor",
+                                             "vim")
+        return self._editor
+
+    @property
+    def merge_editor(self):
+        """The path of the merge editor."""
+        if self._merge_editor is None:
+            self._merge_editor = self._find_editor(
+                "merge_editor", "MERGE_EDITOR", "merge editor", "vimdiff")
+        return self._merge_editor
+
     @staticmethod
     def _convert_boolean_config_value(config, name, default=True):
         """Convert the named field to bool.
@@ -262,6 +388,35 @@ class Config:
     def set_skip_unparsable(self, bool):
         self.config['vcard']['skip_unparsable'] = bool
 
+    def phone_country_code(self):
+        return self.config['vcard']['phone_country_code']
+
+    def phone_trunk_prefix(self):
+        return self.config['vcard']['phone_trunk_prefix']
+
+    def use_cache(self):
+        return self.config['vcard']['cache']
+
+    def set_use_cache(self, bool):
+        self.config['vcard']['cache'] = bool
+        for abook in self.abooks:
+            if not bool:
+                abook.cache = None
+            elif abook.cache is None:
+                abook.cache = ContactCache(abook.path)
+
+    def use_search_index(self):
+        return self.config['vcard']['search_index']
+
+    def lazy_parsing(self):
+        return self.config['vcard']['lazy_parsing']
+
+    def parse_workers(self):
+        return self.config['vcard']['parse_workers']
+
+    def io_threads(self):
+        return self.config['vcard']['io_threads']
+
     def display_by_name(self):
         return self.config['contact table']['display']
 
@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""A daemon that keeps the address books in memory and runs the read only
+subcommands of khard for clients that connect to a unix socket.
+
+Client and daemon exchange frames that consist of a one byte tag, the length
+of the payload as four byte integer and the payload.  The client sends one
+request frame ("q") with the command line and the environment that influences
+the output as json.  The daemon answers with any number of stdout ("o") and
+stderr ("e") frames followed by the exit status ("x").  If the daemon can not
+handle the request it answers with a refusal ("r") instead and the client
+runs the command itself.
+"""
+
+import codecs
+import contextlib
+import io
+import logging
+import os
+import signal
+import struct
+import sys
+
+from .cache import get_cache_dir
+from .config import find_config_file
+
+# The modules that are only needed to talk to a running daemon or to run the
+# daemon itself (json, socket, threading and the watcher) are imported where
+# they are used so that they do not slow down every start of khard.
+
+
+# The root logger must not be configured before the command line is parsed.
+logger = logging.getLogger(__name__)
+_header = struct.Struct("!cI")
+
+
+class Refused(Exception):
+    """Indicate that a request can not be handled by the daemon."""
+
+
+def get_socket_path():
+    """Find the path of the unix socket of the daemon.
+
+    :returns: the path of the socket
+    :rtype: str
+    """
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "khard.sock")
+    return os.path.join(get_cache_dir(), "daemon.sock")
+
+
+def _send_frame(sock, tag, data=b""):
+    sock.sendall(_header.pack(tag, len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            raise EOFError
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_frame(sock):
+    """Receive one frame.
+
+    :param sock: the connected socket
+    :type sock: socket.socket
+    :returns: the tag and the payload of the frame or None and b"" if the
+        connection was closed
+    :rtype: tuple(bytes, bytes)
+    """
+    try:
+        tag, size = _header.unpack(_recv_exactly(sock, _header.size))
+        return tag, _recv_exactly(sock, size)
+    except EOFError:
+        return None, b""
+
+
+class _FrameWriter(io.RawIOBase):
+    """A binary stream that sends everything written to it as frames."""
+
+    def __init__(self, sock, tag):
+        super().__init__()
+        self.sock = sock
+        self._tag = tag
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        # Once the request is finished all further output is dropped.
+        if self.sock is not None:
+            _send_frame(self.sock, self._tag, bytes(data))
+        return len(data)
+
+
+def _get_config_option(argv):
+    """Find the value of the --config option in a khard command line.
+
+    :param argv: the command line arguments
+    :type argv: list(str)
+    :returns: the config file given on the command line or ""
+    :rtype: str
+    """
+    args = iter(argv)
+    for arg in args:
+        if arg in ("-c", "--config"):
+            return next(args, "")
+        elif arg.startswith("--config="):
+            return arg[len("--config="):]
+        elif arg.startswith("-c"):
+            return arg[2:]
+        elif not arg.startswith("-"):
+            # the global options end at the subcommand
+            break
+    return ""
+
+
+def forward(argv, socket_path=None):
+    """Run a khard command line in a running daemon.
+
+    The output of the daemon is written to stdout and stderr.
+
+    :param argv: the command line arguments
+    :type argv: list(str)
+    :param socket_path: the socket of the daemon, defaults to
+        get_socket_path()
+    :type socket_path: str
+    :returns: the exit status or None if no daemon is running or the daemon
+        refused to handle the command
+    :rtype: int or NoneType
+    """
+    socket_path = socket_path or get_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+    import json
+    import socket
+    config_file = find_config_file(_get_config_option(argv))
+    request = {"argv": argv, "config": os.path.abspath(config_file),
+               "cwd": os.getcwd(),
+               "environ": {name: os.environ.get(name)
+                           for name in Daemon.environment}}
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.settimeout(1)
+            sock.connect(socket_path)
+            sock.settimeout(None)
+            _send_frame(sock, b"q", json.dumps(request).encode("utf-8"))
+        except OSError as err:
+            logger.debug("Could not connect to khard daemon: %s", err)
+            return None
+        decoders = {b"o": codecs.getincrementaldecoder("utf-8")("replace"),
+                    b"e": codecs.getincrementaldecoder("utf-8")("replace")}
+        # Debug output of the daemon is held back until it is clear that the
+        # daemon handles the request.
+        pending = []
+        started = False
+        try:
+            while True:
+                try:
+                    tag, data = _recv_frame(sock)
+                except OSError:
+                    tag = None
+                if tag is None and not started:
+                    logger.debug("The khard daemon closed the connection")
+                    return None
+                elif tag is None:
+                    sys.stderr.write("Error: The khard daemon closed the "
+                                     "connection\n")
+                    return 1
+                elif tag == b"r":
+                    logger.debug("The khard daemon refused the request")
+                    return None
+                elif tag == b"e" and not started:
+                    pending.append(decoders[tag].decode(data))
+                    continue
+                if not started:
+                    started = True
+                    sys.stderr.write("".join(pending))
+                if tag == b"o":
+                    sys.stdout.write(decoders[tag].decode(data))
+                    sys.stdout.flush()
+                elif tag == b"e":
+                    sys.stderr.write(decoders[tag].decode(data))
+                elif tag == b"x":
+                    sys.stdout.write(decoders[b"o"].decode(b"", True))
+                    sys.stdout.flush()
+                    return int(data)
+        except BrokenPipeError:
+            # see khard.print_lines
+            if sys.stdout is sys.__stdout__:
+                devnull = os.open(os.devnull, os.O_WRONLY)
+                os.dup2(devnull, sys.stdout.fileno())
+            return 1
+
+
+class Daemon:
+    """Serve khard commands from a config and address books that are kept in
+    memory.
+
+    Changed vCard files are reported by a watcher and only these files are
+    loaded again.  If the config file changes everything is reloaded.
+    """
+
+    # The subcommands that only read the address books and do not interact
+    # with the user.
+    actions = ("addressbooks", "birthdays", "email", "filename", "list",
+               "phone", "postaddress")
+    # The environment variables that influence the output.  Requests from
+    # clients with a different environment are refused.
+    environment = ("LANG", "LANGUAGE", "LC_ALL", "LC_CTYPE", "LC_TIME", "TZ")
+    # The config sections that the command line options can change.
+    _sections = ("general", "contact table", "vcard")
+    # Seconds to wait for a client before giving up on it.
+    _timeout = 60
+
+    def __init__(self, config, load_config, run, socket_path=None):
+        """
+        :param config: the initial config
+        :type config: config.Config
+        :param load_config: a function that loads the config again if it
+            changed
+        :type load_config: callable
+        :param run: a function that runs a khard command line with the given
+            config and raises Refused for subcommands that are not in the
+            given list
+        :type run: callable(list(str), config.Config, list(str))
+        :param socket_path: the path of the unix socket to listen on,
+            defaults to get_socket_path()
+        :type socket_path: str
+        """
+        self.socket_path = socket_path or get_socket_path()
+        self._config = config
+        self._config_file = os.path.abspath(config.filename)
+        self._load_config = load_config
+        self._run = run
+        self._environ = {name: os.environ.get(name)
+                         for name in self.environment}
+        self._signature = None
+        self._watcher = None
+        self._stopped = False
+
+    def _get_signature(self):
+        """Get the modification time of the config file.
+
+        :returns: a value that changes whenever the config file changes
+        :rtype: tuple or NoneType
+        """
+        try:
+            stat = os.stat(self._config_file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _load(self):
+        """Load all address books of the current config."""
+        self._signature = self._get_signature()
+        if self._watcher is not None:
+            self._watcher.close()
+        from .watcher import create_watcher
+        # Start watching before loading so that no change is missed.
+        self._watcher = create_watcher(
+            [abook.path for abook in self._config.abooks])
+        for abook in self._config.abooks:
+            abook.load()
+
+    def _refresh(self):
+        """Reload the config if it changed and update the address books with
+        the vCard files that changed.
+
+        :returns: None
+        :raises: Refused if the config or the address books can not be
+            loaded
+        """
+        if self._config is not None and \
+                self._get_signature() == self._signature:
+            changes = self._watcher.changes()
+            abooks = {abook.path: abook for abook in self._config.abooks}
+            if all(files is not None for files in changes.values()):
+                for path, files in changes.items():
+                    logger.debug("Updating %d files in %s", len(files), path)
+                    abooks[path].update_files(sorted(files))
+                return
+        logger.debug("Reloading the address books")
+        self._config = None
+        try:
+            self._config = self._load_config()
+            self._load()
+        except SystemExit:
+            self._config = None
+            raise Refused("the address books can not be loaded")
+
+    def _check(self, request):
+        """Check if a request can be handled with the loaded config.
+
+        :param request: the request of a client
+        :type request: dict
+        :returns: None
+        :raises: Refused
+        """
+        if request.get("config") != self._config_file:
+            raise Refused("different config file")
+        if request.get("environ") != self._environ:
+            raise Refused("different environment")
+        if request.get("cwd") != os.getcwd() and not all(
+                os.path.isabs(abook.path) for abook in self._config.abooks):
+            raise Refused("relative address book paths")
+
+    def handle(self, request, stdout, stderr):
+        """Run the command line of a request.
+
+        :param request: the request of a client
+        :type request: dict
+        :param stdout: the stream to write the output to
+        :type stdout: io.TextIOBase
+        :param stderr: the stream to write errors to
+        :type stderr: io.TextIOBase
+        :returns: the exit status of the command
+        :rtype: int
+        :raises: Refused
+        """
+        self._refresh()
+        self._check(request)
+        config = self._config
+        settings = {name: dict(config.config[name])
+                    for name in self._sections}
+        sort = config.sort
+        handlers = logging.root.handlers[:]
+        level = logging.root.level
+        # Log messages should reach the client like in a new process.
+        logging.root.handlers[:] = []
+        logging.root.setLevel(logging.WARNING)
+        try:
+            with contextlib.redirect_stdout(stdout), \
+                    contextlib.redirect_stderr(stderr):
+                try:
+                    self._run(request["argv"], config, self.actions)
+                except SystemExit as err:
+                    if err.code is None:
+                        return 0
+                    elif isinstance(err.code, int):
+                        return err.code
+                    print(err.code, file=sys.stderr)
+                    return 1
+                return 0
+        finally:
+            # Undo changes by command line options.
+            for name, values in settings.items():
+                config.config[name].update(values)
+            config.sort = sort
+            config.set_use_cache(config.use_cache())
+            logging.root.handlers[:] = handlers
+            logging.root.setLevel(level)
+
+    def _serve_connection(self, connection):
+        """Read one request from a client and send the response.
+
+        :param connection: the connection to the client
+        :type connection: socket.socket
+        :returns: None
+        """
+        import json
+        connection.settimeout(self._timeout)
+        tag, data = _recv_frame(connection)
+        if tag != b"q":
+            return
+        request = json.loads(data.decode("utf-8"))
+        writers = [_FrameWriter(connection, b"o"),
+                   _FrameWriter(connection, b"e")]
+        stdout = io.TextIOWrapper(io.BufferedWriter(writers[0]),
+                                  encoding="utf-8", errors="replace")
+        stderr = io.TextIOWrapper(io.BufferedWriter(writers[1]),
+                                  encoding="utf-8", errors="replace",
+                                  line_buffering=True)
+        try:
+            try:
+                status = self.handle(request, stdout, stderr)
+                stdout.flush()
+                stderr.flush()
+            except Refused as err:
+                logger.debug("Refused request %s: %s", request["argv"], err)
+                _send_frame(connection, b"r")
+                return
+            except OSError:
+                raise
+            except Exception as err:
+                logger.exception("Error while handling %s", request["argv"])
+                stderr.write("Error in khard daemon: %s\n" % err)
+                stderr.flush()
+                status = 1
+            _send_frame(connection, b"x", str(status).encode("ascii"))
+        except OSError as err:
+            logger.debug("Lost connection to client: %s", err)
+        finally:
+            for writer in writers:
+                writer.sock = None
+
+    def _listen(self):
+        """Create the listening socket.
+
+        :returns: the socket
+        :rtype: socket.socket
+        """
+        import socket
+        os.makedirs(os.path.dirname(self.socket_path), mode=0o700,
+                    exist_ok=True)
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            with probe:
+                try:
+                    probe.connect(self.socket_path)
+                except OSError:
+                    # left over from a daemon that was killed
+                    os.remove(self.socket_path)
+                else:
+                    sys.exit("Error: A khard daemon is already listening on "
+                             "{}".format(self.socket_path))
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        listener.listen(16)
+        # wake up regularly to check if the daemon was stopped
+        listener.settimeout(1)
+        return listener
+
+    def serve_forever(self):
+        """Load the address books and handle requests until stop() is called
+        or the process is interrupted.
+
+        :returns: None
+        """
+        import socket
+        import threading
+        self._load()
+        listener = self._listen()
+        if threading.current_thread() is threading.main_thread():
+            # clean up the socket when the daemon is terminated
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+        logger.debug("Listening on %s", self.socket_path)
+        try:
+            while not self._stopped:
+                try:
+                    connection, _ = listener.accept()
+                except socket.timeout:
+                    if self._config is not None and \
+                            self._watcher.event_driven:
+                        # apply changes while idle to answer faster later
+                        try:
+                            self._refresh()
+                        except Refused as err:
+                            logger.debug("Refresh failed: %s", err)
+                    continue
+                with connection:
+                    self._serve_connection(connection)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            listener.close()
+            os.remove(self.socket_path)
+            if self._watcher is not None:
+                self._watcher.close()
+
+    def stop(self):
+        """Stop serving requests."""
+        self._stopped = True
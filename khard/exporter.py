@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Export many contacts at once as a multi-card vCard, NDJSON or CSV file.
+
+The contacts are written one after the other so that only one serialized
+contact is held in memory at a time.  The NDJSON and CSV formats use the
+field names of the contact template, the CSV columns are the same that the
+import subcommand reads.  CSV files are not streamed: the header names the
+phone, email and address types of all contacts, so all contacts are parsed
+before the first row is written.
+"""
+
+import csv
+import json
+
+from . import helpers
+from .importer import ADDRESS_PARTS, LIST_FIELDS, SINGLE_FIELDS
+
+
+FORMATS = ("vcf", "ndjson", "csv")
+
+
+def write_vcf(contacts, output):
+    """Write the vCards of the contacts to one file.
+
+    :param contacts: the contacts to export
+    :type contacts: iterable(carddav_object.CarddavObject)
+    :param output: the opened output file
+    :type output: io.TextIOBase
+    :returns: the number of exported contacts
+    :rtype: int
+    """
+    count = 0
+    for contact in contacts:
+        output.write(contact.vcard.serialize())
+        count += 1
+    return count
+
+
+def write_raw(contacts, output):
+    """Copy the vCard files of the contacts byte by byte to one file.
+
+    The vCards are not parsed and serialized again, so this is faster than
+    write_vcf() and keeps the files exactly as they are.
+
+    :param contacts: the contacts to export, they need a file name
+    :type contacts: iterable(carddav_object.CarddavObject)
+    :param output: the opened output file
+    :type output: io.TextIOBase
+    :returns: the number of exported contacts
+    :rtype: int
+    """
+    binary = getattr(output, "buffer", None)
+    if binary is not None:
+        output.flush()
+    count = 0
+    for contact in contacts:
+        with open(contact.filename, "rb") as fh:
+            data = fh.read()
+        if data and not data.endswith(b"\n"):
+            data += b"\n"
+        if binary is not None:
+            binary.write(data)
+        else:
+            output.write(data.decode("utf-8"))
+        count += 1
+    if binary is not None:
+        binary.flush()
+    return count
+
+
+def _user_data(contact):
+    data = contact.get_user_data()
+    data["Address book"] = contact.address_book.name
+    return data
+
+
+def write_ndjson(contacts, output):
+    """Write the contacts as JSON objects, one per line.
+
+    The objects have the fields of the contact template and the name of the
+    address book of the contact.
+
+    :param contacts: the contacts to export
+    :type contacts: iterable(carddav_object.CarddavObject)
+    :param output: the opened output file
+    :type output: io.TextIOBase
+    :returns: the number of exported contacts
+    :rtype: int
+    """
+    count = 0
+    for contact in contacts:
+        output.write(json.dumps(_user_data(contact), ensure_ascii=False))
+        output.write("\n")
+        count += 1
+    return count
+
+
+def _cell(value):
+    """Convert a template value to the text of a CSV cell.
+
+    :param value: the value of a template field
+    :type value: str or list(str) or list(list(str))
+    :returns: the values one per line, parts of a value joined by commas
+    :rtype: str
+    """
+    if isinstance(value, list):
+        return "\n".join(helpers.list_to_string(item, ", ")
+                         for item in value)
+    return value
+
+
+def csv_fieldnames(contacts):
+    """Find the CSV columns that are needed for the contacts.
+
+    :param contacts: the contacts to export
+    :type contacts: list(carddav_object.CarddavObject)
+    :returns: the column names
+    :rtype: list(str)
+    """
+    phone_types = set()
+    email_types = set()
+    address_types = set()
+    private_objects = []
+    for contact in contacts:
+        phone_types.update(contact.phone_numbers)
+        email_types.update(contact.emails)
+        address_types.update(contact.post_addresses)
+        for key in contact.supported_private_objects:
+            if key not in private_objects:
+                private_objects.append(key)
+    fieldnames = ["Address book"] + list(SINGLE_FIELDS) + list(LIST_FIELDS)
+    fieldnames += ["Phone " + _csv_type(type) for type in sorted(phone_types)]
+    fieldnames += ["Email " + _csv_type(type) for type in sorted(email_types)]
+    fieldnames += ["Address {} {}".format(_csv_type(type), part)
+                   for type in sorted(address_types) for part in ADDRESS_PARTS]
+    return fieldnames + private_objects
+
+
+def _csv_type(type):
+    # the column names are split at spaces when they are imported
+    return type.replace(" ", "")
+
+
+def csv_row(data):
+    """Convert the template data of a contact to a CSV row.
+
+    Only the first post address of every type is included.
+
+    :param data: the data as returned by CarddavObject.get_user_data()
+    :type data: dict
+    :returns: the cells by column name
+    :rtype: dict(str, str)
+    """
+    row = {}
+    for field, value in data.items():
+        if field in ("Phone", "Email"):
+            for type, values in value.items():
+                row["{} {}".format(field, _csv_type(type))] = _cell(values)
+        elif field == "Address":
+            for type, addresses in value.items():
+                for part, text in addresses[0].items():
+                    row["Address {} {}".format(_csv_type(type), part)] = \
+                        _cell(text)
+        elif field == "Private":
+            for key, values in value.items():
+                row[key] = _cell(values)
+        else:
+            row[field] = _cell(value)
+    return row
+
+
+def write_csv(contacts, output):
+    """Write the contacts as a CSV file with a header row.
+
+    The contacts are read twice, first for the columns of the header row.
+
+    :param contacts: the contacts to export
+    :type contacts: list(carddav_object.CarddavObject)
+    :param output: the opened output file
+    :type output: io.TextIOBase
+    :returns: the number of exported contacts
+    :rtype: int
+    """
+    writer = csv.DictWriter(output, csv_fieldnames(contacts))
+    writer.writeheader()
+    count = 0
+    for contact in contacts:
+        writer.writerow(csv_row(_user_data(contact)))
+        count += 1
+    return count
+
+
+def export_contacts(contacts, output, format="vcf", raw=False):
+    """Write all contacts to one output file.
+
+    :param contacts: the contacts to export
+    :type contacts: list(carddav_object.CarddavObject)
+    :param output: the opened output file
+    :type output: io.TextIOBase
+    :param format: one of FORMATS
+    :type format: str
+    :param raw: copy the vCard files unchanged, only for the vcf format
+    :type raw: bool
+    :returns: the number of exported contacts
+    :rtype: int
+    """
+    if format == "ndjson":
+        return write_ndjson(contacts, output)
+    elif format == "csv":
+        return write_csv(contacts, output)
+    elif raw:
+        return write_raw(contacts, output)
+    return write_vcf(contacts, output)
@@ -1,57 +1,165 @@
 # -*- coding: utf-8 -*-
 
+import functools
+import itertools
 import os
 import random
 import string
+import unicodedata
 from datetime import datetime
 from textwrap import dedent
 
 
-def pretty_print(table, justify="L"):
-    # support for multiline columns
-    line_break_table = []
-    for row in table:
-        # get line break count
-        most_line_breaks_in_row = 0
-        for col in row:
-            if str(col).count("\n") > most_line_breaks_in_row:
-                most_line_breaks_in_row = col.count("\n")
-        # fill table rows
-        for index in range(0, most_line_breaks_in_row+1):
-            line_break_row = []
-            for col in row:
-                try:
-                    line_break_row.append(str(col).split("\n")[index])
-                except IndexError:
-                    line_break_row.append("")
-            line_break_table.append(line_break_row)
-    else:
-        # replace table variable
-        table = line_break_table
-    # get width for every column
-    column_widths = [0] * len(table[0])
+def _isascii(text):
+    try:
+        text.encode("ascii")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+# str.isascii is only available since python 3.7
+_isascii = getattr(str, "isascii", _isascii)
+
+
+def display_width(text):
+    """Compute the number of terminal columns that a string occupies.
+
+    East asian wide and full width characters (like CJK ideographs and most
+    emoji) take two columns, combining marks and other zero width characters
+    take none.
+
+    :param text: the string to measure
+    :type text: str
+    :returns: the display width of the string
+    :rtype: int
+    """
+    if _isascii(text):
+        return len(text)
+    return sum(_char_width(char) for char in text)
+
+
+@functools.lru_cache(maxsize=None)
+def _char_width(char):
+    if unicodedata.combining(char) or \
+            unicodedata.category(char) in ("Me", "Cf"):
+        return 0
+    if unicodedata.east_asian_width(char) in ("W", "F"):
+        return 2
+    return 1
+
+
+def _split_lines(rows):
+    """Split the rows of a table into the lines that they are printed as.
+
+    :param rows: the rows of the table with all cells converted to str
+    :type rows: list(list(str))
+    :returns: one row for each line of every row of the table
+    :rtype: list(list(str))
+    """
+    if "\n" not in "".join(itertools.chain.from_iterable(rows)):
+        return rows
+    lines = []
+    for row in rows:
+        cells = [cell.split("\n") for cell in row]
+        for index in range(max(len(cell) for cell in cells)):
+            lines.append([cell[index] if index < len(cell) else ""
+                          for cell in cells])
+    return lines
+
+
+def _display_widths(texts):
+    """Measure the display width of several strings.
+
+    :param texts: the strings to measure
+    :type texts: sequence(str)
+    :returns: the display width of each string or None if all strings are
+        ascii and the display widths are equal to the lengths
+    :rtype: list(int) or NoneType
+    """
+    if _isascii("".join(texts)):
+        return None
+    return [display_width(text) for text in texts]
+
+
+def _justify(texts, widths, justify, text_widths=None):
+    """Pad strings to the given display widths.
+
+    :param texts: the strings to pad
+    :type texts: sequence(str)
+    :param widths: the display width to pad each string to, strings that are
+        wider are not padded at all
+    :type widths: iterable(int)
+    :param justify: "L", "R" or "C" for left, right or centered alignment
+    :type justify: str
+    :param text_widths: the display widths of the strings as returned by
+        _display_widths
+    :type text_widths: list(int) or NoneType
+    :returns: the padded strings
+    :rtype: list(str)
+    """
+    method = {"L": str.ljust, "R": str.rjust, "C": str.center}[justify]
+    if text_widths is None:
+        return list(map(method, texts, widths))
+    return [method(text, len(text) + width - text_width)
+            for text, width, text_width in zip(texts, widths, text_widths)]
+
+
+def pretty_print_lines(table, justify="L", sample=None):
+    """Format a table with aligned columns line by line.
+
+    Cells can contain multiple lines.  Every cell is converted to str and
+    measured only once.  By default all rows are read before the first line
+    is produced in order to compute exact column widths.  If sample is given
+    the widths are computed from the first rows only and the remaining rows
+    are formatted as they are read from the iterable, cells that are wider
+    than the estimate then break the alignment.
+
+    :param table: the rows of the table, the first one is usually the header
+    :type table: iterable(list)
+    :param justify: "L", "R" or "C" for left, right or centered columns
+    :type justify: str
+    :param sample: the number of rows to compute the column widths from, all
+        rows if None
+    :type sample: int
+    :returns: the formatted lines
+    :rtype: generator(str)
+    """
     offset = 3
-    for row in table:
-        for index, col in enumerate(row):
-            width = len(str(col))
-            if width > column_widths[index]:
-                column_widths[index] = width
-    table_row_list = []
-    for row in table:
-        single_row_list = []
-        for col_index, col in enumerate(row):
-            if justify == "R":  # justify right
-                formated_column = str(col).rjust(column_widths[col_index] +
-                                                 offset)
-            elif justify == "L":  # justify left
-                formated_column = str(col).ljust(column_widths[col_index] +
-                                                 offset)
-            elif justify == "C":  # justify center
-                formated_column = str(col).center(column_widths[col_index] +
-                                                  offset)
-            single_row_list.append(formated_column)
-        table_row_list.append(' '.join(single_row_list))
-    return '\n'.join(table_row_list)
+    rows = iter(table)
+    head = _split_lines([[str(col) for col in row]
+                         for row in itertools.islice(rows, sample)])
+    widths = []
+    columns = []
+    for column in itertools.zip_longest(*head, fillvalue=""):
+        text_widths = _display_widths(column)
+        width = max(text_widths or map(len, column)) + offset
+        widths.append(width)
+        columns.append(_justify(column, itertools.repeat(width), justify,
+                                text_widths))
+    for cells in zip(*columns):
+        yield " ".join(cells)
+    for row in rows:
+        for texts in _split_lines([[str(col) for col in row]]):
+            text_widths = _display_widths(texts)
+            # columns that did not appear in the sample get their own width
+            widths.extend(width + offset for width in
+                          (text_widths or [len(text) for text in texts])
+                          [len(widths):])
+            yield " ".join(_justify(texts, widths, justify, text_widths))
+
+
+def pretty_print(table, justify="L"):
+    """Format a table with aligned columns.
+
+    :param table: the rows of the table, the first one is usually the header
+    :type table: iterable(list)
+    :param justify: "L", "R" or "C" for left, right or centered columns
+    :type justify: str
+    :returns: the formatted table
+    :rtype: str
+    """
+    return "\n".join(pretty_print_lines(table, justify))
 
 
 def list_to_string(input, delimiter):
@@ -0,0 +1,481 @@
+# -*- coding: utf-8 -*-
+"""Import contacts from multi-card vCard, CSV and LDIF files.
+
+The input is read as a stream.  The records are converted to vCards in
+batches, in worker processes if several are available, and the resulting
+files are written to the address book batch by batch so that large files can
+be imported with constant memory.
+
+CSV files have a header row.  The columns are named like the fields of the
+contact template ("First name", "Organisation", ...).  Phone numbers and email
+addresses are given in columns like "Phone cell" or "Email work" and post
+addresses in columns like "Address home Street".  Cells with several values
+have one value per line.  LDIF files are read with the attributes used by
+common mail clients (inetOrgPerson and the Mozilla extensions).
+"""
+
+import base64
+import collections
+import concurrent.futures
+import csv
+import itertools
+import logging
+import os
+import re
+
+from . import helpers
+from .carddav_object import CarddavObject
+
+
+FORMATS = ("vcf", "csv", "ldif")
+_extensions = {".vcf": "vcf", ".vcard": "vcf", ".csv": "csv", ".ldif": "ldif",
+               ".ldi": "ldif"}
+
+# template fields with one value per contact
+SINGLE_FIELDS = ("UID", "Prefix", "First name", "Additional", "Last name",
+                 "Suffix", "Birthday", "Anniversary", "Note")
+# template fields that can have several values, one per line in a CSV cell
+LIST_FIELDS = ("Nickname", "Organisation", "Title", "Role", "Categories",
+               "Webpage")
+_typed_fields = {"Phone": "voice", "Email": "internet"}
+ADDRESS_PARTS = ("Box", "Extended", "Street", "Code", "City", "Region",
+                 "Country")
+
+_ldif_fields = {"givenname": "First name", "sn": "Last name",
+                "o": "Organisation", "title": "Title",
+                "description": "Note", "mozillanickname": "Nickname",
+                "labeleduri": "Webpage", "mozillaworkurl": "Webpage",
+                "mozillahomeurl": "Webpage"}
+_ldif_phones = {"telephonenumber": "work", "homephone": "home",
+                "mobile": "cell", "facsimiletelephonenumber": "fax",
+                "pager": "pager"}
+_ldif_emails = ("mail", "mozillasecondemail")
+_ldif_addresses = {
+    "postofficebox": ("work", "Box"), "street": ("work", "Street"),
+    "l": ("work", "City"), "st": ("work", "Region"),
+    "postalcode": ("work", "Code"), "c": ("work", "Country"),
+    "mozillahomestreet": ("home", "Street"),
+    "mozillahomelocalityname": ("home", "City"),
+    "mozillahomestate": ("home", "Region"),
+    "mozillahomepostalcode": ("home", "Code"),
+    "mozillahomecountryname": ("home", "Country")}
+
+
+def detect_format(filename):
+    """Guess the format of a file from its extension.
+
+    :param filename: the file name or "-" for stdin
+    :type filename: str
+    :returns: one of FORMATS, "vcf" if the extension is unknown
+    :rtype: str
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return _extensions.get(extension, "vcf")
+
+
+def read_vcards(stream):
+    """Split a stream with several vCards into the texts of the single cards.
+
+    :param stream: the input lines
+    :type stream: iterable(str)
+    :yields: the text of each vCard
+    :rtype: generator(str)
+    """
+    lines = []
+    depth = 0
+    for line in stream:
+        upper = line.strip().upper()
+        if upper == "BEGIN:VCARD":
+            depth += 1
+        if depth:
+            lines.append(line)
+        if upper == "END:VCARD" and depth:
+            depth -= 1
+            if not depth:
+                yield "".join(lines)
+                lines = []
+    if lines:
+        # an incomplete card, it is reported when it is parsed
+        yield "".join(lines)
+
+
+def _lines(value):
+    values = [line.strip() for line in value.splitlines() if line.strip()]
+    return values[0] if len(values) == 1 else values
+
+
+def csv_columns(fieldnames, private_objects=()):
+    """Find the template fields of the columns of a CSV file.
+
+    :param fieldnames: the column names from the header row
+    :type fieldnames: list(str)
+    :param private_objects: the supported private objects
+    :type private_objects: list(str)
+    :returns: the path in the template data for every known column, unknown
+        columns are left out
+    :rtype: dict(str, tuple(str))
+    """
+    known = {name.lower(): (name,) for name in SINGLE_FIELDS + LIST_FIELDS}
+    known.update((name.lower(), ("Private", name))
+                 for name in private_objects)
+    columns = {}
+    for column in fieldnames or []:
+        words = column.split()
+        key = column.strip().lower()
+        if key in known:
+            columns[column] = known[key]
+        elif words and words[0].capitalize() in _typed_fields and \
+                len(words) <= 2:
+            field = words[0].capitalize()
+            kind = words[1] if len(words) == 2 else _typed_fields[field]
+            columns[column] = (field, kind)
+        elif len(words) == 3 and words[0].lower() == "address" and \
+                words[2].capitalize() in ADDRESS_PARTS:
+            columns[column] = ("Address", words[1], words[2].capitalize())
+    return columns
+
+
+def read_csv(stream, private_objects=()):
+    """Read the contacts from a CSV file.
+
+    :param stream: the opened file
+    :type stream: io.TextIOBase
+    :param private_objects: the supported private objects
+    :type private_objects: list(str)
+    :yields: the data of each contact in the format of the contact template
+    :rtype: generator(dict)
+    """
+    reader = csv.DictReader(stream)
+    columns = csv_columns(reader.fieldnames, private_objects)
+    for column in reader.fieldnames or []:
+        # the address book column is written by the export subcommand
+        if column not in columns and column != "Address book":
+            logging.warning("Ignoring unknown CSV column %s", column)
+    for row in reader:
+        data = {}
+        for column, path in columns.items():
+            value = row.get(column)
+            if not value or not value.strip():
+                continue
+            if len(path) == 1 and path[0] in SINGLE_FIELDS:
+                data[path[0]] = value.strip() if path[0] != "Note" else value
+            elif len(path) == 3:
+                address = data.setdefault("Address", {}).setdefault(path[1],
+                                                                    {})
+                address[path[2]] = value.strip()
+            elif len(path) == 2:
+                data.setdefault(path[0], {})[path[1]] = _lines(value)
+            else:
+                data[path[0]] = _lines(value)
+        if data:
+            yield data
+
+
+def _ldif_records(stream):
+    """Split an LDIF stream into records.
+
+    :param stream: the input lines
+    :type stream: iterable(str)
+    :yields: the attributes of each record with lower case names
+    :rtype: generator(dict(str, list(str)))
+    """
+    lines = []
+    for line in itertools.chain(stream, [""]):
+        line = line.rstrip("\r\n")
+        if line.startswith(" ") and lines:
+            # continuation of a folded line
+            lines[-1] += line[1:]
+            continue
+        if line.startswith("#"):
+            continue
+        if line:
+            lines.append(line)
+            continue
+        record = collections.OrderedDict()
+        for entry in lines:
+            name, sep, value = entry.partition(":")
+            if not sep:
+                continue
+            if value.startswith(":"):
+                try:
+                    value = base64.b64decode(value[1:].strip()).decode(
+                        "utf-8")
+                except ValueError:
+                    logging.warning("Ignoring invalid LDIF value of %s", name)
+                    continue
+            elif value.startswith("<"):
+                # values from urls are not supported
+                continue
+            name = name.split(";")[0].strip().lower()
+            record.setdefault(name, []).append(value.strip())
+        lines = []
+        if "dn" in record:
+            yield record
+
+
+def read_ldif(stream):
+    """Read the contacts from an LDIF file.
+
+    :param stream: the input lines
+    :type stream: iterable(str)
+    :yields: the data of each contact in the format of the contact template
+    :rtype: generator(dict)
+    """
+    for record in _ldif_records(stream):
+        data = {}
+        for name, values in record.items():
+            value = values[0] if len(values) == 1 else values
+            if name in _ldif_fields:
+                field = _ldif_fields[name]
+                if field in data:
+                    data[field] = _flatten([data[field], value])
+                else:
+                    data[field] = value
+            elif name in _ldif_phones:
+                data.setdefault("Phone", {})[_ldif_phones[name]] = value
+            elif name in _ldif_emails:
+                emails = data.setdefault("Email", {})
+                emails["internet"] = _flatten(
+                    [emails.get("internet", []), values])
+            elif name in _ldif_addresses:
+                kind, part = _ldif_addresses[name]
+                address = data.setdefault("Address", {}).setdefault(kind, {})
+                address[part] = ", ".join(values)
+        if "First name" not in data and "Last name" not in data and \
+                "cn" in record:
+            # split the common name at the last space
+            first, _, last = record["cn"][0].rpartition(" ")
+            data["First name"] = first
+            data["Last name"] = last
+        yield data
+
+
+def _flatten(values):
+    result = []
+    for value in values:
+        result.extend(value if isinstance(value, list) else [value])
+    return result
+
+
+def read_records(stream, format, private_objects=()):
+    """Read the records of an input stream in the given format.
+
+    :param stream: the opened input
+    :type stream: io.TextIOBase
+    :param format: one of FORMATS
+    :type format: str
+    :param private_objects: the supported private objects
+    :type private_objects: list(str)
+    :returns: the texts of the vCards for "vcf", the template data of the
+        contacts otherwise
+    :rtype: iterable(str or dict)
+    """
+    if format == "vcf":
+        return read_vcards(stream)
+    elif format == "csv":
+        return read_csv(stream, private_objects)
+    return read_ldif(stream)
+
+
+def convert_records(records, version, private_objects):
+    """Convert records to serialized vCards.
+
+    This runs in the worker processes, so everything has to be picklable.
+
+    :param records: vCard texts or template data as returned by read_records
+    :type records: list(str or dict)
+    :param version: the vCard version for contacts from template data
+    :type version: str
+    :param private_objects: the supported private objects
+    :type private_objects: list(str)
+    :returns: the uid and the serialized vCard of each record, or None and
+        the error message if it could not be converted
+    :rtype: list(tuple(str or NoneType, str))
+    """
+    results = []
+    for record in records:
+        try:
+            if isinstance(record, str):
+                contact = CarddavObject.from_string(None, record,
+                                                    private_objects, False)
+            else:
+                contact = CarddavObject.from_user_data(
+                    None, record, private_objects, version, False)
+                if record.get("UID"):
+                    contact.uid = record["UID"]
+            if not contact.uid:
+                contact.uid = helpers.get_random_uid()
+            results.append((contact.uid, contact.vcard.serialize()))
+        except Exception as err:
+            # One broken record should not abort the import of thousands.
+            results.append((None, str(err).strip() or repr(err)))
+    return results
+
+
+def _batches(records, size):
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def convert_in_parallel(records, version, private_objects, workers=1,
+                        batch_size=200):
+    """Convert records in batches, in worker processes if workers is more
+    than one.
+
+    Only a few batches per worker are read ahead so that the input is
+    streamed.
+
+    :param records: the records as returned by read_records
+    :type records: iterable(str or dict)
+    :param version: the vCard version for contacts from template data
+    :type version: str
+    :param private_objects: the supported private objects
+    :type private_objects: list(str)
+    :param workers: the number of worker processes
+    :type workers: int
+    :param batch_size: the number of records per batch
+    :type batch_size: int
+    :yields: the result of convert_records for each batch, in order
+    :rtype: generator(list)
+    """
+    batches = _batches(records, batch_size)
+    if workers < 2:
+        for batch in batches:
+            yield convert_records(batch, version, private_objects)
+        return
+    pending = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        for batch in itertools.islice(batches, workers * 2):
+            pending.append(pool.submit(convert_records, batch, version,
+                                       private_objects))
+        while pending:
+            future = pending.popleft()
+            for batch in itertools.islice(batches, 1):
+                pending.append(pool.submit(convert_records, batch, version,
+                                           private_objects))
+            yield future.result()
+
+
+def _filename(path, uid):
+    """Choose the file name for an imported contact.
+
+    :param path: the directory of the address book
+    :type path: str
+    :param uid: the uid of the contact
+    :type uid: str
+    :returns: the path of the new file
+    :rtype: str
+    """
+    if not re.match(r"^[\w.@+-]{1,200}$", uid, re.ASCII) or \
+            uid.startswith("."):
+        uid = helpers.get_random_uid()
+    return os.path.join(path, uid + ".vcf")
+
+
+def write_batch(path, cards):
+    """Write new vCard files without replacing existing files.
+
+    The files are written to hidden temporary files first and then linked to
+    their name so that no partial files are visible.  The directory is synced
+    once for the whole batch.
+
+    :param path: the directory of the address book
+    :type path: str
+    :param cards: the file names and contents of the files
+    :type cards: list(tuple(str, str))
+    :returns: the file names that already existed and were not written
+    :rtype: list(str)
+    """
+    existing = []
+    for filename, text in cards:
+        temp = os.path.join(path, "." + os.path.basename(filename) + ".tmp")
+        with open(temp, "w") as fh:
+            fh.write(text)
+        try:
+            os.link(temp, filename)
+        except FileExistsError:
+            existing.append(filename)
+        except OSError:
+            # file systems without hard links
+            if os.path.exists(filename):
+                existing.append(filename)
+            else:
+                os.replace(temp, filename)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+    if cards and hasattr(os, "O_DIRECTORY"):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return existing
+
+
+class ImportResult:
+    """Counters for the progress of an import."""
+
+    def __init__(self):
+        self.imported = 0
+        self.duplicates = 0
+        self.errors = 0
+
+    @property
+    def total(self):
+        return self.imported + self.duplicates + self.errors
+
+
+def import_contacts(address_book, records, version, private_objects,
+                    workers=1, batch_size=200, progress=None):
+    """Import records into a vdir address book.
+
+    Records whose uid already exists in the address book or earlier in the
+    input are skipped.  The address book has to be loaded.
+
+    :param address_book: the address book to import the contacts into
+    :type address_book: address_book.VdirAddressBook
+    :param records: the records as returned by read_records
+    :type records: iterable(str or dict)
+    :param version: the vCard version for contacts from template data
+    :type version: str
+    :param private_objects: the supported private objects
+    :type private_objects: list(str)
+    :param workers: the number of worker processes
+    :type workers: int
+    :param batch_size: the number of records per batch
+    :type batch_size: int
+    :param progress: a function that is called with the result after each
+        batch
+    :type progress: callable(ImportResult) or NoneType
+    :returns: the numbers of imported and skipped records
+    :rtype: ImportResult
+    """
+    result = ImportResult()
+    uids = set(address_book.contacts)
+    for batch in convert_in_parallel(records, version, private_objects,
+                                     workers, batch_size):
+        cards = []
+        for uid, text in batch:
+            if uid is None:
+                logging.warning("Skipping invalid contact: %s", text)
+                result.errors += 1
+            elif uid in uids:
+                logging.warning("Skipping contact with existing UID %s", uid)
+                result.duplicates += 1
+            else:
+                uids.add(uid)
+                cards.append((_filename(address_book.path, uid), text))
+        existing = write_batch(address_book.path, cards)
+        for filename in existing:
+            logging.warning("Skipping contact, the file %s already exists",
+                            filename)
+        result.duplicates += len(existing)
+        result.imported += len(cards) - len(existing)
+        if progress is not None:
+            progress(result)
+    return result
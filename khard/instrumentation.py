@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Counters and timers that show where khard spends its time.
+
+The functions of this module do nothing until enable() or enable_tracing()
+is called, so they can be used in the code paths of every run.  The values
+are collected per scope, usually the name of an address book, or for the
+whole run if the scope is None.
+
+With tracing enabled the timers and spans are also recorded as events in
+the Chrome trace event format, which can be viewed in chrome://tracing or
+https://ui.perfetto.dev.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+
+from . import helpers
+
+
+enabled = False
+tracing = False
+_start = None
+# spans with a threshold that are shorter than this many seconds are not
+# traced
+_threshold = 0.0
+_events = []
+# the counters and the times in seconds by (scope, name)
+_counters = {}
+_times = {}
+# the timers that were started and not stopped yet
+_running = set()
+
+
+class _Timer:
+
+    __slots__ = ("name", "scope", "args", "stats", "threshold", "start")
+
+    def __init__(self, name, scope, stats=True, args=None, threshold=False):
+        self.name = name
+        self.scope = scope
+        self.args = args
+        self.stats = stats
+        self.threshold = threshold
+        self.start = time.perf_counter()
+        _running.add(self)
+
+    def stop(self):
+        if self not in _running:
+            return
+        _running.discard(self)
+        duration = time.perf_counter() - self.start
+        if self.stats:
+            add_time(self.name, duration, self.scope)
+        if tracing and (not self.threshold or duration >= _threshold):
+            args = dict(self.args or {})
+            if self.scope is not None:
+                args["address book"] = self.scope
+            _events.append({"name": self.name, "cat": "khard", "ph": "X",
+                            "ts": (self.start - _start) * 1e6,
+                            "dur": duration * 1e6, "pid": os.getpid(),
+                            "tid": threading.get_ident(), "args": args})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class _NullTimer:
+
+    __slots__ = ()
+
+    def stop(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+def enable():
+    """Start collecting counters and times.
+
+    :returns: None
+    """
+    global enabled, _start
+    enabled = True
+    if _start is None:
+        _start = time.perf_counter()
+
+
+def enable_tracing(threshold=0.0):
+    """Start recording the timers and spans as trace events.
+
+    :param threshold: the minimal duration in seconds of the spans that are
+        only traced if they take long
+    :type threshold: float
+    :returns: None
+    """
+    global tracing, _start, _threshold
+    tracing = True
+    _threshold = threshold
+    if _start is None:
+        _start = time.perf_counter()
+
+
+def disable():
+    """Stop collecting and forget all collected values and events.
+
+    :returns: None
+    """
+    global enabled, tracing, _start, _threshold
+    enabled = False
+    tracing = False
+    _start = None
+    _threshold = 0.0
+    _counters.clear()
+    _times.clear()
+    _running.clear()
+    del _events[:]
+
+
+def count(name, value=1, scope=None):
+    """Increase a counter.
+
+    :param name: the name of the counter
+    :type name: str
+    :param value: the amount to add
+    :type value: int
+    :param scope: the address book the counter belongs to
+    :type scope: str or NoneType
+    :returns: None
+    """
+    if enabled:
+        key = (scope, name)
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def add_time(name, seconds, scope=None):
+    """Add to the time spent in a phase.
+
+    :param name: the name of the phase
+    :type name: str
+    :param seconds: the time to add
+    :type seconds: float
+    :param scope: the address book the phase belongs to
+    :type scope: str or NoneType
+    :returns: None
+    """
+    if enabled:
+        key = (scope, name)
+        _times[key] = _times.get(key, 0) + seconds
+
+
+def timer(name, scope=None):
+    """Measure the time spent in a phase.
+
+    The timer runs until stop() is called on it or the with block it is used
+    in ends.  Timers that are still running when the report is made are
+    stopped then.
+
+    :param name: the name of the phase
+    :type name: str
+    :param scope: the address book the phase belongs to
+    :type scope: str or NoneType
+    :returns: the running timer
+    :rtype: context manager
+    """
+    if enabled or tracing:
+        return _Timer(name, scope)
+    return _null_timer
+
+
+def span(name, threshold=False, **args):
+    """Measure a span of time that is only traced and not part of the
+    statistics.
+
+    :param name: the name of the span
+    :type name: str
+    :param threshold: only trace the span if it takes longer than the
+        threshold given to enable_tracing()
+    :type threshold: bool
+    :param args: further information to include in the trace event
+    :returns: the running span
+    :rtype: context manager
+    """
+    if tracing:
+        return _Timer(name, None, False, args, threshold)
+    return _null_timer
+
+
+def report(stream=None):
+    """Print the collected values as a table.
+
+    :param stream: the file to write to, defaults to sys.stderr
+    :type stream: io.TextIOBase
+    :returns: None
+    """
+    if not enabled:
+        return
+    total = time.perf_counter() - _start
+    _stop_running()
+    table = [["Address book", "Phase / counter", "Value"]]
+    scopes = [None] + sorted({scope for scope, _ in
+                              list(_times) + list(_counters)
+                              if scope is not None})
+    for scope in scopes:
+        for (key_scope, name), seconds in _times.items():
+            if key_scope == scope:
+                table.append([scope or "", name,
+                              "{:.1f} ms".format(seconds * 1000)])
+        for (key_scope, name), value in _counters.items():
+            if key_scope == scope:
+                table.append([scope or "", name, str(value)])
+    print("Statistics, total time {:.1f} ms:\n{}".format(
+        total * 1000, helpers.pretty_print(table)),
+        file=stream or sys.stderr)
+
+
+def _stop_running():
+    # the innermost timers first, so that the trace events are nested
+    for running in sorted(_running, key=lambda timer: -timer.start):
+        running.stop()
+
+
+def write_trace(path):
+    """Write the recorded trace events to a file.
+
+    Errors are only logged because the trace is written when the command
+    already ran.
+
+    :param path: the file to write, if it is a directory a file
+        khard-<pid>.json is created in it
+    :type path: str
+    :returns: None
+    """
+    if not tracing:
+        return
+    import json
+    _stop_running()
+    if os.path.isdir(path):
+        path = os.path.join(path, "khard-{}.json".format(os.getpid()))
+    events = [{"name": "process_name", "ph": "M", "pid": os.getpid(),
+               "args": {"name": "khard"}}] + _events
+    try:
+        with open(path, "w") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+    except OSError as err:
+        logging.warning("Could not write the trace to %s: %s", path, err)
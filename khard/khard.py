@@ -2,21 +2,23 @@
 
 import argparse
 import datetime
-from email import message_from_string
-from email.policy import SMTP as SMTP_POLICY
+import itertools
 import logging
 import os
 import re
 import subprocess
 import sys
-from tempfile import NamedTemporaryFile
-from unidecode import unidecode
+import time
 
 from . import helpers
+from . import instrumentation
+from . import profiling
+from . import query
 from .actions import Actions
 from .address_book import AddressBookCollection
 from .carddav_object import CarddavObject
 from .config import Config
+from .lookup import is_email_address_query, is_phone_number_query
 from .version import khard_version
 
 
@@ -32,12 +34,71 @@ def write_temp_file(text=""):
     :rtype: str
 
     """
+    from tempfile import NamedTemporaryFile
     with NamedTemporaryFile(mode='w+t', suffix='.yml', delete=False) \
          as tempfile:
         tempfile.write(text)
         return tempfile.name
 
 
+def print_lines(lines):
+    """Write lines to stdout as soon as they are produced.
+
+    The writes are buffered by sys.stdout, only the first line is flushed
+    right away so that a consumer like mutt can start reading while the rest
+    is still generated.  If the reading end of a pipe is closed early (like
+    in "khard email | head") the program exits quietly.
+
+    :param lines: the lines to print, without line endings
+    :type lines: iterable(str)
+    :returns: the number of printed lines
+    :rtype: int
+
+    """
+    count = 0
+    try:
+        for line in lines:
+            sys.stdout.write(line)
+            sys.stdout.write("\n")
+            count += 1
+            if count == 1:
+                sys.stdout.flush()
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Python flushes stdout again on exit which would fail in the same
+        # way, so the remaining output is redirected to /dev/null.
+        if sys.stdout is sys.__stdout__:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+    return count
+
+
+def matching_or_all(lines):
+    """Filter output lines by the search result while they are produced.
+
+    Matching lines are yielded immediately.  Lines that do not match are kept
+    until the first match is found, if there is none at all they are yielded
+    at the end as a fallback.
+
+    :param lines: the output lines together with the information whether
+        they match the search terms
+    :type lines: iterable(tuple(str, bool))
+    :returns: the matching lines or all lines if none of them match
+    :rtype: generator(str)
+
+    """
+    fallback = []
+    for line, matches in lines:
+        if matches:
+            fallback = None
+            yield line
+        elif fallback is not None:
+            fallback.append(line)
+    if fallback:
+        yield from fallback
+
+
 def create_new_contact(address_book):
     # create temp file
     template = (
@@ -273,7 +334,7 @@ def list_address_books(address_book_list):
     table = [["Index", "Address book"]]
     for index, address_book in enumerate(address_book_list):
         table.append([index + 1, address_book.name])
-    print(helpers.pretty_print(table))
+    print_lines(helpers.pretty_print_lines(table))
 
 
 def list_contacts(vcard_list):
@@ -361,35 +422,35 @@ def list_contacts(vcard_list):
             else:
                 row.append("")
         table.append(row)
-    print(helpers.pretty_print(table))
+    print_lines(helpers.pretty_print_lines(table))
 
 
 def list_birthdays(birthday_list):
     table = [["Name", "Birthday"]]
     for row in birthday_list:
         table.append(row.split("\t"))
-    print(helpers.pretty_print(table))
+    print_lines(helpers.pretty_print_lines(table))
 
 
 def list_phone_numbers(phone_number_list):
     table = [["Name", "Type", "Phone"]]
     for row in phone_number_list:
         table.append(row.split("\t"))
-    print(helpers.pretty_print(table))
+    print_lines(helpers.pretty_print_lines(table))
 
 
 def list_post_addresses(post_address_list):
     table = [["Name", "Type", "Post address"]]
     for row in post_address_list:
         table.append(row.split("\t"))
-    print(helpers.pretty_print(table))
+    print_lines(helpers.pretty_print_lines(table))
 
 
 def list_email_addresses(email_address_list):
     table = [["Name", "Type", "E-Mail"]]
     for row in email_address_list:
         table.append(row.split("\t"))
-    print(helpers.pretty_print(table))
+    print_lines(helpers.pretty_print_lines(table))
 
 
 def choose_address_book_from_list(header_string, address_book_list):
@@ -447,20 +508,17 @@ def choose_vcard_from_list(header_string, vcard_list):
     return selected_vcard
 
 
-def get_contact_list_by_user_selection(address_books, search, strict_search):
+def get_contact_list_by_user_selection(address_books, search):
     """returns a list of CarddavObject objects
     :param address_books: list of selected address books
     :type address_books: list(address_book.AddressBook)
     :param search: filter contact list
-    :type search: str
-    :param strict_search: if True, search only in full name field
-    :type strict_search: bool
+    :type search: query.Query
     :returns: list of CarddavObject objects
     :rtype: list(CarddavObject)
     """
-    return get_contacts(
-        address_books, search, "name" if strict_search else "all",
-        config.reverse(), config.group_by_addressbook(), config.sort)
+    return get_contacts(address_books, search, reverse=config.reverse(),
+                        group=config.group_by_addressbook(), sort=config.sort)
 
 
 def get_contacts(address_books, query, method="all", reverse=False,
@@ -470,8 +528,9 @@ def get_contacts(address_books, query, method="all", reverse=False,
     :param address_books: the address books to search
     :type address_books: list(address_book.AddressBook)
     :param query: a search query to select contacts
-    :type quer: str
-    :param method: the search method, one of "all", "name" or "uid"
+    :type query: str or query.Query
+    :param method: the search method for string queries, one of "all",
+        "name" or "uid"
     :type method: str
     :param reverse: reverse the order of the returned contacts
     :type reverse: bool
@@ -484,30 +543,37 @@ def get_contacts(address_books, query, method="all", reverse=False,
 
     """
     # Search for the contacts in all address books.
-    contacts = []
-    for address_book in address_books:
-        contacts.extend(address_book.search(query, method=method))
-    # Sort the contacts.
-    if group:
-        if sort == "first_name":
-            return sorted(contacts, reverse=reverse, key=lambda x: (
-                unidecode(x.address_book.name).lower(),
-                unidecode(x.get_first_name_last_name()).lower()))
-        if sort == "last_name":
-            return sorted(contacts, reverse=reverse, key=lambda x: (
-                unidecode(x.address_book.name).lower(),
-                unidecode(x.get_last_name_first_name()).lower()))
-        raise ValueError(
-            'sort must be "first_name" or "last_name" not {}.'.format(sort))
-    else:
-        if sort == "first_name":
-            return sorted(contacts, reverse=reverse, key=lambda x:
-                          unidecode(x.get_first_name_last_name()).lower())
-        if sort == "last_name":
-            return sorted(contacts, reverse=reverse, key=lambda x:
-                          unidecode(x.get_last_name_first_name()).lower())
+    with instrumentation.span("get contacts"):
+        contacts = []
+        for address_book in address_books:
+            contacts.extend(address_book.search(query, method=method))
+        return sort_contacts(contacts, reverse, group, sort)
+
+
+def sort_contacts(contacts, reverse=False, group=False, sort="first_name"):
+    """Sort a list of contacts.
+
+    :param contacts: the contacts to sort
+    :type contacts: list(CarddavObject)
+    :param reverse: reverse the order of the returned contacts
+    :type reverse: bool
+    :param group: group results by address book
+    :type group: bool
+    :param sort: the field to use for sorting, one of "first_name", "last_name"
+    :type sort: str
+    :returns: the sorted contacts
+    :rtype: list(CarddavObject)
+
+    """
+    if sort not in ("first_name", "last_name"):
         raise ValueError(
             'sort must be "first_name" or "last_name" not {}.'.format(sort))
+    with instrumentation.timer("sort"):
+        if group:
+            return sorted(contacts, reverse=reverse, key=lambda x: (
+                x.address_book.sort_key, x.get_sort_key(sort)))
+        return sorted(contacts, reverse=reverse,
+                      key=lambda x: x.get_sort_key(sort))
 
 
 def merge_args_into_config(args, config):
@@ -542,6 +608,9 @@ def merge_args_into_config(args, config):
     # skip unparsable vcards
     if "skip_unparsable" in args and args.skip_unparsable:
         config.set_skip_unparsable(True)
+    # do not use the vcard cache
+    if "no_cache" in args and args.no_cache:
+        config.set_use_cache(False)
     # If the user could but did not specify address books on the command line
     # it means they want to use all address books in that place.
     if "addressbook" in args and not args.addressbook:
@@ -574,73 +643,85 @@ def load_address_books(names, config, search_queries):
     # load address books which are defined in the configuration file
     for name in names:
         address_book = config.abook.get_abook(name)
-        address_book.load(
-            search_queries[address_book.name],
-            search_in_source_files=config.search_in_source_files())
+        with instrumentation.timer("load", name):
+            address_book.load(
+                search_queries[address_book.name],
+                search_in_source_files=config.search_in_source_files())
         yield address_book
 
 
 def prepare_search_queries(args):
-    """Prepare the search query string from the given command line args.
+    """Parse the search queries from the given command line args.
+
+    The search terms are parsed into args.search_query and, for merge, the
+    target contact into args.target_query.  The search term arguments are
+    replaced by a regular expression that matches the terms of the query.  It
+    is used to select the lines to print by some subcommands.
 
-    Each address book can get a search query string to filter vcards befor
-    loading them.  Depending on the question if the address book is used for
-    source or target searches different regexes have to be combined into one
-    search string.
+    Each address book can get a search query to filter vcards befor loading
+    them.  Depending on the question if the address book is used for source
+    or target searches the source and target queries have to be combined.
 
     :param args: the parsed command line
     :type args: argparse.Namespace
     :returns: a dict mapping abook names to their loading queries, if the query
         is None it means that all cards should be loaded
-    :rtype: dict(str:str or None)
+    :rtype: dict(str:query.Query or None)
 
     """
-    # get all possible search queries for address book parsing
-    source_queries = []
-    target_queries = []
-    if "source_search_terms" in args and args.source_search_terms:
-        escaped_term = ".*".join(re.escape(x)
-                                 for x in args.source_search_terms)
-        source_queries.append(escaped_term)
-        args.source_search_terms = escaped_term
-    if "search_terms" in args and args.search_terms:
-        escaped_term = ".*".join(re.escape(x) for x in args.search_terms)
-        source_queries.append(escaped_term)
-        args.search_terms = escaped_term
-    if "target_contact" in args and args.target_contact:
-        escaped_term = re.escape(args.target_contact)
-        target_queries.append(escaped_term)
-        args.target_contact = escaped_term
+    default_field = "name" if "strict_search" in args and \
+        args.strict_search else None
+    try:
+        if "source_search_terms" in args:
+            args.search_query = query.parse(args.source_search_terms,
+                                            default_field)
+            args.source_search_terms = args.search_query.regex()
+        elif "search_terms" in args:
+            args.search_query = query.parse(args.search_terms, default_field)
+            args.search_terms = args.search_query.regex()
+        else:
+            args.search_query = query.All()
+        if "target_contact" in args:
+            args.target_query = query.parse(args.target_contact)
+            if args.target_contact:
+                args.target_contact = args.target_query.regex()
+    except query.QueryError as err:
+        sys.exit("Error: Invalid search query: {}".format(err))
+    # Create the loading queries, None means that no query is given and hence
+    # all contacts should be loaded.
+    source_query = None
     if "uid" in args and args.uid:
-        source_queries.append(args.uid)
+        source_query = query.Term(args.uid, "uid")
+    elif not isinstance(args.search_query, query.All):
+        source_query = args.search_query
+    target_query = None
     if "target_uid" in args and args.target_uid:
-        target_queries.append(args.target_uid)
-    # create and return regexp, None means that no query is given and hence all
-    # contacts should be searched.
-    source_queries = "^.*(%s).*$" % ')|('.join(source_queries) \
-        if source_queries else None
-    target_queries = "^.*(%s).*$" % ')|('.join(target_queries) \
-        if target_queries else None
-    logging.debug('Created source query regex: %s', source_queries)
-    logging.debug('Created target query regex: %s', target_queries)
+        target_query = query.Term(args.target_uid, "uid")
+    elif "target_contact" in args and args.target_contact:
+        target_query = args.target_query
+    logging.debug('Created source query: %s', source_query)
+    logging.debug('Created target query: %s', target_query)
     # Get all possible search queries for address book parsing, always
     # depending on the fact if the address book is used to find source or
     # target contacts or both.
     queries = {abook.name: [] for abook in config.abook._abooks}
     for name in queries:
         if "addressbook" in args and name in args.addressbook:
-            queries[name].append(source_queries)
+            queries[name].append(source_query)
         if "target_addressbook" in args and name in args.target_addressbook:
-            queries[name].append(target_queries)
+            queries[name].append(target_query)
         # If None is included in the search queries of an address book it means
         # that either no source or target query was given and this address book
         # is affected by this.  All contacts should be loaded from that address
         # book.
-        if None in queries[name]:
+        if None in queries[name] or not queries[name]:
             queries[name] = None
+        elif len(queries[name]) == 1:
+            queries[name] = queries[name][0]
         else:
-            queries[name] = "({})".format(')|('.join(queries[name]))
-    logging.debug('Created query regex: %s', queries)
+            queries[name] = query.Or(queries[name])
+    logging.debug('Created queries: %s',
+                  {name: str(value) for name, value in queries.items()})
     return queries
 
 
@@ -679,23 +760,14 @@ def generate_contact_list(config, args):
         # contact.
         if "source_search_terms" in args:
             # exception for merge command
-            if args.source_search_terms:
-                args.search_terms = args.source_search_terms
-            else:
-                args.search_terms = ".*"
-        elif "search_terms" in args:
-            if args.search_terms:
-                args.search_terms = args.search_terms
-            else:
-                args.search_terms = ".*"
-        else:
+            args.search_terms = args.source_search_terms
+        elif "search_terms" not in args:
             # If no search terms where given on the command line we match
             # everything with the empty search pattern.
             args.search_terms = ".*"
-        logging.debug("args.search_terms=%s", args.search_terms)
-        vcard_list = get_contact_list_by_user_selection(
-            args.addressbook, args.search_terms,
-            args.strict_search if "strict_search" in args else False)
+        logging.debug("args.search_query=%s", args.search_query)
+        vcard_list = get_contact_list_by_user_selection(args.addressbook,
+                                                        args.search_query)
     return vcard_list
 
 
@@ -757,6 +829,8 @@ def add_email_subcommand(input_from_stdin_or_file, selected_address_books):
 
     """
     # get name and email address
+    from email import message_from_string
+    from email.policy import SMTP as SMTP_POLICY
     message = message_from_string(input_from_stdin_or_file, policy=SMTP_POLICY)
 
     print("Khard: Add email address to contact")
@@ -775,7 +849,8 @@ def add_email_subcommand(input_from_stdin_or_file, selected_address_books):
     # search for an existing contact
     selected_vcard = choose_vcard_from_list(
         "Select contact for the found e-mail address",
-        get_contact_list_by_user_selection(selected_address_books, name, True))
+        get_contact_list_by_user_selection(selected_address_books,
+                                           query.Term(name, "name")))
     if selected_vcard is None:
         # create new contact
         while True:
@@ -894,7 +969,7 @@ def birthdays_subcommand(vcard_list, parsable):
                                         vcard.get_formatted_birthday()))
     if birthday_list:
         if parsable:
-            print('\n'.join(birthday_list))
+            print_lines(birthday_list)
         else:
             list_birthdays(birthday_list)
     else:
@@ -918,8 +993,34 @@ def phone_subcommand(search_terms, vcard_list, parsable):
     :rtype: None
 
     """
-    all_phone_numbers_list = []
-    matching_phone_number_list = []
+    lines = matching_or_all(_phone_number_lines(search_terms, vcard_list,
+                                                parsable))
+    if parsable:
+        found = print_lines(lines)
+    else:
+        phone_number_list = list(lines)
+        if phone_number_list:
+            list_phone_numbers(phone_number_list)
+        found = len(phone_number_list)
+    if not found:
+        if not parsable:
+            print("Found no phone numbers")
+        sys.exit(1)
+
+
+def _phone_number_lines(search_terms, vcard_list, parsable):
+    """Generate the output lines of the phone subcommand.
+
+    :param search_terms: used as search term to filter the contacts
+    :type search_terms: str
+    :param vcard_list: the vcards to generate the lines for
+    :type vcard_list: list of carddav_object.CarddavObject
+    :param parsable: machine readable output: columns devided by tabulator (\t)
+    :type parsable: bool
+    :returns: the output lines and whether they match the search terms
+    :rtype: generator(tuple(str, bool))
+
+    """
     for vcard in vcard_list:
         for type, number_list in sorted(vcard.phone_numbers.items(),
                                         key=lambda k: k[0].lower()):
@@ -940,31 +1041,62 @@ def phone_subcommand(search_terms, vcard_list, parsable):
                 if re.search(search_terms,
                              "%s\n%s" % (line_formatted, line_parsable),
                              re.IGNORECASE | re.DOTALL):
-                    matching_phone_number_list.append(phone_number_line)
+                    yield phone_number_line, True
                 elif len(re.sub(r"\D", "", search_terms)) >= 3:
                     # The user likely searches for a phone number cause the
                     # search string contains at least three digits.  So we
                     # remove all non-digit chars from the phone number field
                     # and match against that.
-                    if re.search(re.sub(r"\D", "", search_terms),
-                                 re.sub(r"\D", "", number), re.IGNORECASE):
-                        matching_phone_number_list.append(phone_number_line)
-                # collect all phone numbers in a different list as fallback
-                all_phone_numbers_list.append(phone_number_line)
-    if matching_phone_number_list:
-        if parsable:
-            print('\n'.join(matching_phone_number_list))
-        else:
-            list_phone_numbers(matching_phone_number_list)
-    elif all_phone_numbers_list:
-        if parsable:
-            print('\n'.join(all_phone_numbers_list))
+                    yield phone_number_line, bool(re.search(
+                        re.sub(r"\D", "", search_terms),
+                        re.sub(r"\D", "", number), re.IGNORECASE))
+                else:
+                    yield phone_number_line, False
+
+
+def phone_lookup_subcommand(number, address_books, parsable):
+    """Print the phone numbers from the phone number index that match a
+    number.
+
+    :param number: the phone number to look up
+    :type number: str
+    :param address_books: the address books to search
+    :type address_books: list(address_book.AddressBook)
+    :param parsable: machine readable output: columns devided by tabulator (\t)
+    :type parsable: bool
+    :returns: weather any matching numbers where found
+    :rtype: bool
+
+    """
+    matches = {}
+    for address_book in address_books:
+        index = address_book.get_phone_number_index(
+            config.phone_country_code(), config.phone_trunk_prefix())
+        for contact, type, found in index.lookup(number):
+            # contacts are not hashable so they are mapped by their id
+            matches.setdefault(id(contact), (contact, []))[1].append(
+                (type, found))
+    if not matches:
+        return False
+    phone_number_list = []
+    for vcard in sort_contacts([contact for contact, _ in matches.values()],
+                               config.reverse(), config.group_by_addressbook(),
+                               config.sort):
+        if config.display_by_name() == "first_name":
+            name = vcard.get_first_name_last_name()
         else:
-            list_phone_numbers(all_phone_numbers_list)
+            name = vcard.get_last_name_first_name()
+        for type, found in sorted(matches[id(vcard)][1],
+                                  key=lambda k: (k[0].lower(), k[1])):
+            if parsable:
+                phone_number_list.append("\t".join([found, name, type]))
+            else:
+                phone_number_list.append("\t".join([name, type, found]))
+    if parsable:
+        print_lines(phone_number_list)
     else:
-        if not parsable:
-            print("Found no phone numbers")
-        sys.exit(1)
+        list_phone_numbers(phone_number_list)
+    return True
 
 
 def post_address_subcommand(search_terms, vcard_list, parsable):
@@ -982,8 +1114,34 @@ def post_address_subcommand(search_terms, vcard_list, parsable):
     :rtype: None
 
     """
-    all_post_address_list = []
-    matching_post_address_list = []
+    lines = matching_or_all(_post_address_lines(search_terms, vcard_list,
+                                                parsable))
+    if parsable:
+        found = print_lines(lines)
+    else:
+        post_address_list = list(lines)
+        if post_address_list:
+            list_post_addresses(post_address_list)
+        found = len(post_address_list)
+    if not found:
+        if not parsable:
+            print("Found no post adresses")
+        sys.exit(1)
+
+
+def _post_address_lines(search_terms, vcard_list, parsable):
+    """Generate the output lines of the postaddress subcommand.
+
+    :param search_terms: used as search term to filter the contacts
+    :type search_terms: str
+    :param vcard_list: the vcards to generate the lines for
+    :type vcard_list: list of carddav_object.CarddavObject
+    :param parsable: machine readable output: columns devided by tabulator (\t)
+    :type parsable: bool
+    :returns: the output lines and whether they match the search terms
+    :rtype: generator(tuple(str, bool))
+
+    """
     for vcard in vcard_list:
         # vcard name
         if config.display_by_name() == "first_name":
@@ -994,7 +1152,7 @@ def post_address_subcommand(search_terms, vcard_list, parsable):
         post_address_line_list = []
         if parsable:
             for type, post_address_list in sorted(
-                    vcard.get_post_addresses().items(),
+                    vcard.post_addresses.items(),
                     key=lambda k: k[0].lower()):
                 for post_address in post_address_list:
                     post_address_line_list.append(
@@ -1006,28 +1164,11 @@ def post_address_subcommand(search_terms, vcard_list, parsable):
                 for post_address in sorted(post_address_list):
                     post_address_line_list.append(
                         "\t".join([name, type, post_address]))
-        # add to matching and all post address lists
         for post_address_line in post_address_line_list:
-            if re.search(search_terms,
-                         "%s\n%s" % (post_address_line, post_address_line),
-                         re.IGNORECASE | re.DOTALL):
-                matching_post_address_list.append(post_address_line)
-            # collect all post addresses in a different list as fallback
-            all_post_address_list.append(post_address_line)
-    if matching_post_address_list:
-        if parsable:
-            print('\n'.join(matching_post_address_list))
-        else:
-            list_post_addresses(matching_post_address_list)
-    elif all_post_address_list:
-        if parsable:
-            print('\n'.join(all_post_address_list))
-        else:
-            list_post_addresses(all_post_address_list)
-    else:
-        if not parsable:
-            print("Found no post adresses")
-        sys.exit(1)
+            yield post_address_line, bool(re.search(
+                search_terms, "%s\n%s" % (post_address_line,
+                                          post_address_line),
+                re.IGNORECASE | re.DOTALL))
 
 
 def email_subcommand(search_terms, vcard_list, parsable, remove_first_line):
@@ -1053,8 +1194,38 @@ def email_subcommand(search_terms, vcard_list, parsable, remove_first_line):
     :rtype: None
 
     """
-    matching_email_address_list = []
-    all_email_address_list = []
+    lines = matching_or_all(_email_address_lines(search_terms, vcard_list,
+                                                 parsable))
+    if parsable:
+        header = []
+        if not remove_first_line:
+            # at least mutt requires that line
+            header.append("searching for '%s' ..." % search_terms)
+        found = print_lines(itertools.chain(header, lines)) - len(header)
+    else:
+        email_address_list = list(lines)
+        if email_address_list:
+            list_email_addresses(email_address_list)
+        found = len(email_address_list)
+    if not found:
+        if not parsable:
+            print("Found no email addresses")
+        sys.exit(1)
+
+
+def _email_address_lines(search_terms, vcard_list, parsable):
+    """Generate the output lines of the email subcommand.
+
+    :param search_terms: used as search term to filter the contacts
+    :type search_terms: str
+    :param vcard_list: the vcards to generate the lines for
+    :type vcard_list: list of carddav_object.CarddavObject
+    :param parsable: machine readable output: columns devided by tabulator (\t)
+    :type parsable: bool
+    :returns: the output lines and whether they match the search terms
+    :rtype: generator(tuple(str, bool))
+
+    """
     for vcard in vcard_list:
         for type, email_list in sorted(vcard.emails.items(),
                                        key=lambda k: k[0].lower()):
@@ -1072,34 +1243,63 @@ def email_subcommand(search_terms, vcard_list, parsable, remove_first_line):
                 else:
                     # else: start with name
                     email_address_line = line_formatted
-                if re.search(search_terms,
-                             "%s\n%s" % (line_formatted, line_parsable),
-                             re.IGNORECASE | re.DOTALL):
-                    matching_email_address_list.append(email_address_line)
-                # collect all email addresses in a different list as fallback
-                all_email_address_list.append(email_address_line)
-    if matching_email_address_list:
-        if parsable:
-            if not remove_first_line:
-                # at least mutt requires that line
-                print("searching for '%s' ..." % search_terms)
-            print('\n'.join(matching_email_address_list))
-        else:
-            list_email_addresses(matching_email_address_list)
-    elif all_email_address_list:
-        if parsable:
-            if not remove_first_line:
-                # at least mutt requires that line
-                print("searching for '%s' ..." % search_terms)
-            print('\n'.join(all_email_address_list))
+                yield email_address_line, bool(re.search(
+                    search_terms, "%s\n%s" % (line_formatted, line_parsable),
+                    re.IGNORECASE | re.DOTALL))
+
+
+def email_lookup_subcommand(search_terms, address, address_books, parsable,
+                            remove_first_line):
+    """Print the email addresses from the email address index that match an
+    address or domain.
+
+    :param search_terms: the search terms as given on the command line
+    :type search_terms: str
+    :param address: the email address or domain (starting with "@") to look
+        up
+    :type address: str
+    :param address_books: the address books to search
+    :type address_books: list(address_book.AddressBook)
+    :param parsable: machine readable output: columns devided by tabulator (\t)
+    :type parsable: bool
+    :param remove_first_line: remove first line (searching for '' ...)
+    :type remove_first_line: bool
+    :returns: weather any matching addresses where found
+    :rtype: bool
+
+    """
+    matches = {}
+    for address_book in address_books:
+        for contact, type, found in \
+                address_book.get_email_address_index().lookup(address):
+            # contacts are not hashable so they are mapped by their id
+            matches.setdefault(id(contact), (contact, []))[1].append(
+                (type, found))
+    if not matches:
+        return False
+    email_address_list = []
+    for vcard in sort_contacts([contact for contact, _ in matches.values()],
+                               config.reverse(), config.group_by_addressbook(),
+                               config.sort):
+        if config.display_by_name() == "first_name":
+            name = vcard.get_first_name_last_name()
         else:
-            list_email_addresses(all_email_address_list)
+            name = vcard.get_last_name_first_name()
+        for type, found in sorted(matches[id(vcard)][1],
+                                  key=lambda k: (k[0].lower(), k[1])):
+            if parsable:
+                email_address_list.append("\t".join([found, name, type]))
+            else:
+                email_address_list.append("\t".join([name, type, found]))
+    if parsable:
+        if not remove_first_line:
+            # at least mutt requires that line
+            email_address_list.insert(
+                0, "searching for '%s' ..." % search_terms)
+        print_lines(email_address_list)
     else:
-        if not parsable:
-            print("Found no email addresses")
-        elif not remove_first_line:
-            print("searching for '%s' ..." % search_terms)
-        sys.exit(1)
+        list_email_addresses(email_address_list)
+    return True
 
 
 def list_subcommand(vcard_list, parsable):
@@ -1118,19 +1318,38 @@ def list_subcommand(vcard_list, parsable):
             print("Found no contacts")
         sys.exit(1)
     elif parsable:
-        contact_line_list = []
-        for vcard in vcard_list:
-            if config.display_by_name() == "first_name":
-                name = vcard.get_first_name_last_name()
-            else:
-                name = vcard.get_last_name_first_name()
-            contact_line_list.append('\t'.join([vcard.uid, name,
-                                                vcard.address_book.name]))
-        print('\n'.join(contact_line_list))
+        if config.display_by_name() == "first_name":
+            get_name = CarddavObject.get_first_name_last_name
+        else:
+            get_name = CarddavObject.get_last_name_first_name
+        print_lines('\t'.join([vcard.uid, get_name(vcard),
+                               vcard.address_book.name])
+                    for vcard in vcard_list)
     else:
         list_contacts(vcard_list)
 
 
+def daemon_subcommand(args):
+    """Keep the config and the address books in memory and run the read only
+    subcommands for other khard processes.
+
+    :param args: the command line arguments of the daemon, they are applied
+        again when the config is reloaded
+    :type args: argparse.Namespace
+    :returns: None
+    :rtype: None
+
+    """
+    config_file = config.filename
+
+    def load_config():
+        new_config = Config(config_file)
+        merge_args_into_config(args, new_config)
+        return new_config
+    from . import daemon
+    daemon.Daemon(config, load_config, run).serve_forever()
+
+
 def modify_subcommand(selected_vcard, input_from_stdin_or_file, open_editor):
     """Modify a contact in an external editor.
 
@@ -1233,7 +1452,7 @@ def source_subcommand(selected_vcard, editor):
     child.communicate()
 
 
-def merge_subcommand(vcard_list, selected_address_books, search_terms,
+def merge_subcommand(vcard_list, selected_address_books, search_query,
                      target_uid):
     """Merge two contacts into one.
 
@@ -1242,8 +1461,8 @@ def merge_subcommand(vcard_list, selected_address_books, search_terms,
     :param selected_address_books: the addressbooks to use to find the target
         contact
     :type selected_address_books: list(addressbook.AddressBook)
-    :param search_terms: the search terms to find the target contact
-    :type search_terms: str
+    :param search_query: the search query to find the target contact
+    :type search_query: query.Query
     :param target_uid: the uid of the target contact or empty
     :type target_uid: str
     :returns: None
@@ -1251,7 +1470,7 @@ def merge_subcommand(vcard_list, selected_address_books, search_terms,
 
     """
     # Check arguments.
-    if target_uid != "" and search_terms != "":
+    if target_uid != "" and not isinstance(search_query, query.All):
         print("You can not specify a target uid and target search terms for a "
               "merge.")
         sys.exit(1)
@@ -1270,7 +1489,7 @@ def merge_subcommand(vcard_list, selected_address_books, search_terms,
             sys.exit(1)
     else:
         target_vcards = get_contact_list_by_user_selection(
-            selected_address_books, search_terms, False)
+            selected_address_books, search_query)
     # get the source vcard, from which to merge
     source_vcard = choose_vcard_from_list("Select contact from which to merge",
                                           vcard_list)
@@ -1296,6 +1515,63 @@ def merge_subcommand(vcard_list, selected_address_books, search_terms,
         merge_existing_contacts(source_vcard, target_vcard, True)
 
 
+def import_subcommand(selected_address_books, input_file, format):
+    """Import the contacts of a vCard, CSV or LDIF file.
+
+    :param selected_address_books: a list of addressbooks that were selected on
+        the command line
+    :type selected_address_books: list of address_book.AddressBook
+    :param input_file: the file to read or "-" for stdin
+    :type input_file: str
+    :param format: one of importer.FORMATS or None to guess it from the file
+        name
+    :type format: str or NoneType
+    :returns: None
+    :rtype: None
+
+    """
+    from . import importer
+    if len(selected_address_books) != 1:
+        sys.exit("Error: Select the address book to import into with -a")
+    address_book = selected_address_books[0]
+    format = format or importer.detect_format(input_file)
+    private_objects = config.get_supported_private_objects()
+    start = time.perf_counter()
+    show_progress = sys.stderr.isatty()
+
+    def progress(result):
+        elapsed = time.perf_counter() - start
+        sys.stderr.write("\rRead {} contacts ({:.0f} contacts/s)".format(
+            result.total, result.total / elapsed if elapsed else 0))
+        sys.stderr.flush()
+
+    try:
+        stream = sys.stdin if input_file == "-" else open(input_file,
+                                                          newline="")
+    except IOError as err:
+        sys.exit("Error: {}\n       File: {}".format(err.strerror,
+                                                     err.filename))
+    with stream:
+        result = importer.import_contacts(
+            address_book,
+            importer.read_records(stream, format, private_objects),
+            config.get_preferred_vcard_version(),
+            private_objects, config.parse_workers(),
+            progress=progress if show_progress else None)
+    elapsed = time.perf_counter() - start
+    if show_progress:
+        sys.stderr.write("\n")
+    print("Imported {} contacts into address book {} in {:.1f} s ({:.0f} "
+          "contacts/s)".format(result.imported, address_book, elapsed,
+                               result.total / elapsed if elapsed else 0))
+    if result.duplicates:
+        print("Skipped {} contacts with existing UIDs".format(
+            result.duplicates))
+    if result.errors:
+        print("Skipped {} invalid contacts".format(result.errors))
+        sys.exit(1)
+
+
 def copy_or_move_subcommand(action, vcard_list, target_address_book_list):
     """Copy or move a contact to a different address book.
 
@@ -1337,8 +1613,9 @@ def copy_or_move_subcommand(action, vcard_list, target_address_book_list):
     # check if a contact already exists in the target address book
     target_vcard = choose_vcard_from_list(
         "Select target contact which to overwrite",
-        get_contact_list_by_user_selection([selected_target_address_book],
-                                           source_vcard.formatted_name, True))
+        get_contact_list_by_user_selection(
+            [selected_target_address_book],
+            query.Term(source_vcard.formatted_name, "name")))
     # If the target contact doesn't exist, move or copy the source contact into
     # the target address book without further questions.
     if target_vcard is None:
@@ -1383,12 +1660,20 @@ def copy_or_move_subcommand(action, vcard_list, target_address_book_list):
                 break
 
 
-def parse_args(argv):
+def parse_args(argv, loaded_config=None, actions=None):
     """Parse the command line arguments and return the namespace that was
     creates by argparse.ArgumentParser.parse_args().
 
+    :param argv: the command line arguments
+    :type argv: list(str)
+    :param loaded_config: the config to use instead of loading the config
+        file given on the command line
+    :type loaded_config: config.Config
+    :param actions: the subcommands that are allowed, all if None
+    :type actions: list(str)
     :returns: the namespace parsed from the command line
     :rtype: argparse.Namespace
+    :raises: daemon.Refused if the subcommand is not allowed
 
     """
     # Create the base argument parser.  It will be reused for the first and
@@ -1401,6 +1686,17 @@ def parse_args(argv):
                       help="enable debug output")
     base.add_argument("--skip-unparsable", action="store_true",
                       help="skip unparsable vcard files")
+    base.add_argument("--no-cache", action="store_true",
+                      help="do not use the cache of parsed vcard files")
+    base.add_argument("--startup-profile", action="store_true",
+                      help="run the command in a new process and report the "
+                      "time spent to\nstart it and to import each package")
+    base.add_argument("--profile", metavar="PATH",
+                      help="profile the command, write the statistics to "
+                      "PATH and\nprint a summary")
+    base.add_argument("--stats", action="store_true",
+                      help="print the time spent in each phase and some "
+                      "counters\nto stderr at exit")
     base.add_argument("-v", "--version", action="version",
                       version="Khard version %s" % khard_version)
 
@@ -1493,7 +1789,7 @@ def parse_args(argv):
         "-u", "--uid", default="", help="select contact by uid")
     default_search_parser.add_argument(
         "search_terms", nargs="*", metavar="search terms",
-        help="search in all fields to find matching contact")
+        help="search query to find matching contacts, see the manpage")
     merge_search_parser = argparse.ArgumentParser(add_help=False)
     merge_search_parser.add_argument(
         "-f", "--search-in-source-files", action="store_true",
@@ -1549,6 +1845,17 @@ def parse_args(argv):
         "-o", "--output-file", default=sys.stdout,
         type=argparse.FileType("w"),
         help="Specify output template file name or use stdout by default")
+    export_parser.add_argument(
+        "--all", action="store_true",
+        help="Export all matching contacts to one file instead of the "
+        "template of one contact")
+    export_parser.add_argument(
+        "--format", choices=("vcf", "ndjson", "csv"),
+        help="The file format for --all (default: vcf)")
+    export_parser.add_argument(
+        "--raw", action="store_true",
+        help="Copy the vcard files unchanged with --all (only for the vcf "
+        "format)")
     birthdays_parser = subparsers.add_parser(
         "birthdays",
         aliases=Actions.get_aliases("birthdays"),
@@ -1611,6 +1918,23 @@ def parse_args(argv):
     new_parser.add_argument(
         "--vcard-version", choices=("3.0", "4.0"),
         help="Select preferred vcard version for new contact")
+    import_parser = subparsers.add_parser(
+        "import",
+        aliases=Actions.get_aliases("import"),
+        parents=[new_addressbook_parser],
+        description="import the contacts of a vCard file with several cards, "
+        "a CSV file or an LDIF file",
+        help="import contacts from a vCard, CSV or LDIF file")
+    import_parser.add_argument(
+        "--format", choices=("vcf", "csv", "ldif"),
+        help="The format of the file, guessed from the file name by default")
+    import_parser.add_argument(
+        "--vcard-version", choices=("3.0", "4.0"),
+        help="Select preferred vcard version for contacts from CSV and LDIF "
+        "files")
+    import_parser.add_argument(
+        "file", nargs="?", default="-",
+        help="The file to import, stdin by default")
     add_email_parser = subparsers.add_parser(
         "add-email",
         aliases=Actions.get_aliases("add-email"),
@@ -1672,6 +1996,13 @@ def parse_args(argv):
                  sort_parser],
         description="list filenames of all matching contacts",
         help="list filenames of all matching contacts")
+    subparsers.add_parser(
+        "daemon",
+        aliases=Actions.get_aliases("daemon"),
+        description="keep the address books in memory and answer the "
+        "listing subcommands of other khard processes from there",
+        help="keep the address books in memory to speed up other khard "
+        "processes")
 
     # Replace the print_help method of the first parser with the print_help
     # method of the main parser.  This makes it possible to have the first
@@ -1696,7 +2027,8 @@ def parse_args(argv):
 
     # Create the global config instance.
     global config
-    config = Config(args.config)
+    with instrumentation.timer("config"):
+        config = loaded_config or Config(args.config)
 
     # Check the log level again and merge the value from the command line with
     # the config file.
@@ -1711,9 +2043,21 @@ def parse_args(argv):
         remainder.insert(0, config.default_action)
         logging.debug("updated remainder=%s", remainder)
 
-    # Save the last option that needs to be carried from the first parser run
+    # Subcommands that are not allowed are refused before the remainder is
+    # parsed because the parser already opens the output files of some of
+    # them.
+    if actions is not None:
+        action = remainder[0] if remainder[0] in Actions.get_actions() \
+            else Actions.get_action(remainder[0])
+        if action not in actions:
+            from . import daemon
+            raise daemon.Refused("subcommand {} is not supported".format(
+                action))
+
+    # Save the last options that need to be carried from the first parser run
     # to the second.
     skip = args.skip_unparsable
+    no_cache = args.no_cache
 
     # Parse the remainder of the command line.  All options from the previous
     # run have already been processed and are not needed any more.
@@ -1721,6 +2065,7 @@ def parse_args(argv):
 
     # Restore settings that are left from the first parser run.
     args.skip_unparsable = skip
+    args.no_cache = no_cache
     logging.debug("second args=%s", args)
 
     # An integrity check for some options.
@@ -1730,11 +2075,76 @@ def parse_args(argv):
         # If an uid was given we require that no search terms where given.
         parser.error("You can not give arbitrary search terms and --uid at the"
                      " same time.")
+    if "all" in args and not args.all and (args.format or args.raw):
+        parser.error("--format and --raw can only be used with --all.")
+    if "raw" in args and args.raw and args.format not in (None, "vcf"):
+        parser.error("--raw can only be used with the vcf format.")
     return args
 
 
 def main(argv=sys.argv[1:]):
-    args = parse_args(argv)
+    startup_profile, argv = profiling.remove_global_flag(
+        argv, "--startup-profile")
+    if startup_profile:
+        status = profiling.startup_profile(argv)
+        if status:
+            sys.exit(status)
+        return
+    stats, argv = profiling.remove_global_flag(argv, "--stats")
+    if stats:
+        instrumentation.enable()
+    # Tracing is switched on in the environment so that it also works for
+    # khard processes started by other programs.
+    trace_file = os.environ.get("KHARD_TRACE")
+    if trace_file:
+        try:
+            threshold = float(os.environ.get("KHARD_TRACE_THRESHOLD", 1))
+        except ValueError:
+            threshold = 1
+        instrumentation.enable_tracing(threshold / 1000)
+    profile_file, argv = profiling.remove_global_option(argv, "--profile")
+    try:
+        with instrumentation.span("khard", argv=argv):
+            if profile_file:
+                profiling.profile(lambda: _main(argv), profile_file)
+            else:
+                _main(argv)
+    finally:
+        if stats:
+            instrumentation.report()
+        if trace_file:
+            instrumentation.write_trace(trace_file)
+        if stats or trace_file:
+            instrumentation.disable()
+
+
+def _main(argv):
+    # Read only subcommands are answered by a running daemon if possible.
+    from . import daemon
+    with instrumentation.timer("daemon"):
+        status = daemon.forward(argv)
+    if status is not None:
+        if status:
+            sys.exit(status)
+        return
+    run(argv)
+
+
+def run(argv, loaded_config=None, actions=None):
+    """Run khard with the given command line.
+
+    :param argv: the command line arguments
+    :type argv: list(str)
+    :param loaded_config: the config to use instead of loading the config
+        file given on the command line
+    :type loaded_config: config.Config
+    :param actions: the subcommands that are allowed to run, all if None
+    :type actions: list(str)
+    :returns: None
+    :raises: daemon.Refused if the subcommand is not allowed
+
+    """
+    args = parse_args(argv, loaded_config, actions)
 
     # if args.action isn't one of the defined actions, it must be an alias
     if args.action not in Actions.get_actions():
@@ -1750,20 +2160,65 @@ def main(argv=sys.argv[1:]):
         return
 
     merge_args_into_config(args, config)
+    if args.action == "daemon":
+        daemon_subcommand(args)
+        return
     search_queries = prepare_search_queries(args)
 
     # load address books
-    if "addressbook" in args:
-        args.addressbook = list(load_address_books(args.addressbook, config,
-                                                   search_queries))
-    if "target_addressbook" in args:
-        args.target_addressbook = list(load_address_books(
-            args.target_addressbook, config, search_queries))
+    with instrumentation.span("load address books"):
+        if "addressbook" in args:
+            args.addressbook = list(load_address_books(
+                args.addressbook, config, search_queries))
+        if "target_addressbook" in args:
+            args.target_addressbook = list(load_address_books(
+                args.target_addressbook, config, search_queries))
+
+    if args.action == "import":
+        import_subcommand(args.addressbook, args.file, args.format)
+        return
+
+    # Phone numbers are looked up in an index if the search terms look like a
+    # phone number.
+    if args.action == "phone" and not args.uid:
+        terms = query.plain_terms(args.search_query, (None, "phone"))
+        number = is_phone_number_query(".*".join(
+            re.escape(term) for term in terms),
+            config.phone_trunk_prefix()) if terms else None
+        with instrumentation.timer("lookup"):
+            found = number and phone_lookup_subcommand(
+                number, args.addressbook, args.parsable)
+        if found:
+            return
+    # Email addresses and domains are looked up in an index.
+    if args.action == "email" and not args.uid:
+        terms = query.plain_terms(args.search_query, (None, "email"))
+        address = is_email_address_query(re.escape(terms[0])) \
+            if terms and len(terms) == 1 else None
+        with instrumentation.timer("lookup"):
+            found = address and email_lookup_subcommand(
+                args.search_terms, address, args.addressbook, args.parsable,
+                args.remove_first_line)
+        if found:
+            return
 
     vcard_list = generate_contact_list(config, args)
+    with instrumentation.timer("render"):
+        run_subcommand(args, vcard_list)
+
+
+def run_subcommand(args, vcard_list):
+    """Run the subcommand of the command line with the selected contacts.
 
+    :param args: the parsed command line
+    :type args: argparse.Namespace
+    :param vcard_list: the contacts that match the search of the command line
+    :type vcard_list: list(carddav_object.CarddavObject)
+    :returns: None
+
+    """
     if args.action == "filename":
-        print('\n'.join(contact.filename for contact in vcard_list))
+        print_lines(contact.filename for contact in vcard_list)
         return
 
     # read from template file or stdin if available
@@ -1819,6 +2274,10 @@ def main(argv=sys.argv[1:]):
             "#   or with: cat template.yaml | khard new -a address_book\n"
             "\n%s" % (khard_version, helpers.get_new_contact_template(
                 config.get_supported_private_objects())))
+    elif args.action == "export" and args.all:
+        from . import exporter
+        exporter.export_contacts(vcard_list, args.output_file,
+                                 args.format or "vcf", args.raw)
     elif args.action in ["details", "modify", "remove", "source", "export"]:
         selected_vcard = choose_vcard_from_list(
             "Select contact for %s action" % args.action.title(), vcard_list)
@@ -1842,7 +2301,7 @@ def main(argv=sys.argv[1:]):
             source_subcommand(selected_vcard, config.editor)
     elif args.action == "merge":
         merge_subcommand(vcard_list, args.target_addressbook,
-                         args.target_contact, args.target_uid)
+                         args.target_query, args.target_uid)
     elif args.action in ["copy", "move"]:
         copy_or_move_subcommand(
             args.action, vcard_list, args.target_addressbook)
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""Indexes to look up contacts by their phone numbers or email addresses."""
+
+import bisect
+import re
+
+from .search_index import literal_terms
+
+
+def is_phone_number_query(query, trunk_prefix="0"):
+    """Check if a search query looks like a complete phone number.
+
+    Only numbers that start with an international prefix ("+" or "00") or
+    the national trunk prefix are complete.  Other numbers are searched as
+    part of the phone numbers without the index because they might match in
+    the middle of a number.
+
+    :param query: the (escaped) search query from the command line
+    :type query: str
+    :param trunk_prefix: the prefix for national calls, e.g. "0"
+    :type trunk_prefix: str
+    :returns: the unescaped phone number or None
+    :rtype: str or NoneType
+    """
+    terms = literal_terms(query) if query else None
+    if not terms:
+        return None
+    number = " ".join(terms)
+    if not re.match(r"^[\d\s+\-/().]+$", number):
+        return None
+    digits = re.sub(r"\D", "", number)
+    if len(digits) < PhoneNumberIndex.min_suffix_length:
+        return None
+    if number.lstrip().startswith("+") or digits.startswith("00") or \
+            (trunk_prefix and digits.startswith(trunk_prefix)):
+        return number
+    return None
+
+
+class PhoneNumberIndex:
+    """Map normalized phone numbers to contacts.
+
+    Phone numbers are normalized to their digits.  International prefixes
+    ("+" or "00") followed by the configured country code and the national
+    trunk prefix (usually "0") are removed so that "+49 30 123456" and
+    "030 123456" are stored as the same number.  The normalized numbers are
+    kept in a sorted list of reversed strings so that all numbers ending with
+    some digits can be found with a binary search.
+    """
+
+    # Stored numbers need to have at least this many digits to be found as a
+    # suffix of a longer query.
+    min_suffix_length = 6
+
+    def __init__(self, country_code="", trunk_prefix="0"):
+        """
+        :param country_code: the local country calling code without
+            international prefix, e.g. "49"
+        :type country_code: str
+        :param trunk_prefix: the prefix for national calls, e.g. "0"
+        :type trunk_prefix: str
+        """
+        self.settings = (country_code, trunk_prefix)
+        self._country_code = country_code
+        self._trunk_prefix = trunk_prefix
+        self._entries = []
+        self._keys = []
+        self._sorted = True
+        self._exact = {}
+        self._contact_entries = {}
+
+    def normalize(self, number):
+        """Normalize a phone number to the digits used as index key.
+
+        :param number: the phone number as entered by a user
+        :type number: str
+        :returns: the normalized digits
+        :rtype: str
+        """
+        digits = re.sub(r"\D", "", number)
+        if number.lstrip().startswith("+"):
+            international = digits
+        elif digits.startswith("00"):
+            international = digits[2:]
+        elif self._trunk_prefix and digits.startswith(self._trunk_prefix):
+            return digits[len(self._trunk_prefix):]
+        else:
+            return digits
+        if self._country_code and international.startswith(
+                self._country_code):
+            return international[len(self._country_code):]
+        return international
+
+    def add_contact(self, contact):
+        """Add all phone numbers of a contact to the index.
+
+        :param contact: the contact to add
+        :type contact: carddav_object.CarddavObject
+        :returns: None
+        """
+        for type, number_list in contact.phone_numbers.items():
+            for number in number_list:
+                key = self.normalize(number)
+                if not key:
+                    continue
+                entry = (key[::-1], contact, type, number)
+                self._entries.append(entry)
+                self._exact.setdefault(key, []).append(entry)
+                # contacts are not hashable so they are mapped by their id
+                self._contact_entries.setdefault(id(contact), []).append(
+                    entry)
+        self._sorted = False
+
+    def remove_contact(self, contact):
+        """Remove all phone numbers of a contact from the index.
+
+        Only the entries of the contact are touched.
+
+        :param contact: the contact to remove
+        :type contact: carddav_object.CarddavObject
+        :returns: None
+        """
+        for entry in self._contact_entries.pop(id(contact), []):
+            key = entry[0][::-1]
+            exact = [other for other in self._exact[key]
+                     if other is not entry]
+            if exact:
+                self._exact[key] = exact
+            else:
+                del self._exact[key]
+            if self._sorted:
+                index = bisect.bisect_left(self._keys, entry[0])
+                while self._entries[index] is not entry:
+                    index += 1
+                del self._keys[index]
+            else:
+                index = next(index for index, other in
+                             enumerate(self._entries) if other is entry)
+            del self._entries[index]
+
+    def _sort(self):
+        if not self._sorted:
+            self._entries.sort(key=lambda entry: entry[0])
+            self._keys = [entry[0] for entry in self._entries]
+            self._sorted = True
+
+    def lookup(self, number):
+        """Find all phone numbers matching the given number.
+
+        A stored number matches if its normalized form ends with the
+        normalized query or if the normalized query ends with it (and it is
+        long enough to be significant).
+
+        :param number: the phone number to search for
+        :type number: str
+        :returns: the matching contacts with the type and the original form of
+            the matching number
+        :rtype: list(tuple(carddav_object.CarddavObject, str, str))
+        """
+        key = self.normalize(number)
+        if not key:
+            return []
+        self._sort()
+        reverse = key[::-1]
+        start = bisect.bisect_left(self._keys, reverse)
+        # ":" sorts directly after "9"
+        end = bisect.bisect_left(self._keys, reverse + ":", start)
+        found = self._entries[start:end]
+        for length in range(self.min_suffix_length, len(key)):
+            found.extend(self._exact.get(key[-length:], []))
+        results = []
+        seen = set()
+        for entry in found:
+            if id(entry) not in seen:
+                seen.add(id(entry))
+                results.append(entry[1:])
+        return results
+
+
+def is_email_address_query(query):
+    """Check if a search query is an email address or a domain.
+
+    :param query: the (escaped) search query from the command line
+    :type query: str
+    :returns: the unescaped email address or domain (starting with "@") or
+        None
+    :rtype: str or NoneType
+    """
+    terms = literal_terms(query) if query else None
+    if not terms or len(terms) != 1:
+        return None
+    if re.match(r"^[^@\s]*@[^@\s]+\.[^@\s]+$", terms[0]):
+        return terms[0]
+    return None
+
+
+class EmailAddressIndex:
+    """Map case folded email addresses and domains to contacts.
+
+    The domains are also kept in a sorted list so that all addresses that
+    contain a query like "jo@example.com" can be found with a binary search:
+    their domain starts with the domain of the query and their local part
+    ends with its local part.
+    """
+
+    def __init__(self):
+        self._addresses = {}
+        self._domains = {}
+        self._sorted_domains = None
+        self._contact_keys = {}
+
+    @staticmethod
+    def get_addresses(contact):
+        """List the email addresses of a contact in the form used by the
+        index.
+
+        :param contact: the contact
+        :type contact: carddav_object.CarddavObject
+        :returns: the type and address of each email address
+        :rtype: list(tuple(str, str))
+        """
+        return [(type, address) for type, address_list in
+                contact.emails.items() for address in address_list]
+
+    def add_contact(self, contact, addresses=None):
+        """Add all email addresses of a contact to the index.
+
+        :param contact: the contact to add
+        :type contact: carddav_object.CarddavObject
+        :param addresses: the result of get_addresses(contact) if it is
+            already known
+        :type addresses: list(tuple(str, str))
+        :returns: None
+        """
+        if addresses is None:
+            addresses = self.get_addresses(contact)
+        keys = self._contact_keys.setdefault(id(contact), [])
+        for type, address in addresses:
+            key = address.strip().casefold()
+            entry = (contact, type, address)
+            self._addresses.setdefault(key, []).append(entry)
+            domain = key.rpartition("@")[2]
+            if domain not in self._domains:
+                self._sorted_domains = None
+            self._domains.setdefault(domain, []).append(entry)
+            keys.append(key)
+
+    def remove_contact(self, contact):
+        """Remove all email addresses of a contact from the index.
+
+        Only the entries for the addresses of the contact are touched.
+
+        :param contact: the contact to remove
+        :type contact: carddav_object.CarddavObject
+        :returns: None
+        """
+        for key in self._contact_keys.pop(id(contact), []):
+            for mapping, mapping_key in ((self._addresses, key),
+                                         (self._domains,
+                                          key.rpartition("@")[2])):
+                if mapping_key not in mapping:
+                    # the same address was listed twice
+                    continue
+                entries = [entry for entry in mapping[mapping_key]
+                           if entry[0] is not contact]
+                if entries:
+                    mapping[mapping_key] = entries
+                else:
+                    del mapping[mapping_key]
+                    self._sorted_domains = None
+
+    def lookup(self, address):
+        """Find the contacts with email addresses that contain the given
+        address.
+
+        Like the search of the email subcommand "jo@example.com" also finds
+        "banjo@example.com" and "@example.com" also finds
+        "jo@example.com.au".
+
+        :param address: the email address or domain (starting with "@") to
+            search for
+        :type address: str
+        :returns: the matching contacts with the type and the original form of
+            the address
+        :rtype: list(tuple(carddav_object.CarddavObject, str, str))
+        """
+        local, _, domain = address.strip().casefold().rpartition("@")
+        if self._sorted_domains is None:
+            self._sorted_domains = sorted(self._domains)
+        results = []
+        start = bisect.bisect_left(self._sorted_domains, domain)
+        for key in self._sorted_domains[start:]:
+            if not key.startswith(domain):
+                break
+            results.extend(
+                entry for entry in self._domains[key]
+                if entry[2].strip().casefold().rpartition("@")[0].endswith(
+                    local))
+        return results
+
+    def __contains__(self, address):
+        return address.strip().casefold() in self._addresses
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""Tools to measure where khard spends its time."""
+
+import subprocess
+import sys
+import time
+
+from . import helpers
+
+
+# global options that take a value
+_options_with_value = ("-c", "--config", "--profile")
+
+
+def remove_global_flag(argv, flag):
+    """Remove a flag from the global options of a khard command line.
+
+    Only the options in front of the subcommand are searched.
+
+    :param argv: the command line arguments
+    :type argv: list(str)
+    :param flag: the flag to remove
+    :type flag: str
+    :returns: whether the flag was given and the remaining arguments
+    :rtype: tuple(bool, list(str))
+    """
+    args = list(argv)
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg == flag:
+            del args[index]
+            return True, args
+        elif arg in _options_with_value:
+            # skip the value of the option
+            index += 1
+        elif not arg.startswith("-"):
+            break
+        index += 1
+    return False, args
+
+
+def remove_global_option(argv, option):
+    """Remove an option with a value from the global options of a khard
+    command line.
+
+    Only the options in front of the subcommand are searched.  If the value
+    is missing the arguments are returned unchanged, so that the argument
+    parser can report the error.
+
+    :param argv: the command line arguments
+    :type argv: list(str)
+    :param option: the long option to remove
+    :type option: str
+    :returns: the value of the option or None if it was not given and the
+        remaining arguments
+    :rtype: tuple(str or NoneType, list(str))
+    """
+    args = list(argv)
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg == option and index + 1 < len(args):
+            value = args[index + 1]
+            del args[index:index + 2]
+            return value, args
+        elif arg.startswith(option + "="):
+            del args[index]
+            return arg[len(option) + 1:], args
+        elif arg in _options_with_value:
+            index += 1
+        elif not arg.startswith("-"):
+            break
+        index += 1
+    return None, argv
+
+
+def parse_import_times(text):
+    """Split the output of "python -X importtime" from other output.
+
+    :param text: the stderr output of the python process
+    :type text: str
+    :returns: the imported modules as tuples of name, self time, cumulative
+        time (both in microseconds) and nesting depth, and the remaining
+        lines
+    :rtype: tuple(list(tuple(str, int, int, int)), str)
+    """
+    imports = []
+    other = []
+    for line in text.splitlines(True):
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            self_time, cumulative = int(fields[0]), int(fields[1])
+        except (IndexError, ValueError):
+            # the header line
+            continue
+        name = fields[2].rstrip("\n")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        imports.append((name.strip(), self_time, cumulative, depth))
+    return imports, "".join(other)
+
+
+def import_times_by_package(imports):
+    """Sum up the time spent to import the modules of each package.
+
+    :param imports: the imported modules as returned by parse_import_times()
+    :type imports: list(tuple(str, int, int, int))
+    :returns: the import time in microseconds by top level package name,
+        slowest first
+    :rtype: list(tuple(str, int))
+    """
+    packages = {}
+    for name, self_time, _, _ in imports:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_time
+    return sorted(packages.items(), key=lambda item: (-item[1], item[0]))
+
+
+def startup_profile(argv, limit=15):
+    """Run a khard command line in a new interpreter and report how long it
+    took to start and which packages where imported.
+
+    The output of the command is passed through, the report is printed to
+    stderr afterwards.
+
+    :param argv: the command line arguments for khard
+    :type argv: list(str)
+    :param limit: the number of packages to list
+    :type limit: int
+    :returns: the exit status of the command
+    :rtype: int
+    """
+    if sys.version_info < (3, 7):
+        sys.exit("--startup-profile needs python 3.7 or later")
+    command = [sys.executable, "-X", "importtime", "-m", "khard"] + argv
+    start = time.perf_counter()
+    process = subprocess.run(command, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    elapsed = time.perf_counter() - start
+    imports, stderr = parse_import_times(process.stderr)
+    sys.stderr.write(stderr)
+    total = sum(cumulative for _, _, cumulative, depth in imports
+                if depth == 0)
+    packages = import_times_by_package(imports)
+    table = [["Package", "Import time"]]
+    table.extend([name, "{:.1f} ms".format(time / 1000)]
+                 for name, time in packages[:limit])
+    rest = sum(time for _, time in packages[limit:])
+    if rest:
+        table.append(["({} more)".format(len(packages) - limit),
+                      "{:.1f} ms".format(rest / 1000)])
+    print("Startup profile of: khard {}\n"
+          "Total time: {:.1f} ms\n"
+          "Import time: {:.1f} ms for {} modules\n".format(
+              " ".join(argv), elapsed * 1000, total / 1000, len(imports)),
+          file=sys.stderr)
+    print(helpers.pretty_print(table), file=sys.stderr)
+    return process.returncode
+
+
+def profile(function, filename, limit=20):
+    """Run a function under the profiler and report where the time was
+    spent.
+
+    The statistics are written to a file that can be read with the pstats
+    module, the functions with the highest cumulative time are printed to
+    stderr.  This also happens if the function raises an exception, like
+    SystemExit.
+
+    :param function: the function to profile, it is called without arguments
+    :type function: callable
+    :param filename: the path of the file to write the statistics to
+    :type filename: str
+    :param limit: the number of functions to print
+    :type limit: int
+    :returns: the return value of the function
+    """
+    try:
+        import cProfile as profile_module
+    except ImportError:
+        # python implementations without the C extension
+        import profile as profile_module
+    import pstats
+    profiler = profile_module.Profile()
+    try:
+        return profiler.runcall(function)
+    finally:
+        profiler.dump_stats(filename)
+        print("Profile written to {}".format(filename), file=sys.stderr)
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(limit)
@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+"""A small query language to select contacts.
+
+A query consists of search terms that are combined with AND (the default if
+no operator is given), OR and NOT.  Parentheses group terms.  A term is a
+word or a phrase in double quotes and can be restricted to one field of the
+contacts with a prefix: name:, email:, phone:, org:, cat: or uid:.  Terms
+without a prefix are searched in all fields.  All terms are matched case
+insensitively as substrings, except uid: which matches the beginning of the
+uid.
+
+Examples:
+
+    john smith
+    name:"john smith" OR email:@example.com
+    cat:work NOT org:acme
+
+A parsed query is a tree of nodes.  Besides checking if a contact matches it
+can find candidate contacts in the indexes of an address book and check the
+source text of a vCard file before it is parsed.
+"""
+
+import re
+
+from . import helpers
+
+
+# the fields that terms can be restricted to
+FIELDS = ("name", "email", "phone", "org", "cat", "uid")
+
+
+class QueryError(ValueError):
+    """Raised for search queries with syntax errors."""
+
+
+def _strings(value):
+    """Flatten the nested lists returned by CarddavObject properties.
+
+    :param value: a string or a (nested) list of strings
+    :type value: str or list
+    :returns: all strings in value
+    :rtype: list(str)
+    """
+    if isinstance(value, str):
+        return [value]
+    return [string for item in value for string in _strings(item)]
+
+
+def _digits(text):
+    return re.sub(r"\D", "", text)
+
+
+class _Text:
+    """The text of a contact or a vCard file that is searched for terms
+    without a field.  The clean variant without special characters is only
+    computed if needed.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._clean = None
+
+    @property
+    def clean(self):
+        if self._clean is None:
+            self._clean = re.sub("[^a-zA-Z0-9\n]", "", self.text)
+        return self._clean
+
+
+class _Contact:
+    """Wrap a contact to compute its printed details only once while a query
+    is evaluated.
+    """
+
+    def __init__(self, contact):
+        self.contact = contact
+        self._details = None
+
+    @property
+    def details(self):
+        if self._details is None:
+            self._details = _Text(self.contact.print_vcard())
+        return self._details
+
+    def get_field(self, field):
+        """Get the values of a field of the contact.
+
+        :param field: one of FIELDS
+        :type field: str
+        :returns: the values of the field
+        :rtype: list(str)
+        """
+        contact = self.contact
+        if field == "name":
+            return [contact.formatted_name]
+        elif field == "email":
+            return _strings(list(contact.emails.values()))
+        elif field == "phone":
+            return _strings(list(contact.phone_numbers.values()))
+        elif field == "org":
+            return [helpers.list_to_string(org, ", ")
+                    for org in contact.organisations]
+        elif field == "cat":
+            return _strings(contact.categories)
+        return [contact.uid]
+
+
+class Query:
+    """Base class for the nodes of a parsed query."""
+
+    def matches(self, contact):
+        """Check if a contact matches the query.
+
+        Only the fields used in the query are looked at.
+
+        :param contact: the contact to check
+        :type contact: carddav_object.CarddavObject
+        :returns: True if the contact matches
+        :rtype: bool
+        """
+        return self._matches(_Contact(contact))
+
+    def _matches(self, contact):
+        raise NotImplementedError
+
+    def candidates(self, lookup):
+        """Find the uids of all contacts that might match the query with the
+        help of indexes.
+
+        :param lookup: a function that returns the uids of all contacts that
+            might match a single term or None if it can not tell
+        :type lookup: callable(Term)
+        :returns: the uids of a superset of the matching contacts or None if
+            all contacts have to be checked
+        :rtype: set(str) or NoneType
+        """
+        raise NotImplementedError
+
+    def may_match_source(self, text):
+        """Check the source of a vCard file before it is parsed.
+
+        The terms are searched in the raw source.  If it returns True the
+        contact might match and has to be parsed to be sure.  If it returns
+        False the terms are not in the source, but escaped characters and
+        folded lines are not undone, so a contact that matches can still be
+        rejected.  That is why the check is only used with the
+        search_in_source_files option.
+
+        :param text: the contents of the vCard file
+        :type text: str
+        :returns: False if the contact in the file can not match
+        :rtype: bool
+        """
+        return self._may_match_source(_Text(text))
+
+    def _may_match_source(self, text):
+        raise NotImplementedError
+
+    def terms(self):
+        """List the terms that a contact must or can contain to match, that
+        is all terms that are not negated.
+
+        :returns: the terms in the order of the query
+        :rtype: list(Term)
+        """
+        raise NotImplementedError
+
+    def regex(self):
+        """Build a regular expression from the terms of the query that are
+        not negated.
+
+        It is used to select the lines of the matching contacts that are
+        printed.  Like the search terms of earlier versions terms joined with
+        AND have to appear in the order of the query, for OR any of them.
+
+        :returns: the regular expression, ".*" if there are no such terms
+        :rtype: str
+        """
+        return self._line_regex() or ".*"
+
+    def _line_regex(self):
+        raise NotImplementedError
+
+
+class All(Query):
+    """The empty query that matches all contacts."""
+
+    def _matches(self, contact):
+        return True
+
+    def candidates(self, lookup):
+        return None
+
+    def _may_match_source(self, text):
+        return True
+
+    def terms(self):
+        return []
+
+    def _line_regex(self):
+        return None
+
+    def __str__(self):
+        return "*"
+
+
+class Term(Query):
+    """A search term, optionally restricted to one field."""
+
+    def __init__(self, text, field=None):
+        """
+        :param text: the text to search for
+        :type text: str
+        :param field: one of FIELDS or None to search all fields
+        :type field: str or NoneType
+        """
+        self.text = text
+        self.field = field
+        self._regex = re.compile(re.escape(text), re.IGNORECASE)
+        # Terms with enough digits also match phone numbers that are written
+        # with other separators.
+        self._digits = _digits(text) if len(_digits(text)) >= 3 else None
+
+    def _matches(self, contact):
+        if self.field is None:
+            details = contact.details
+            return self._regex.search(details.text) is not None or (
+                self._digits is not None and
+                self._regex.search(details.clean) is not None)
+        values = contact.get_field(self.field)
+        if self.field == "uid":
+            return any(value.startswith(self.text) for value in values)
+        if any(self._regex.search(value) for value in values):
+            return True
+        return self.field == "phone" and self._digits is not None and \
+            any(self._digits in _digits(value) for value in values)
+
+    def candidates(self, lookup):
+        return lookup(self)
+
+    def _may_match_source(self, text):
+        if self.field == "org":
+            # The units of organisations are separated by ";" in the source.
+            return all(re.search(re.escape(part), text.text, re.IGNORECASE)
+                       for part in self.text.split(", "))
+        if self._regex.search(text.text) is not None:
+            return True
+        if self._digits is None:
+            return False
+        if self.field == "phone":
+            return self._digits in _digits(text.text)
+        return self.field is None and \
+            self._regex.search(text.clean) is not None
+
+    def terms(self):
+        return [self]
+
+    def _line_regex(self):
+        return re.escape(self.text)
+
+    def __str__(self):
+        text = self.text
+        if not re.match(r'^[^\s"()][^\s()]*$', text) or \
+                text in ("AND", "OR", "NOT"):
+            text = '"{}"'.format(text)
+        return text if self.field is None else self.field + ":" + text
+
+
+class And(Query):
+    """Match contacts that match all subqueries."""
+
+    def __init__(self, queries):
+        self.queries = queries
+
+    def _matches(self, contact):
+        return all(query._matches(contact) for query in self.queries)
+
+    def candidates(self, lookup):
+        result = None
+        for query in self.queries:
+            uids = query.candidates(lookup)
+            if uids is not None:
+                result = uids if result is None else result & uids
+        return result
+
+    def _may_match_source(self, text):
+        return all(query._may_match_source(text) for query in self.queries)
+
+    def terms(self):
+        return [term for query in self.queries for term in query.terms()]
+
+    def _line_regex(self):
+        parts = []
+        for query in self.queries:
+            part = query._line_regex()
+            if part is not None:
+                parts.append("(?:{})".format(part)
+                             if isinstance(query, Or) else part)
+        return ".*".join(parts) or None
+
+    def __str__(self):
+        return "({})".format(" AND ".join(str(query)
+                                          for query in self.queries))
+
+
+class Or(Query):
+    """Match contacts that match any of the subqueries."""
+
+    def __init__(self, queries):
+        self.queries = queries
+
+    def _matches(self, contact):
+        return any(query._matches(contact) for query in self.queries)
+
+    def candidates(self, lookup):
+        result = set()
+        for query in self.queries:
+            uids = query.candidates(lookup)
+            if uids is None:
+                return None
+            result |= uids
+        return result
+
+    def _may_match_source(self, text):
+        return any(query._may_match_source(text) for query in self.queries)
+
+    def terms(self):
+        return [term for query in self.queries for term in query.terms()]
+
+    def _line_regex(self):
+        parts = [query._line_regex() for query in self.queries]
+        return "|".join(part for part in parts if part is not None) or None
+
+    def __str__(self):
+        return "({})".format(" OR ".join(str(query)
+                                         for query in self.queries))
+
+
+class Not(Query):
+    """Match contacts that do not match the subquery."""
+
+    def __init__(self, query):
+        self.query = query
+
+    def _matches(self, contact):
+        return not self.query._matches(contact)
+
+    def candidates(self, lookup):
+        return None
+
+    def _may_match_source(self, text):
+        # The source contains the term, but maybe in another field.
+        return True
+
+    def terms(self):
+        return []
+
+    def _line_regex(self):
+        return None
+
+    def __str__(self):
+        return "NOT {}".format(self.query)
+
+
+_operators = ("AND", "OR", "NOT")
+_field_prefix = re.compile(r"(\w+):(?=[^\s()])")
+# Quotes only start a phrase at the start of a token, inside a word they are
+# part of the word.
+_word = re.compile(r'\S+')
+
+
+def _tokenize(text):
+    """Split a query into tokens.
+
+    :param text: the query
+    :type text: str
+    :returns: the tokens, either one of "(", ")", "AND", "OR", "NOT" or a Term
+    :rtype: list(str or Term)
+    :raises: QueryError
+    """
+    tokens = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char.isspace():
+            index += 1
+            continue
+        if char in "()":
+            tokens.append(char)
+            index += 1
+            continue
+        field = None
+        match = _field_prefix.match(text, index)
+        if match and match.group(1).lower() in FIELDS:
+            field = match.group(1).lower()
+            index = match.end()
+        if text[index] == '"':
+            end = text.find('"', index + 1)
+            if end == -1:
+                raise QueryError("Missing closing quote in search query")
+            tokens.append(Term(text[index + 1:end], field))
+            index = end + 1
+            continue
+        word = _word.match(text, index).group()
+        index += len(word)
+        # closing parentheses are split from the end of a word
+        stripped = word.rstrip(")")
+        if stripped in _operators and field is None:
+            tokens.append(stripped)
+        elif stripped:
+            tokens.append(Term(stripped, field))
+        else:
+            raise QueryError("Missing search term after {}:".format(field))
+        tokens.extend(")" * (len(word) - len(stripped)))
+    return tokens
+
+
+class _Parser:
+    """A recursive descent parser for the token list of a query."""
+
+    def __init__(self, tokens, default_field):
+        self._tokens = tokens
+        self._index = 0
+        self._default_field = default_field
+
+    def _peek(self):
+        if self._index < len(self._tokens):
+            return self._tokens[self._index]
+        return None
+
+    def _next(self):
+        token = self._peek()
+        self._index += 1
+        return token
+
+    def parse(self):
+        if not self._tokens:
+            return All()
+        query = self._parse_or()
+        if self._peek() is not None:
+            raise QueryError("Unexpected ) in search query")
+        return query
+
+    def _parse_or(self):
+        queries = [self._parse_and()]
+        while self._peek() == "OR":
+            self._next()
+            queries.append(self._parse_and())
+        return queries[0] if len(queries) == 1 else Or(queries)
+
+    def _parse_and(self):
+        queries = [self._parse_not()]
+        while self._peek() not in (None, ")", "OR"):
+            if self._peek() == "AND":
+                self._next()
+            queries.append(self._parse_not())
+        return queries[0] if len(queries) == 1 else And(queries)
+
+    def _parse_not(self):
+        if self._peek() == "NOT":
+            self._next()
+            return Not(self._parse_not())
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        token = self._next()
+        if token == "(":
+            query = self._parse_or()
+            if self._next() != ")":
+                raise QueryError("Missing ) in search query")
+            return query
+        if isinstance(token, Term):
+            if token.field is None and self._default_field is not None:
+                token = Term(token.text, self._default_field)
+            return token
+        if token is None:
+            raise QueryError("Incomplete search query")
+        raise QueryError("Unexpected {} in search query".format(token))
+
+
+def parse(terms, default_field=None):
+    """Parse a search query from the command line.
+
+    :param terms: the search terms, they are joined with spaces
+    :type terms: list(str) or str
+    :param default_field: the field to search for terms without a field,
+        None to search all fields
+    :type default_field: str or NoneType
+    :returns: the parsed query
+    :rtype: Query
+    :raises: QueryError
+    """
+    if not isinstance(terms, str):
+        terms = " ".join(terms)
+    return _Parser(_tokenize(terms), default_field).parse()
+
+
+def plain_terms(query, fields=(None,)):
+    """Get the texts of the terms of a query that consists only of terms
+    joined with AND.
+
+    :param query: the parsed query
+    :type query: Query
+    :param fields: the fields the terms may be restricted to, None for terms
+        without a field
+    :type fields: iterable(str or NoneType)
+    :returns: the texts of the terms in the order of the query or None if the
+        query is not that simple
+    :rtype: list(str) or NoneType
+    """
+    queries = query.queries if isinstance(query, And) else [query]
+    if all(isinstance(term, Term) and term.field in fields
+           for term in queries):
+        return [term.text for term in queries]
+    return None
+
+
+def source_filter(query):
+    """Create a function to check the source of vCard files for a query.
+
+    :param query: a parsed query or a regular expression
+    :type query: Query or str
+    :returns: a function that returns False for files that can not match
+    :rtype: callable(str)
+    """
+    if isinstance(query, Query):
+        return query.may_match_source
+    regexp = re.compile(query, re.IGNORECASE | re.DOTALL)
+    return lambda text: regexp.search(text) is not None
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""A full text index for vdir address books based on sqlite's FTS5 module."""
+
+import hashlib
+import logging
+import os
+import re
+
+from .cache import get_cache_dir
+
+
+class SearchIndexError(Exception):
+    """Indicate that the search index can not be used."""
+
+
+def _errors():
+    """The exceptions that are raised if the index can not be read or written.
+
+    This is a function so that sqlite3 is only imported when an index is
+    actually used.
+
+    :returns: the exception classes
+    :rtype: tuple(type)
+    """
+    import sqlite3
+    return (OSError, sqlite3.Error)
+
+
+def literal_terms(query):
+    """Split a search query into the literal strings it consists of.
+
+    The search queries that khard builds from the command line are escaped
+    search terms joined by ".*".  This function reverses that process.  If the
+    query contains any other regular expression syntax None is returned.
+
+    :param query: the regular expression to analyse
+    :type query: str
+    :returns: the literal terms in the order of the query or None
+    :rtype: list(str) or NoneType
+    """
+    terms = []
+    current = []
+    index = 0
+    while index < len(query):
+        char = query[index]
+        if char == "\\":
+            if index + 1 == len(query) or query[index + 1].isalnum():
+                # a trailing backslash or a special sequence like \d
+                return None
+            current.append(query[index + 1])
+            index += 2
+        elif query.startswith(".*", index):
+            terms.append("".join(current))
+            current = []
+            index += 2
+        elif char in ".^$*+?{}[]|()":
+            return None
+        else:
+            current.append(char)
+            index += 1
+    terms.append("".join(current))
+    return [term for term in terms if term]
+
+
+class SearchIndex:
+    """A persistent FTS5 index of the searchable text of all contacts in one
+    address book.
+
+    The index is only used to find candidate contacts quickly.  The caller is
+    expected to verify the candidates against the actual query.
+    """
+
+    # Increase this whenever the database layout changes.
+    version = 1
+    # The trigram tokenizer can not match strings shorter than this.
+    _min_term_length = 3
+
+    def __init__(self, directory, settings, cache_dir=None):
+        """
+        :param directory: the path of the vdir that should be indexed
+        :type directory: str
+        :param settings: all settings that influence the indexed text, the
+            index is rebuild if they change
+        :type settings: str
+        :param cache_dir: the directory to store the database in, defaults
+            to $XDG_CACHE_HOME/khard
+        :type cache_dir: str
+        """
+        key = hashlib.sha1(os.path.abspath(directory).encode("utf-8"))
+        self.filename = os.path.join(cache_dir or get_cache_dir(),
+                                     key.hexdigest() + ".sqlite")
+        self._settings = "{}:{}".format(self.version, settings)
+        self._connection = None
+
+    @staticmethod
+    def available():
+        """Check if sqlite supports FTS5 with the trigram tokenizer.
+
+        :returns: weather an index can be used
+        :rtype: bool
+        """
+        try:
+            import sqlite3
+        except ImportError:
+            return False
+        try:
+            connection = sqlite3.connect(":memory:")
+            connection.execute("CREATE VIRTUAL TABLE test USING fts5(a, "
+                               "tokenize='trigram')")
+            connection.close()
+        except sqlite3.Error:
+            return False
+        return True
+
+    def _connect(self):
+        """Open the database and create or rebuild the tables if needed.
+
+        :returns: the connection to the database
+        :rtype: sqlite3.Connection
+        """
+        if self._connection is not None:
+            return self._connection
+        import sqlite3
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        connection = sqlite3.connect(self.filename, timeout=10)
+        connection.execute("CREATE TABLE IF NOT EXISTS meta "
+                           "(key TEXT PRIMARY KEY, value TEXT)")
+        row = connection.execute(
+            "SELECT value FROM meta WHERE key = 'settings'").fetchone()
+        if row is None or row[0] != self._settings:
+            logging.debug("Rebuilding search index %s", self.filename)
+            connection.execute("DROP TABLE IF EXISTS contacts")
+            connection.execute("INSERT OR REPLACE INTO meta VALUES "
+                               "('settings', ?)", (self._settings,))
+        connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS contacts USING fts5(filename "
+            "UNINDEXED, stat UNINDEXED, uid UNINDEXED, name, details, "
+            "clean_details, tokenize='trigram')")
+        connection.commit()
+        self._connection = connection
+        return connection
+
+    def update(self, contacts, stats, complete):
+        """Bring the index up to date with the loaded contacts.
+
+        :param contacts: the loaded contacts
+        :type contacts: iterable(carddav_object.CarddavObject)
+        :param stats: a key identifying the current version of each file,
+            mapped by file name
+        :type stats: dict(str: tuple)
+        :param complete: weather all files of the address book where loaded,
+            only then entries for missing files are removed
+        :type complete: bool
+        :returns: the number of updated entries
+        :rtype: int
+        """
+        try:
+            return self._update(contacts, stats, complete)
+        except _errors() as err:
+            raise SearchIndexError(err) from err
+
+    def _update(self, contacts, stats, complete):
+        connection = self._connect()
+        existing = {filename: (rowid, stat) for rowid, filename, stat in
+                    connection.execute(
+                        "SELECT rowid, filename, stat FROM contacts")}
+        updated = 0
+        seen = set()
+        for contact in contacts:
+            seen.add(contact.filename)
+            stat = repr(stats.get(contact.filename))
+            rowid, old_stat = existing.get(contact.filename, (None, None))
+            if old_stat == stat:
+                continue
+            if rowid is not None:
+                connection.execute("DELETE FROM contacts WHERE rowid = ?",
+                                   (rowid,))
+            self._insert(connection, contact, stat)
+            updated += 1
+        if complete:
+            for filename in set(existing) - seen:
+                connection.execute("DELETE FROM contacts WHERE rowid = ?",
+                                   (existing[filename][0],))
+                updated += 1
+        connection.commit()
+        return updated
+
+    def update_contact(self, contact, stat):
+        """Add or replace the entry of a single contact.
+
+        :param contact: the contact to index
+        :type contact: carddav_object.CarddavObject
+        :param stat: a key identifying the current version of the file
+        :type stat: tuple
+        :returns: None
+        """
+        try:
+            connection = self._connect()
+            connection.execute("DELETE FROM contacts WHERE filename = ?",
+                               (contact.filename,))
+            self._insert(connection, contact, repr(stat))
+            connection.commit()
+        except _errors() as err:
+            raise SearchIndexError(err) from err
+
+    def remove(self, filename):
+        """Remove the entry of a vcard file.
+
+        :param filename: the path of the vcard file
+        :type filename: str
+        :returns: None
+        """
+        try:
+            connection = self._connect()
+            connection.execute("DELETE FROM contacts WHERE filename = ?",
+                               (filename,))
+            connection.commit()
+        except _errors() as err:
+            raise SearchIndexError(err) from err
+
+    @staticmethod
+    def _insert(connection, contact, stat):
+        details = contact.print_vcard()
+        connection.execute(
+            "INSERT INTO contacts VALUES (?, ?, ?, ?, ?, ?)",
+            (contact.filename, stat, contact.uid, contact.formatted_name,
+             details, re.sub("[^a-zA-Z0-9\n]", "", details)))
+
+    def candidates(self, terms, columns):
+        """Find the uids of all contacts that contain all given terms in one
+        of the given columns.
+
+        Terms that can not be looked up in the index are ignored so the result
+        is a superset of the real matches.  If no term can be looked up None
+        is returned.
+
+        :param terms: the literal search terms
+        :type terms: list(str)
+        :param columns: the names of the columns to search, any of "name",
+            "details" and "clean_details"
+        :type columns: list(str)
+        :returns: the uids of the candidates or None
+        :rtype: set(str) or NoneType
+        """
+        # The case folding of sqlite and python only agree for ascii.
+        usable = [term for term in terms
+                  if len(term) >= self._min_term_length
+                  and all(ord(char) < 128 for char in term)]
+        if not usable:
+            return None
+        phrases = " AND ".join('"{}"'.format(term.replace('"', '""'))
+                               for term in usable)
+        uids = set()
+        try:
+            connection = self._connect()
+            for column in columns:
+                uids.update(uid for uid, in connection.execute(
+                    "SELECT uid FROM contacts WHERE contacts MATCH ?",
+                    ("{} : ({})".format(column, phrases),)))
+        except _errors() as err:
+            raise SearchIndexError(err) from err
+        return uids
+
+    def close(self):
+        """Close the database connection."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
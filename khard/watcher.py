@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Watch vdir address books for changed vCard files.
+
+On Linux the kernel reports changes with inotify.  The calls are made with
+ctypes so that no additional dependency is needed.  On other systems or if
+inotify is not available the directories are polled.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+
+
+logger = logging.getLogger(__name__)
+
+
+def _is_vcard(name):
+    """Check if a file name is the name of a vCard file in a vdir.
+
+    :param name: the file name
+    :type name: str
+    :returns: True if the file should be loaded by a vdir address book
+    :rtype: bool
+    """
+    return name.endswith(".vcf") and not name.startswith(".")
+
+
+class PollingWatcher:
+    """Find changed vCard files by comparing the stat results of all files
+    with the ones from the last call.
+    """
+
+    # changes() must be called to find changes
+    event_driven = False
+
+    def __init__(self, paths):
+        """
+        :param paths: the directories to watch
+        :type paths: list(str)
+        """
+        self._snapshots = {path: self._snapshot(path) for path in paths}
+
+    @staticmethod
+    def _snapshot(path):
+        """Collect the stat results of all vCard files in a directory.
+
+        :param path: the directory
+        :type path: str
+        :returns: the stat results by file path or None if the directory can
+            not be read
+        :rtype: dict(str, tuple) or NoneType
+        """
+        snapshot = {}
+        try:
+            for entry in os.scandir(path):
+                if _is_vcard(entry.name):
+                    stat = entry.stat()
+                    snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size,
+                                            stat.st_ino)
+        except OSError:
+            return None
+        return snapshot
+
+    def changes(self):
+        """Find the files that changed since the last call.
+
+        :returns: the paths of the changed files for every directory with
+            changes, None instead of a set if the directory as a whole
+            changed
+        :rtype: dict(str, set(str) or NoneType)
+        """
+        changes = {}
+        for path, old in self._snapshots.items():
+            new = self._snapshot(path)
+            if old is None or new is None:
+                if old is not None or new is not None:
+                    changes[path] = None
+            else:
+                changed = {name for name in old.keys() | new.keys()
+                           if old.get(name) != new.get(name)}
+                if changed:
+                    changes[path] = changed
+            self._snapshots[path] = new
+        return changes
+
+    def close(self):
+        """Stop watching."""
+        self._snapshots = {}
+
+
+class InotifyWatcher:
+    """Collect the changed vCard files from inotify events."""
+
+    # changes() only returns something after the kernel reported events
+    event_driven = True
+
+    # flags from <sys/inotify.h>
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _mask = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE |
+             IN_DELETE_SELF | IN_MOVE_SELF)
+    _event = struct.Struct("iIII")
+
+    def __init__(self, paths):
+        """
+        :param paths: the directories to watch
+        :type paths: list(str)
+        :raises: OSError if inotify is not available
+        """
+        name = ctypes.util.find_library("c")
+        if name is None:
+            raise OSError(errno.ENOSYS, "libc not found")
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise self._error()
+        self._paths = {}
+        self._unwatched = set()
+        try:
+            for path in paths:
+                self._watch(path)
+        except OSError:
+            self.close()
+            raise
+
+    def _error(self):
+        number = ctypes.get_errno()
+        return OSError(number, os.strerror(number))
+
+    def _watch(self, path):
+        """Add a watch for a directory.
+
+        Directories that can not be watched are remembered and tried again
+        on the next call to changes().
+
+        :param path: the directory
+        :type path: str
+        :returns: None
+        """
+        descriptor = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(path), self._mask)
+        if descriptor < 0:
+            error = self._error()
+            if error.errno not in (errno.ENOENT, errno.ENOTDIR):
+                raise error
+            self._unwatched.add(path)
+        else:
+            self._paths[descriptor] = path
+            self._unwatched.discard(path)
+
+    def _read(self):
+        """Read all pending events.
+
+        :returns: the raw events
+        :rtype: bytes
+        """
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def changes(self):
+        """Find the files that changed since the last call.
+
+        :returns: the paths of the changed files for every directory with
+            changes, None instead of a set if the directory as a whole
+            changed or events were lost
+        :rtype: dict(str, set(str) or NoneType)
+        """
+        changes = {}
+        for path in list(self._unwatched):
+            self._watch(path)
+            if path not in self._unwatched:
+                changes[path] = None
+        data = self._read()
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = self._event.unpack_from(data,
+                                                                  offset)
+            offset += self._event.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                logger.debug("The inotify queue overflowed")
+                changes = {path: None for path in self._paths.values()}
+                continue
+            path = self._paths.get(descriptor)
+            if path is None:
+                continue
+            if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF |
+                       self.IN_IGNORED):
+                # The directory is gone, watch for a new one at the same path.
+                changes[path] = None
+                del self._paths[descriptor]
+                self._libc.inotify_rm_watch(self._fd, descriptor)
+                self._unwatched.add(path)
+                continue
+            name = os.fsdecode(name)
+            if not _is_vcard(name):
+                continue
+            files = changes.setdefault(path, set())
+            if files is not None:
+                files.add(os.path.join(path, name))
+        return changes
+
+    def close(self):
+        """Stop watching."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(paths):
+    """Create an inotify watcher or a polling watcher if inotify is not
+    available.
+
+    :param paths: the directories to watch
+    :type paths: list(str)
+    :returns: the watcher
+    :rtype: InotifyWatcher or PollingWatcher
+    """
+    try:
+        return InotifyWatcher(paths)
+    except (OSError, AttributeError) as err:
+        logger.debug("Polling for changes, inotify is not available: %s", err)
+        return PollingWatcher(paths)
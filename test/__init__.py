@@ -8,3 +8,11 @@ and
         python setup.py test
 
 """
+
+import os
+import tempfile
+
+# The tests must not write to the cache of the user.  Tests that look at the
+# cache point XDG_CACHE_HOME to their own directory.
+_cache_dir = tempfile.TemporaryDirectory(prefix="khard-test-cache-")
+os.environ["XDG_CACHE_HOME"] = _cache_dir.name
@@ -1,7 +1,11 @@
 """Helper functions for the tests."""
 
+import os
+import shutil
 import sys
+import tempfile
 import unittest
+from unittest import mock
 
 
 def expectedFailureForVersion(major, minor):
@@ -10,3 +14,23 @@ def expectedFailureForVersion(major, minor):
         return unittest.expectedFailure
     else:
         return lambda x: x
+
+
+class TmpVdir:
+    """A mixin for test cases that need a copy of the foo.abook fixture.
+
+    The copy is at self.vdir in the temporary directory self.tmp_dir and
+    XDG_CACHE_HOME points to the empty directory self.cache_dir in it.
+    """
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp_dir = tmp.name
+        self.vdir = os.path.join(self.tmp_dir, 'abook')
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        shutil.copytree('test/fixture/foo.abook', self.vdir)
+        patch = mock.patch.dict('os.environ', XDG_CACHE_HOME=self.cache_dir)
+        patch.start()
+        self.addCleanup(patch.stop)
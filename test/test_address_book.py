@@ -1,12 +1,15 @@
 """Tests for the address book classes."""
 
+import os
+import shutil
 import sys
+import tempfile
 import unittest
 from unittest import mock
 
 from khard import address_book
 
-from .helpers import expectedFailureForVersion
+from .helpers import TmpVdir, expectedFailureForVersion
 
 
 class _AddressBook(address_book.AddressBook):
@@ -91,6 +94,17 @@ class VcardAdressBookLoad(unittest.TestCase):
         abook.load()
         self.assertEqual(len(abook.contacts), 3)
 
+    def test_loading_without_scandir(self):
+        scandir = os.scandir
+        del os.scandir
+        try:
+            abook = address_book.VdirAddressBook('test',
+                                                 'test/fixture/foo.abook')
+            abook.load()
+        finally:
+            os.scandir = scandir
+        self.assertEqual(len(abook.contacts), 3)
+
     def test_search_in_source_files_only_loads_matching_cards(self):
         abook = address_book.VdirAddressBook('test', 'test/fixture/foo.abook')
         abook.load(query='second', search_in_source_files=True)
@@ -112,6 +126,182 @@ class VcardAdressBookLoad(unittest.TestCase):
                                      'address book test could not be parsed.'])
 
 
+class VcardAdressBookReadAhead(unittest.TestCase):
+
+    def test_same_contacts_as_without_read_ahead(self):
+        abook = address_book.VdirAddressBook('test', 'test/fixture/foo.abook',
+                                             io_threads=2)
+        abook.load()
+        serial = address_book.VdirAddressBook('test', 'test/fixture/foo.abook')
+        serial.load()
+        self.assertEqual(sorted(abook.contacts), sorted(serial.contacts))
+        for uid, contact in abook.contacts.items():
+            self.assertEqual(contact, serial.contacts[uid])
+
+    def test_search_in_source_files_reads_each_file_once(self):
+        abook = address_book.VdirAddressBook('test', 'test/fixture/foo.abook',
+                                             io_threads=2)
+        with mock.patch('khard.address_book._read_vcard_file',
+                        wraps=address_book._read_vcard_file) as read:
+            abook.load(query='second', search_in_source_files=True)
+        self.assertEqual(len(abook.contacts), 1)
+        self.assertEqual(read.call_count, 3)
+
+    def test_files_are_read_as_bytes_and_decoded_with_universal_newlines(self):
+        data = address_book._read_vcard_file(
+            'test/fixture/foo.abook/contact1.vcf')
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(
+            address_book._decode_vcard_file(b'A\r\nB\rC\xc3\xa4\n', 'utf-8'),
+            'A\nB\nC\xe4\n')
+
+    def test_hidden_files_are_ignored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copy('test/fixture/foo.abook/contact1.vcf',
+                        os.path.join(tmp, '.hidden.vcf'))
+            abook = address_book.VdirAddressBook('test', tmp)
+            abook.load()
+        self.assertEqual(len(abook.contacts), 0)
+
+
+@mock.patch('khard.address_book.VdirAddressBook._parallel_threshold', 1)
+class VcardAdressBookParallelLoad(unittest.TestCase):
+
+    def _load(self, path, workers, **kwargs):
+        abook = address_book.VdirAddressBook('test', path, workers=workers,
+                                             **kwargs)
+        with self.assertLogs(level='WARNING') as cm:
+            abook.load()
+        return abook, cm.output
+
+    def test_same_contacts_as_serial_loading(self):
+        abook = address_book.VdirAddressBook('test', 'test/fixture/foo.abook',
+                                             workers=2)
+        abook.load()
+        serial = address_book.VdirAddressBook('test', 'test/fixture/foo.abook')
+        serial.load()
+        self.assertEqual(sorted(abook.contacts), sorted(serial.contacts))
+        for uid, contact in abook.contacts.items():
+            self.assertIs(contact.address_book, abook)
+            self.assertEqual(contact, serial.contacts[uid])
+
+    def test_same_warnings_as_serial_loading(self):
+        for path in ['test/fixture/minimal.abook', 'test/fixture/broken.abook']:
+            with self.subTest(path=path):
+                _, expected = self._load(path, 1, skip=True)
+                _, actual = self._load(path, 2, skip=True)
+                self.assertEqual(actual, expected)
+
+    def test_same_duplicate_uid_warnings_as_serial_loading(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ['a', 'b', 'c']:
+                shutil.copy('test/fixture/foo.abook/contact1.vcf',
+                            os.path.join(tmp, name + '.vcf'))
+            serial, expected = self._load(tmp, 1)
+            abook, actual = self._load(tmp, 2)
+        self.assertEqual(len(expected), 2)
+        self.assertEqual(actual, expected)
+        self.assertEqual(abook.contacts['testuid1'].filename,
+                         serial.contacts['testuid1'].filename)
+
+    def test_loading_unparsable_vcard_fails(self):
+        abook = address_book.VdirAddressBook(
+            'test', 'test/fixture/broken.abook', workers=2)
+        with self.assertRaises(SystemExit):
+            with self.assertLogs(level='ERROR'):
+                abook.load()
+
+
+class VcardAdressBookIncrementalUpdate(TmpVdir, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.abook = address_book.VdirAddressBook('test', self.vdir)
+        self.abook.load()
+        # build the indexes that have to be kept up to date
+        self.abook.get_short_uid_dict()
+        self.abook.get_phone_number_index()
+        self.abook.get_email_address_index()
+
+    def _write(self, name, uid, email):
+        filename = os.path.join(self.vdir, name)
+        with open(filename, 'w') as fh:
+            fh.write('BEGIN:VCARD\nVERSION:3.0\nFN:{0}\nN:;;;;\n'
+                     'EMAIL:{1}\nUID:{0}\nEND:VCARD\n'.format(uid, email))
+        return filename
+
+    def _assert_same_as_full_load(self):
+        fresh = address_book.VdirAddressBook('test', self.vdir)
+        fresh.load()
+        self.assertEqual(sorted(self.abook.contacts),
+                         sorted(fresh.contacts))
+        self.assertEqual(
+            {short: contact.uid for short, contact
+             in self.abook.get_short_uid_dict().items()},
+            {short: contact.uid for short, contact
+             in fresh.get_short_uid_dict().items()})
+
+    def test_new_files_are_added(self):
+        filename = self._write('new.vcf', 'testuid4', 'new@example.com')
+        self.abook.update_files([filename])
+        self._assert_same_as_full_load()
+        self.assertIn('new@example.com', self.abook.get_email_address_index())
+
+    def test_changed_files_are_replaced(self):
+        filename = os.path.join(self.vdir, 'contact1.vcf')
+        self._write('contact1.vcf', 'other', 'changed@example.com')
+        self.abook.update_files([filename])
+        self._assert_same_as_full_load()
+        index = self.abook.get_email_address_index()
+        self.assertNotIn('user@example.com', index)
+        self.assertIn('changed@example.com', index)
+        self.assertEqual(self.abook.get_phone_number_index().lookup(
+            '0123456789'), [])
+
+    def test_removed_files_are_removed(self):
+        filename = os.path.join(self.vdir, 'contact1.vcf')
+        os.remove(filename)
+        self.abook.update_files([filename])
+        self._assert_same_as_full_load()
+        self.assertNotIn('user@example.com',
+                         self.abook.get_email_address_index())
+
+    def test_unparsable_files_are_skipped(self):
+        filename = os.path.join(self.vdir, 'contact1.vcf')
+        shutil.copy('test/fixture/broken.abook/unparsable.vcf', filename)
+        with self.assertLogs(level='WARNING'):
+            self.abook.update_files([filename])
+        self.assertNotIn('testuid1', self.abook.contacts)
+        self.assertEqual(len(self.abook.get_short_uid_dict()), 2)
+
+    def test_files_are_ignored_before_loading(self):
+        abook = address_book.VdirAddressBook('test', self.vdir)
+        abook.update_files([os.path.join(self.vdir, 'contact1.vcf')])
+        self.assertEqual(abook.contacts, {})
+
+
+class AddressBookIdenticalContacts(unittest.TestCase):
+
+    def test_copies_in_different_address_books_are_grouped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copytree('test/fixture/foo.abook', os.path.join(tmp, 'a'))
+            shutil.copytree('test/fixture/foo.abook', os.path.join(tmp, 'b'))
+            abooks = [address_book.VdirAddressBook(name,
+                                                   os.path.join(tmp, name))
+                      for name in ['a', 'b']]
+            collection = address_book.AddressBookCollection('all', abooks)
+            with self.assertLogs(level='WARNING'):
+                groups = collection.get_identical_contacts()
+        self.assertEqual(len(groups), 3)
+        for group in groups:
+            self.assertEqual([c.address_book.name for c in group], ['a', 'b'])
+            self.assertEqual(group[0], group[1])
+
+    def test_different_contacts_are_not_grouped(self):
+        abook = address_book.VdirAddressBook('test', 'test/fixture/foo.abook')
+        self.assertEqual(abook.get_identical_contacts(), [])
+
+
 class AddressBookGetShortUidDict(unittest.TestCase):
 
     def test_uniqe_uid_also_reslts_in_shortend_uid_in_short_uid_dict(self):
@@ -124,6 +314,21 @@ class AddressBookGetShortUidDict(unittest.TestCase):
         short_uid, contact = short_uids.popitem()
         self.assertEqual(short_uid, 'u')
 
+    def test_short_uids_can_be_updated_incrementally(self):
+        uids = ['abc', 'abd', 'b', 'bcd', 'xyz']
+        abook = _AddressBook('test')
+        abook._loaded = True
+        for uid in uids:
+            abook._add_contact(mock.Mock(uid=uid))
+        self.assertEqual(sorted(abook.get_short_uid_dict()),
+                         ['abc', 'abd', 'b', 'bc', 'x'])
+        abook._remove_contact(abook.contacts['abd'])
+        self.assertEqual(sorted(abook.get_short_uid_dict()),
+                         ['a', 'b', 'bc', 'x'])
+        abook._add_contact(mock.Mock(uid='bce'))
+        self.assertEqual(sorted(abook.get_short_uid_dict()),
+                         ['a', 'b', 'bcd', 'bce', 'x'])
+
 
 class ReportedBugs(unittest.TestCase):
 
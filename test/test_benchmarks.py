@@ -0,0 +1,100 @@
+"""Tests for the corpus generator and the benchmark harness."""
+
+import os
+import tempfile
+import unittest
+
+from benchmarks import cli
+from benchmarks import corpus
+from benchmarks import run
+from khard import address_book
+
+
+class Corpus(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _files(self):
+        contents = {}
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith('.vcf'):
+                with open(os.path.join(self.path, name), 'rb') as fh:
+                    contents[name] = fh.read()
+        return contents
+
+    def test_generation_is_deterministic(self):
+        corpus.generate(self.path, 20, seed=3)
+        first = self._files()
+        corpus.generate(self.path, 20, seed=4)
+        self.assertNotEqual(self._files(), first)
+        corpus.generate(self.path, 20, seed=3)
+        self.assertEqual(self._files(), first)
+
+    def test_only_broken_cards_fail_to_parse(self):
+        corpus.generate(self.path, 100, broken_ratio=0.1, label_ratio=0.5,
+                        non_ascii_ratio=0.5)
+        with self.assertLogs(level='WARNING') as logs:
+            abook = address_book.VdirAddressBook('test', self.path, skip=True)
+            abook.load()
+        self.assertEqual(len(self._files()), 100)
+        broken = 100 - len(abook.contacts)
+        self.assertGreater(broken, 0)
+        self.assertIn('{} of 100 vCard files'.format(broken),
+                      logs.output[-1])
+
+    def test_cards_have_versions_labels_and_non_ascii_names(self):
+        corpus.generate(self.path, 50, v4_ratio=0.5, label_ratio=0.5,
+                        non_ascii_ratio=0.5, broken_ratio=0)
+        text = b''.join(self._files().values()).decode('utf-8')
+        self.assertIn('VERSION:3.0', text)
+        self.assertIn('VERSION:4.0', text)
+        self.assertIn('.X-ABLABEL:', text)
+        self.assertTrue(any(ord(char) > 127 for char in text))
+
+
+class Compare(unittest.TestCase):
+
+    def test_first_run_times_are_compared(self):
+        old = {'results': {'10': {'load': {'first': 0.2},
+                                  'list': {'first': 0.1}}}}
+        new = {'results': {'10': {'load': {'first': 0.1},
+                                  'list': {'error': 'ValueError: x'}},
+                           '20': {'load': {'first': 0.3}}}}
+        self.assertEqual(run.compare(old, new), [
+            ['Benchmark', 'Size', 'Before', 'After', 'Change'],
+            ['load', '10', '200.00 ms', '100.00 ms', '-50.0 %']])
+
+
+class Latency(unittest.TestCase):
+
+    def test_khard_runs_in_a_new_process(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'corpus')
+            corpus.generate(path, 5, broken_ratio=0)
+            config_file = os.path.join(tmp, 'khard.conf')
+            corpus.write_config(config_file, {'corpus': path})
+            summary = cli.Runner(tmp, config_file).cold(['list'], 1)
+        self.assertEqual(summary['status'], 0)
+        self.assertEqual(summary['runs'], 1)
+        self.assertGreater(summary['wall'], summary['import'])
+        self.assertGreater(summary['rss'], 0)
+
+    def test_growth_above_the_threshold_is_a_regression(self):
+        baseline = {'results': {'10': {'list': {'warm': {
+            'wall': 0.1, 'import': 0.02, 'rss': 100}}}}}
+        results = {'results': {'10': {'list': {'warm': {
+            'wall': 0.105, 'import': 0.02, 'rss': 120}}}}}
+        rows, regression = cli.find_regressions(baseline, results, 10)
+        self.assertTrue(regression)
+        self.assertEqual([row[3] for row in rows[1:] if row[-1]], ['rss'])
+        _, regression = cli.find_regressions(baseline, results, 25)
+        self.assertFalse(regression)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""Tests for the on disk contact cache."""
+
+import os
+import pickle
+import shutil
+import unittest
+from unittest import mock
+
+from khard import address_book
+from khard import cache
+
+from .helpers import TmpVdir
+
+
+class _TmpVdir(TmpVdir, unittest.TestCase):
+    """Base class for tests of the cache of a copied vdir."""
+
+    def _abook(self):
+        return address_book.VdirAddressBook('test', self.vdir, use_cache=True)
+
+
+class ContactCacheEntries(_TmpVdir):
+
+    def test_cache_file_is_written_in_xdg_cache_home(self):
+        abook = self._abook()
+        abook.load()
+        self.assertTrue(abook.cache.filename.startswith(self.cache_dir))
+        self.assertTrue(os.path.exists(abook.cache.filename))
+
+    def test_unchanged_files_are_not_parsed_again(self):
+        self._abook().load()
+        abook = self._abook()
+        with mock.patch('vobject.readOne') as read:
+            abook.load()
+        read.assert_not_called()
+        self.assertEqual(len(abook.contacts), 3)
+        self.assertEqual(abook.contacts['testuid1'].formatted_name,
+                         'second contact')
+
+    def test_cached_vcards_are_loaded_when_needed(self):
+        self._abook().load()
+        abook = self._abook()
+        with mock.patch('pickle.loads', wraps=pickle.loads) as loads:
+            abook.load()
+            contact = abook.contacts['testuid1']
+            self.assertEqual(contact.formatted_name, 'second contact')
+            loads.assert_not_called()
+            self.assertEqual(contact.emails,
+                             {'home': ['user@example.com']})
+        loads.assert_called_once()
+
+    def test_fingerprints_are_cached(self):
+        self._abook().load()
+        abook = self._abook()
+        with mock.patch('pickle.loads') as loads:
+            abook.load()
+            fingerprint = abook.contacts['testuid1'].fingerprint()
+        loads.assert_not_called()
+        serial = address_book.VdirAddressBook('test', self.vdir)
+        serial.load()
+        self.assertEqual(fingerprint,
+                         serial.contacts['testuid1'].fingerprint())
+
+    def test_sort_keys_are_cached(self):
+        self._abook().load()
+        abook = self._abook()
+        with mock.patch('unidecode.unidecode') as unidecode:
+            abook.load()
+            keys = sorted(contact.get_sort_key('last_name')
+                          for contact in abook.contacts.values())
+        unidecode.assert_not_called()
+        self.assertEqual(keys, ['second contact', 'text birthday',
+                                'third contact'])
+
+    def test_fingerprints_for_other_settings_are_not_used(self):
+        self._abook().load()
+        abook = address_book.VdirAddressBook('test', self.vdir, use_cache=True,
+                                             private_objects=['Jabber'])
+        abook.load()
+        contact = abook.contacts['testuid1']
+        self.assertNotIn(('fingerprint',), contact._memo)
+
+    def test_changed_files_are_parsed_again(self):
+        self._abook().load()
+        filename = os.path.join(self.vdir, 'contact2.vcf')
+        with open(filename, 'w') as fh:
+            fh.write('BEGIN:VCARD\nVERSION:4.0\nFN:changed contact\n'
+                     'UID:testuid2\nEND:VCARD\n')
+        abook = self._abook()
+        abook.load()
+        self.assertEqual(abook.contacts['testuid2'].formatted_name,
+                         'changed contact')
+
+    def test_removed_files_are_removed_from_the_cache(self):
+        self._abook().load()
+        os.remove(os.path.join(self.vdir, 'contact2.vcf'))
+        abook = self._abook()
+        abook.load()
+        self.assertNotIn('testuid2', abook.contacts)
+        fresh = cache.ContactCache(self.vdir)
+        fresh._read()
+        self.assertEqual(len(fresh._entries), 2)
+
+    def test_unreadable_cache_file_is_ignored(self):
+        abook = self._abook()
+        os.makedirs(os.path.dirname(abook.cache.filename))
+        with open(abook.cache.filename, 'wb') as fh:
+            fh.write(b'garbage')
+        abook.load()
+        self.assertEqual(len(abook.contacts), 3)
+
+
+class ContactCacheFileList(_TmpVdir):
+
+    def test_file_list_is_reused_for_old_directories(self):
+        os.utime(self.vdir, (0, 0))
+        self._abook().load()
+        abook = self._abook()
+        with mock.patch('os.scandir') as scandir:
+            abook.load()
+        scandir.assert_not_called()
+        self.assertEqual(len(abook.contacts), 3)
+
+    def test_file_list_is_not_reused_for_changed_directories(self):
+        os.utime(self.vdir, (0, 0))
+        self._abook().load()
+        shutil.copy('test/fixture/minimal.abook/minimal.vcf', self.vdir)
+        abook = self._abook()
+        with self.assertLogs(level='WARNING'):
+            abook.load()
+        self.assertEqual(len(abook.cache._files), 4)
+
+    def test_recently_changed_directories_are_scanned(self):
+        os.utime(self.vdir)
+        self._abook().load()
+        self.assertIsNone(cache.ContactCache(self.vdir).list_files())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -474,3 +474,169 @@ class CarddavObjectFormatDateObject(unittest.TestCase):
         d = datetime.datetime(1900, 2, 13)
         actual = carddav_object.CarddavObject._format_date_object(d, False)
         self.assertEqual(actual, '--02-13')
+
+
+class CarddavObjectLazyParsing(unittest.TestCase):
+
+    _contents = ('BEGIN:VCARD\r\nVERSION:3.0\r\nFN:Doe\\, John\r\n'
+                 'N:Doe;John;;Dr.,Prof.;\r\nUID:some\r\n -uid\r\n'
+                 'EMAIL;TYPE=home:john@example.com\r\nEND:VCARD\r\n')
+
+    def _lazy_contact(self):
+        header = carddav_object.CarddavObject._scan_header(self._contents)
+        loader = mock.Mock(return_value=vobject.readOne(self._contents))
+        contact = carddav_object.CarddavObject.from_header(
+            None, 'test.vcf', header, loader, [], False)
+        return contact, loader
+
+    def test_scan_header_decodes_like_vobject(self):
+        vcard = vobject.readOne(self._contents)
+        header = carddav_object.CarddavObject._scan_header(self._contents)
+        self.assertEqual(header, {'version': '3.0', 'fn': vcard.fn.value,
+                                  'uid': vcard.uid.value,
+                                  'n': vcard.n.value})
+
+    def test_scan_header_gives_up_on_parameters(self):
+        contents = self._contents.replace('FN:', 'FN;CHARSET=UTF-8:')
+        self.assertIsNone(
+            carddav_object.CarddavObject._scan_header(contents))
+
+    def test_scan_header_gives_up_on_broken_files(self):
+        contents = self._contents.replace('END:VCARD\r\n', '')
+        self.assertIsNone(
+            carddav_object.CarddavObject._scan_header(contents))
+
+    def test_header_fields_do_not_load_the_vcard(self):
+        contact, loader = self._lazy_contact()
+        self.assertEqual(contact.uid, 'some-uid')
+        self.assertEqual(contact.formatted_name, 'Doe, John')
+        self.assertEqual(contact.get_last_name_first_name(), 'Doe, John')
+        self.assertEqual(contact._get_name_prefixes(), ['Dr.', 'Prof.'])
+        loader.assert_not_called()
+
+    def test_other_fields_load_the_vcard_once(self):
+        contact, loader = self._lazy_contact()
+        self.assertEqual(contact.emails, {'home': ['john@example.com']})
+        self.assertEqual(contact.uid, 'some-uid')
+        loader.assert_called_once_with()
+
+    def test_changes_are_applied_to_the_loaded_vcard(self):
+        contact, loader = self._lazy_contact()
+        contact.formatted_name = 'John Doe'
+        self.assertEqual(contact.formatted_name, 'John Doe')
+        self.assertEqual(contact.vcard.fn.value, 'John Doe')
+
+
+class Memoization(unittest.TestCase):
+
+    def test_derived_properties_are_only_computed_once(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        wrapper.add_email('home', 'a@example.com')
+        with mock.patch.object(wrapper, '_get_children',
+                               wraps=wrapper._get_children) as children:
+            first = wrapper.emails
+            second = wrapper.emails
+        self.assertEqual(first, second)
+        children.assert_called_once_with('EMAIL')
+
+    def test_changing_a_result_does_not_change_later_results(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        wrapper._add_phone_number('cell', '0123')
+        wrapper.phone_numbers['cell'].append('4567')
+        wrapper.phone_numbers.clear()
+        self.assertEqual(wrapper.phone_numbers, {'cell': ['0123']})
+
+    def test_adding_fields_invalidates_cached_values(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        self.assertEqual(wrapper.phone_numbers, {})
+        wrapper._add_phone_number('home', '0123')
+        self.assertEqual(wrapper.phone_numbers, {'home': ['0123']})
+
+    def test_deleting_fields_invalidates_cached_values(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        wrapper._add_nickname('foo')
+        self.assertEqual(wrapper.nicknames, ['foo'])
+        wrapper._delete_vcard_object('NICKNAME')
+        self.assertEqual(wrapper.nicknames, [])
+
+    def test_setters_invalidate_cached_values(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        self.assertIsNone(wrapper.birthday)
+        wrapper.birthday = datetime.datetime(2018, 2, 13)
+        self.assertEqual(wrapper.birthday, datetime.datetime(2018, 2, 13))
+
+
+class PropertyGroupIndex(unittest.TestCase):
+
+    def test_labels_of_parsed_groups_are_found(self):
+        vcard = _create_test_vcard()
+        tel = vcard.add('TEL')
+        tel.value = '0123'
+        tel.group = 'item1'
+        label = vcard.add('X-ABLABEL')
+        label.value = 'custom'
+        label.group = 'item1'
+        wrapper = carddav_object.VCardWrapper(vcard)
+        self.assertEqual(wrapper.phone_numbers, {'custom': ['0123']})
+
+    def test_index_is_updated_on_add_and_delete(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        wrapper._add_phone_number('one', '0123')
+        self.assertEqual(wrapper._get_new_group('tel'), 'itemtel2')
+        wrapper._add_phone_number('two', '0456')
+        self.assertEqual(wrapper.phone_numbers, {'one': ['0123'],
+                                                 'two': ['0456']})
+        wrapper._delete_vcard_object('TEL')
+        self.assertEqual(wrapper._get_group('itemtel1'), [])
+        self.assertEqual(wrapper._get_new_group('tel'), 'itemtel1')
+        self.assertNotIn('x-ablabel', wrapper.vcard.contents)
+
+    def test_labelled_objects_use_new_groups(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        wrapper._add_webpage({'blog': 'http://example.com'})
+        wrapper._add_webpage({'shop': 'http://example.org'})
+        self.assertEqual(wrapper.webpages, ['blog: http://example.com',
+                                            'shop: http://example.org'])
+
+
+class CarddavObjectFingerprint(unittest.TestCase):
+
+    def _contact(self):
+        return carddav_object.CarddavObject.from_vcard(
+            None, 'test.vcf', _create_test_vcard(), [], False)
+
+    def test_contacts_with_the_same_content_have_the_same_fingerprint(self):
+        first = self._contact()
+        second = self._contact()
+        second.uid = 'other uid'
+        self.assertEqual(first.fingerprint(), second.fingerprint())
+        self.assertEqual(first, second)
+
+    def test_changes_invalidate_the_fingerprint(self):
+        contact = self._contact()
+        before = contact.fingerprint()
+        contact._add_nickname('foo')
+        self.assertNotEqual(contact.fingerprint(), before)
+        self.assertNotEqual(contact, self._contact())
+
+
+class CarddavObjectSortKey(unittest.TestCase):
+
+    def test_sort_keys_are_transliterated_and_lower_case(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        wrapper._add_name('', 'Ærøskøbing', '', 'Ñandú', '')
+        self.assertEqual(wrapper.get_sort_key('first_name'),
+                         'aeroskobing nandu')
+        self.assertEqual(wrapper.get_sort_key('last_name'),
+                         'nandu, aeroskobing')
+
+    def test_changing_the_name_changes_the_sort_key(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        self.assertEqual(wrapper.get_sort_key('first_name'), 'test vcard')
+        wrapper.formatted_name = 'Other'
+        self.assertEqual(wrapper.get_sort_key('first_name'), 'other')
+
+    def test_invalid_sort_orders_raise_value_error(self):
+        wrapper = carddav_object.VCardWrapper(_create_test_vcard())
+        with self.assertRaises(ValueError):
+            wrapper.get_sort_key('middle_name')
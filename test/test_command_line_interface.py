@@ -9,7 +9,9 @@ be converted to proper "unit" tests.
 # their current form.
 
 import io
+import os
 import pathlib
+import pstats
 import shutil
 import tempfile
 import unittest
@@ -19,7 +21,7 @@ from ruamel.yaml import YAML
 
 from khard import khard
 
-from .helpers import expectedFailureForVersion
+from .helpers import TmpVdir, expectedFailureForVersion
 
 
 def mock_stdout():
@@ -99,6 +101,21 @@ class ListingCommands(unittest.TestCase):
                   "second contact    voice    0123456789"]
         self.assertListEqual(text, expect)
 
+    def test_phone_number_lookup_with_international_number(self):
+        with mock_stdout() as stdout:
+            khard.main(['phone', '--parsable', '+49 123456789'])
+        text = stdout.getvalue().splitlines()
+        expect = ["0123456789\tsecond contact\tvoice"]
+        self.assertListEqual(text, expect)
+
+    def test_email_lookup_with_exact_address(self):
+        with mock_stdout() as stdout:
+            khard.main(['email', '--parsable', 'USER@example.com'])
+        text = stdout.getvalue().splitlines()
+        expect = ["searching for 'USER@example\\.com' ...",
+                  "user@example.com\tsecond contact\thome"]
+        self.assertListEqual(text, expect)
+
     def test_simple_file_without_options(self):
         with mock_stdout() as stdout:
             khard.main(['filename'])
@@ -115,6 +132,36 @@ class ListingCommands(unittest.TestCase):
         expect = "foo"
         self.assertEqual(text, expect)
 
+    def test_parsable_ls(self):
+        with mock_stdout() as stdout:
+            khard.main(['list', '--parsable'])
+        text = stdout.getvalue().splitlines()
+        expect = ["testuid1\tsecond contact\tfoo",
+                  "testuid3\ttext birthday\tfoo",
+                  "testuid2\tthird contact\tfoo"]
+        self.assertListEqual(text, expect)
+
+    def test_ls_with_field_query(self):
+        with mock_stdout() as stdout:
+            khard.main(['list', '--parsable', 'name:contact', 'NOT',
+                        'email:example'])
+        text = stdout.getvalue().splitlines()
+        expect = ["testuid2\tthird contact\tfoo"]
+        self.assertListEqual(text, expect)
+
+    def test_ls_with_invalid_query(self):
+        with self.assertRaises(SystemExit) as context:
+            khard.main(['list', '(second'])
+        self.assertIn('Invalid search query', str(context.exception))
+
+    def test_parsable_email_without_matches(self):
+        with mock_stdout() as stdout:
+            with self.assertRaises(SystemExit):
+                khard.main(['email', '--parsable', 'third'])
+        text = stdout.getvalue().splitlines()
+        expect = ["searching for 'third' ..."]
+        self.assertListEqual(text, expect)
+
     def test_simple_details_without_options(self):
         with mock_stdout() as stdout:
             khard.main(['details', 'uid1'])
@@ -124,6 +171,50 @@ class ListingCommands(unittest.TestCase):
         self.assertIn('UID: testuid1', text)
 
 
+class StreamingOutput(unittest.TestCase):
+
+    def test_matching_lines_are_yielded_before_the_input_ends(self):
+        def lines():
+            yield 'a', False
+            yield 'b', True
+            raise AssertionError('read too far')
+        output = khard.matching_or_all(lines())
+        self.assertEqual(next(output), 'b')
+
+    def test_all_lines_are_yielded_if_none_match(self):
+        lines = [('a', False), ('b', False)]
+        self.assertListEqual(list(khard.matching_or_all(lines)), ['a', 'b'])
+
+    def test_non_matching_lines_are_dropped_after_a_match(self):
+        lines = [('a', False), ('b', True), ('c', False), ('d', True)]
+        self.assertListEqual(list(khard.matching_or_all(lines)), ['b', 'd'])
+
+    def test_print_lines_counts_lines(self):
+        with mock_stdout() as stdout:
+            count = khard.print_lines(iter(['a', 'b']))
+        self.assertEqual(count, 2)
+        self.assertEqual(stdout.getvalue(), 'a\nb\n')
+
+    def test_print_lines_exits_quietly_on_broken_pipe(self):
+        stdout = mock.Mock()
+        stdout.write.side_effect = BrokenPipeError
+        with mock.patch('sys.stdout', stdout), \
+                mock.patch('sys.__stdout__', stdout):
+            with mock.patch('os.dup2') as dup2:
+                with self.assertRaises(SystemExit):
+                    khard.print_lines(['a'])
+        dup2.assert_called_once_with(mock.ANY, stdout.fileno())
+
+    def test_redirected_stdout_is_not_replaced_on_broken_pipe(self):
+        stdout = mock.Mock()
+        stdout.write.side_effect = BrokenPipeError
+        with mock.patch('sys.stdout', stdout):
+            with mock.patch('os.dup2') as dup2:
+                with self.assertRaises(SystemExit):
+                    khard.print_lines(['a'])
+        dup2.assert_not_called()
+
+
 @mock.patch('khard.config.find_executable', lambda x: x)
 class FileSystemCommands(unittest.TestCase):
     """Tests for subcommands that interact with different address books."""
@@ -200,6 +291,83 @@ class FileSystemCommands(unittest.TestCase):
         new = len(list(self.abook1.glob('*.vcf')))
         self.assertEqual(new, old + 1)
 
+    def test_import_of_a_file_with_several_cards(self):
+        source = pathlib.Path(self._tmp.name) / 'all.vcf'
+        with source.open('w') as fh:
+            for name in ['contact1.vcf', 'contact2.vcf']:
+                with open('test/fixture/foo.abook/' + name) as card:
+                    fh.write(card.read())
+        with mock_stdout() as stdout:
+            khard.main(['import', '-a', 'abook2', str(source)])
+        self.assertIn('Imported 2 contacts into address book abook2',
+                      stdout.getvalue())
+        self.assertEqual(sorted(path.name for path in self.abook2.iterdir()),
+                         ['testuid1.vcf', 'testuid2.vcf'])
+
+
+@mock.patch('khard.config.find_executable', lambda x: x)
+class SearchingCommands(TmpVdir, unittest.TestCase):
+    """Tests for the lines that the listing subcommands print for a search."""
+
+    def setUp(self):
+        super().setUp()
+        for name, lines in [('alice', ['TEL;TYPE=cell:030 1234 5678',
+                                       'EMAIL;TYPE=home:alice@home.org',
+                                       'EMAIL;TYPE=work:alice@work.com',
+                                       'ADR;TYPE=home:;;Main Street 1;Berlin;;'
+                                       '10115;Germany']),
+                            ('bob', ['TEL;TYPE=cell:0171 999 1234'])]:
+            with open(os.path.join(self.vdir, name + '.vcf'), 'w') as fh:
+                fh.write('BEGIN:VCARD\nVERSION:3.0\nFN:{0}\nN:;{0};;;\n'
+                         '{1}\nUID:{0}\nEND:VCARD\n'.format(
+                             name, '\n'.join(lines)))
+        config = os.path.join(self.tmp_dir, 'khard.conf')
+        with open(config, 'w') as fh:
+            fh.write('[general]\neditor = editor\nmerge_editor = merge\n'
+                     '[addressbooks]\n[[foo]]\npath = {}\n'.format(self.vdir))
+        patch = mock.patch.dict('os.environ', KHARD_CONFIG=config)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _phone(self, *args):
+        with mock_stdout() as stdout:
+            khard.main(['phone', '--parsable'] + list(args))
+        return sorted(stdout.getvalue().splitlines())
+
+    def test_post_addresses_parsable(self):
+        with mock_stdout() as stdout:
+            khard.main(['postaddress', '--parsable', 'alice'])
+        address, name, type = stdout.getvalue().rstrip('\n').split('\t')
+        self.assertEqual((name, type), ('alice', 'home'))
+        self.assertIn("'street': 'Main Street 1'", address)
+        self.assertIn("'city': 'Berlin'", address)
+
+    def test_lines_are_selected_by_the_terms_in_their_order(self):
+        with mock_stdout() as stdout:
+            khard.main(['email', '--parsable', 'alice', 'work'])
+        self.assertEqual(stdout.getvalue().splitlines(),
+                         ["searching for 'alice.*work' ...",
+                          'alice@work.com\talice\twork'])
+
+    def test_part_of_a_number_matches_anywhere(self):
+        self.assertEqual(self._phone('1234'),
+                         ['0123456789\tsecond contact\tvoice',
+                          '0171 999 1234\tbob\tcell',
+                          '030 1234 5678\talice\tcell'])
+
+    def test_digits_in_the_middle_of_a_number_are_found(self):
+        # 345678 is also the end of the number of alice
+        self.assertEqual(self._phone('345678'),
+                         ['0123456789\tsecond contact\tvoice',
+                          '030 1234 5678\talice\tcell'])
+
+    def test_short_number_with_trunk_prefix(self):
+        self.assertEqual(self._phone('030'), ['030 1234 5678\talice\tcell'])
+
+    def test_complete_number_is_found_in_international_form(self):
+        self.assertEqual(self._phone('+49 171 9991234'),
+                         ['0171 999 1234\tbob\tcell'])
+
 
 @mock.patch('khard.config.find_executable', lambda x: x)
 class MiscCommands(unittest.TestCase):
@@ -219,6 +387,48 @@ class MiscCommands(unittest.TestCase):
         self.assertIn('Last name', yaml)
         self.assertIn('Nickname', yaml)
 
+    @mock.patch.dict('os.environ', KHARD_CONFIG='test/fixture/minimal.conf')
+    def test_export_of_all_contacts_as_ndjson(self):
+        with mock_stdout() as stdout:
+            khard.main(["export", "--all", "--format", "ndjson"])
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"Address book": "foo"', lines[0])
+
+    @mock.patch.dict('os.environ', KHARD_CONFIG='test/fixture/minimal.conf')
+    def test_add_email_address_known_from_another_contact(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            header = str(pathlib.Path(tmp) / 'header')
+            with open(header, 'w') as fh:
+                fh.write('From: third contact <user@example.com>\n\n')
+            with mock_stdout() as stdout:
+                with mock.patch('builtins.input', return_value='n') as input:
+                    with self.assertRaises(SystemExit):
+                        khard.main(['add-email', '-i', header])
+        input.assert_called_once_with(
+            'Do you want to add the email address user@example.com to the '
+            'contact third contact (y/n)? ')
+        self.assertIn('Canceled', stdout.getvalue())
+
+    @mock.patch.dict('os.environ', KHARD_CONFIG='test/fixture/minimal.conf')
+    def test_raw_export_needs_all(self):
+        with mock.patch('sys.stderr'):
+            with self.assertRaises(SystemExit):
+                khard.main(["export", "--raw"])
+
+    @mock.patch.dict('os.environ', KHARD_CONFIG='test/fixture/minimal.conf')
+    def test_profile_covers_argument_parsing_and_loading(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = str(pathlib.Path(tmp) / 'khard.prof')
+            with mock_stdout() as stdout:
+                with mock.patch('sys.stderr', io.StringIO()):
+                    khard.main(['--profile', filename, 'list', '--parsable'])
+            functions = {name for _, _, name in
+                         pstats.Stats(filename).stats}
+        self.assertEqual(len(stdout.getvalue().splitlines()), 3)
+        self.assertIn('parse_args', functions)
+        self.assertIn('load', functions)
+
     @expectedFailureForVersion(3, 5)
     @mock.patch.dict('os.environ', KHARD_CONFIG='test/fixture/minimal.conf')
     def test_simple_edit_without_modification(self):
@@ -1,6 +1,8 @@
 """Tests for the config module."""
 
 import io
+import os
+import tempfile
 import unittest
 import unittest.mock as mock
 
@@ -33,6 +35,83 @@ class LoadingConfigFile(unittest.TestCase):
         self.assertEqual(cfg.merge_editor, "meditor")
 
 
+class Editors(unittest.TestCase):
+
+    def test_editors_are_not_looked_up_while_loading(self):
+        with mock.patch('khard.config.find_executable') as find:
+            cfg = config.Config("test/fixture/minimal.conf")
+            find.assert_not_called()
+            find.return_value = '/usr/bin/editor'
+            self.assertEqual(cfg.editor, '/usr/bin/editor')
+            find.assert_called_once_with('editor')
+
+    @mock.patch.dict('os.environ')
+    def test_missing_editor_fails_when_it_is_needed(self):
+        os.environ.pop('EDITOR', None)
+        with tempfile.NamedTemporaryFile('w', suffix='.conf') as fh:
+            fh.write('[addressbooks]\n[[foo]]\npath = '
+                     'test/fixture/foo.abook\n')
+            fh.flush()
+            cfg = config.Config(fh.name)
+            stdout = io.StringIO()
+            with mock.patch("sys.stdout", stdout):
+                with self.assertRaises(SystemExit):
+                    cfg.editor
+        self.assertIn('$EDITOR', stdout.getvalue())
+
+
+class CachedConfig(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self._tmp.name, 'khard.conf')
+        self._write('first_name')
+        self._patch = mock.patch.dict(
+            'os.environ', XDG_CACHE_HOME=os.path.join(self._tmp.name, 'cache'))
+        self._patch.start()
+
+    def tearDown(self):
+        self._patch.stop()
+        self._tmp.cleanup()
+
+    def _write(self, sort, mtime=0):
+        with open(self.filename, 'w') as fh:
+            fh.write('[contact table]\nsort = {}\n[addressbooks]\n[[foo]]\n'
+                     'path = test/fixture/foo.abook\n'.format(sort))
+        # old files are cached
+        os.utime(self.filename, (mtime, mtime))
+
+    def test_unchanged_config_file_is_not_parsed_again(self):
+        config.Config(self.filename)
+        with mock.patch('configobj.ConfigObj') as configobj:
+            cfg = config.Config(self.filename)
+        configobj.assert_not_called()
+        self.assertEqual(cfg.sort, 'first_name')
+        self.assertEqual(cfg.get_preferred_vcard_version(), '3.0')
+        self.assertEqual([abook.name for abook in cfg.abooks], ['foo'])
+
+    def test_changed_config_file_is_parsed_again(self):
+        config.Config(self.filename)
+        self._write('last_name', mtime=1)
+        self.assertEqual(config.Config(self.filename).sort, 'last_name')
+
+    @mock.patch('khard.config.find_executable', lambda x: x)
+    def test_editor_from_the_environment_is_not_cached(self):
+        with mock.patch.dict('os.environ', EDITOR='vim'):
+            self.assertEqual(config.Config(self.filename).editor, 'vim')
+        with mock.patch.dict('os.environ', EDITOR='nano'):
+            with mock.patch('configobj.ConfigObj') as configobj:
+                cfg = config.Config(self.filename)
+            self.assertEqual(cfg.editor, 'nano')
+        configobj.assert_not_called()
+
+    def test_recently_changed_config_file_is_not_cached(self):
+        os.utime(self.filename)
+        config.Config(self.filename)
+        self.assertFalse(os.path.exists(os.path.join(self._tmp.name,
+                                                     'cache')))
+
+
 class TestConvertBooleanConfigValue(unittest.TestCase):
 
     config = {'some key': 'some value',
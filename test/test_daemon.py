@@ -0,0 +1,140 @@
+"""Tests for the khard daemon and its client."""
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from khard import daemon
+
+from .helpers import TmpVdir
+
+
+class ConfigOption(unittest.TestCase):
+
+    def test_no_config_option(self):
+        self.assertEqual(daemon._get_config_option(['list', '-p']), '')
+
+    def test_separate_value(self):
+        self.assertEqual(daemon._get_config_option(['-c', 'a.conf', 'ls']),
+                         'a.conf')
+
+    def test_attached_values(self):
+        self.assertEqual(daemon._get_config_option(['--config=a.conf']),
+                         'a.conf')
+        self.assertEqual(daemon._get_config_option(['-ca.conf']), 'a.conf')
+
+    def test_options_of_subcommands_are_ignored(self):
+        self.assertEqual(daemon._get_config_option(['ls', '-c', 'x']), '')
+
+
+class Forward(unittest.TestCase):
+
+    def test_nothing_is_forwarded_without_a_daemon(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'khard.sock')
+            self.assertIsNone(daemon.forward(['list'], path))
+
+    def test_starting_khard_does_not_import_the_daemon(self):
+        modules = subprocess.check_output(
+            [sys.executable, '-c', 'import sys, khard.khard\n'
+             'for name in sorted(sys.modules): print(name)'],
+            universal_newlines=True).split()
+        for name in ['khard.daemon', 'khard.watcher', 'ctypes', 'socket',
+                     'sqlite3', 'concurrent.futures']:
+            self.assertNotIn(name, modules)
+
+
+class RunningDaemon(TmpVdir, unittest.TestCase):
+    """Tests against a daemon in a subprocess."""
+
+    def setUp(self):
+        super().setUp()
+        self.config = os.path.join(self.tmp_dir, 'khard.conf')
+        with open(self.config, 'w') as fh:
+            fh.write('[general]\neditor = {0}\nmerge_editor = {0}\n'
+                     '[addressbooks]\n[[foo]]\npath = {1}\n'.format(
+                         sys.executable, self.vdir))
+        self.socket = os.path.join(self.tmp_dir, 'khard.sock')
+        patch = mock.patch.dict('os.environ', XDG_RUNTIME_DIR=self.tmp_dir)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'khard', '-c', self.config, 'daemon'],
+            stdin=subprocess.DEVNULL)
+        for _ in range(100):
+            if os.path.exists(self.socket):
+                break
+            time.sleep(0.1)
+
+    def tearDown(self):
+        self.process.terminate()
+        self.process.wait()
+
+    def _forward(self, *args):
+        stdout = io.StringIO()
+        with mock.patch('sys.stdout', stdout):
+            status = daemon.forward(['-c', self.config] + list(args))
+        return status, stdout.getvalue()
+
+    def test_socket_is_removed_on_exit(self):
+        self.assertTrue(os.path.exists(self.socket))
+        self.process.terminate()
+        self.process.wait()
+        self.assertFalse(os.path.exists(self.socket))
+
+    def test_output_of_listing_subcommands(self):
+        status, output = self._forward('list', '--parsable')
+        self.assertEqual(status, 0)
+        self.assertEqual(output, 'testuid1\tsecond contact\tfoo\n'
+                         'testuid3\ttext birthday\tfoo\n'
+                         'testuid2\tthird contact\tfoo\n')
+
+    def test_exit_status_is_forwarded(self):
+        status, output = self._forward('email', '--parsable', 'nobody')
+        self.assertEqual(status, 1)
+        self.assertEqual(output, "searching for 'nobody' ...\n")
+
+    def test_options_do_not_change_later_requests(self):
+        _, reverse = self._forward('list', '--parsable', '--reverse')
+        _, normal = self._forward('list', '--parsable')
+        self.assertEqual(reverse.splitlines(),
+                         list(reversed(normal.splitlines())))
+
+    def test_interactive_subcommands_are_refused(self):
+        self.assertIsNone(self._forward('new')[0])
+
+    def test_refused_subcommands_do_not_touch_files(self):
+        output = os.path.join(self.tmp_dir, 'out.yaml')
+        with open(output, 'w') as fh:
+            fh.write('important')
+        self.assertIsNone(self._forward('export', '-o', output)[0])
+        with open(output) as fh:
+            self.assertEqual(fh.read(), 'important')
+
+    def test_other_config_files_are_refused(self):
+        status = daemon.forward(['-c', 'test/fixture/minimal.conf', 'list'])
+        self.assertIsNone(status)
+
+    def test_changed_files_are_reloaded(self):
+        with open(os.path.join(self.vdir, 'new.vcf'), 'w') as fh:
+            fh.write('BEGIN:VCARD\nVERSION:3.0\nFN:new contact\nN:;;;;\n'
+                     'UID:newuid\nEND:VCARD\n')
+        status, output = self._forward('list', '--parsable', 'new')
+        self.assertEqual(status, 0)
+        self.assertEqual(output, 'newuid\tnew contact\tfoo\n')
+
+    def test_removed_files_are_forgotten(self):
+        self._forward('list')
+        os.remove(os.path.join(self.vdir, 'contact1.vcf'))
+        status, output = self._forward('list', '--parsable')
+        self.assertEqual(output, 'testuid3\ttext birthday\tfoo\n'
+                         'testuid2\tthird contact\tfoo\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
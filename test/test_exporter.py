@@ -0,0 +1,99 @@
+"""Tests for exporting many contacts at once."""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from khard import address_book
+from khard import exporter
+from khard import importer
+
+
+_VCARD = """BEGIN:VCARD
+VERSION:3.0
+FN:Alice Smith
+N:Smith;Alice;;;
+UID:alice
+ORG:Acme;Research
+TEL;TYPE=cell:+49 30 1234
+TEL;TYPE=work:+49 30 5678
+EMAIL;TYPE=work:alice@acme.org
+ADR;TYPE=home:;;Main Street 1;Berlin;;10115;Germany
+X-JABBER:alice@jabber.org
+NOTE:first line\\nsecond line
+END:VCARD"""
+
+
+class Export(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(cls._tmp.name, 'alice.vcf'), 'w') as fh:
+            fh.write(_VCARD)
+        cls.abook = address_book.VdirAddressBook(
+            'test', cls._tmp.name, private_objects=['Jabber'])
+        cls.abook.load()
+        cls.contacts = list(cls.abook.contacts.values())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+
+    def _export(self, format, raw=False):
+        output = io.StringIO()
+        count = exporter.export_contacts(self.contacts, output, format, raw)
+        self.assertEqual(count, 1)
+        return output.getvalue()
+
+    def test_user_data_has_the_template_fields(self):
+        self.assertEqual(self.contacts[0].get_user_data(), {
+            'UID': 'alice', 'First name': ['Alice'],
+            'Last name': ['Smith'], 'Organisation': [['Acme', 'Research']],
+            'Phone': {'cell': ['+49 30 1234'], 'work': ['+49 30 5678']},
+            'Email': {'work': ['alice@acme.org']},
+            'Address': {'home': [{'Street': 'Main Street 1',
+                                  'City': 'Berlin', 'Code': '10115',
+                                  'Country': 'Germany'}]},
+            'Private': {'Jabber': ['alice@jabber.org']},
+            'Note': ['first line\nsecond line']})
+
+    def test_vcf(self):
+        text = self._export('vcf')
+        self.assertTrue(text.startswith('BEGIN:VCARD\r\n'))
+        self.assertIn('UID:alice\r\n', text)
+
+    def test_raw_copies_the_file(self):
+        self.assertEqual(self._export('vcf', raw=True), _VCARD + '\n')
+
+    def test_ndjson(self):
+        data = json.loads(self._export('ndjson'))
+        self.assertEqual(data['Address book'], 'test')
+        self.assertEqual(data['Email'], {'work': ['alice@acme.org']})
+
+    def test_csv_can_be_imported_again(self):
+        text = self._export('csv')
+        with self.assertNoLogs(level='WARNING'):
+            records = list(importer.read_csv(io.StringIO(text), ['Jabber']))
+        self.assertEqual(records, [{
+            'UID': 'alice', 'First name': 'Alice', 'Last name': 'Smith',
+            'Note': 'first line\nsecond line',
+            'Organisation': 'Acme, Research',
+            'Phone': {'cell': '+49 30 1234', 'work': '+49 30 5678'},
+            'Email': {'work': 'alice@acme.org'},
+            'Address': {'home': {'Street': 'Main Street 1', 'City': 'Berlin',
+                                 'Code': '10115', 'Country': 'Germany'}},
+            'Private': {'Jabber': 'alice@jabber.org'}}])
+
+    def test_csv_cells_of_address_parts_with_several_lines(self):
+        row = exporter.csv_row({'Address': {'home': [
+            {'Street': ['Main Street 1', 'Backyard'], 'City': 'Berlin'}]}})
+        self.assertEqual(row, {
+            'Address home Street': 'Main Street 1\nBackyard',
+            'Address home City': 'Berlin'})
+
+
+if __name__ == "__main__":
+    unittest.main()
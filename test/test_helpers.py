@@ -101,5 +101,59 @@ class StringToDate(unittest.TestCase):
         self.assertEqual(result, self.zone)
 
 
+class DisplayWidth(unittest.TestCase):
+
+    def test_ascii_width_is_the_length(self):
+        self.assertEqual(helpers.display_width('abc'), 3)
+
+    def test_wide_characters_take_two_columns(self):
+        self.assertEqual(helpers.display_width('山田'), 4)
+
+    def test_combining_characters_take_no_columns(self):
+        self.assertEqual(helpers.display_width('e\u0301'), 1)
+
+
+class PrettyPrint(unittest.TestCase):
+
+    def test_columns_are_aligned(self):
+        table = [['Name', 'Type'], ['a', 'home'], ['bcdef', 'work']]
+        expected = ['Name     Type   ', 'a        home   ',
+                    'bcdef    work   ']
+        self.assertListEqual(helpers.pretty_print(table).split('\n'),
+                             expected)
+
+    def test_multi_line_cells(self):
+        table = [['Name', 'Address'], [1, 'street\ncity']]
+        expected = ['Name    Address   ', '1       street    ',
+                    '        city      ']
+        self.assertListEqual(helpers.pretty_print(table).split('\n'),
+                             expected)
+
+    def test_right_justified(self):
+        table = [['a', 'bb'], ['ccc', 'd']]
+        expected = ['     a    bb', '   ccc     d']
+        self.assertListEqual(helpers.pretty_print(table, 'R').split('\n'),
+                             expected)
+
+    def test_wide_characters_are_aligned_by_display_width(self):
+        table = [['山田太郎', 'home'], ['Bob', 'work']]
+        lines = helpers.pretty_print(table).split('\n')
+        self.assertEqual(lines[0].index('home') + 4, lines[1].index('work'))
+
+    def test_rows_after_the_sample_are_formatted_lazily(self):
+        def table():
+            yield ['Name', 'Type']
+            yield ['a', 'home']
+            raise AssertionError('read too far')
+        lines = helpers.pretty_print_lines(table(), sample=1)
+        self.assertEqual(next(lines), 'Name    Type   ')
+        self.assertEqual(next(lines), 'a       home   ')
+
+    def test_wider_cells_after_the_sample_are_not_cut(self):
+        lines = list(helpers.pretty_print_lines(
+            [['a', 'b'], ['long', 'c', 'new']], sample=1))
+        self.assertListEqual(lines, ['a    b   ', 'long c    new   '])
+
+
 if __name__ == "__main__":
     unittest.main()
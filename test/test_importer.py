@@ -0,0 +1,143 @@
+"""Tests for importing contacts from vCard, CSV and LDIF files."""
+
+import io
+import os
+import unittest
+
+from khard import address_book
+from khard import importer
+
+from .helpers import TmpVdir
+
+
+class ReadVcards(unittest.TestCase):
+
+    def test_cards_are_split(self):
+        text = ('BEGIN:VCARD\nFN:a\nEND:VCARD\n'
+                'begin:vcard\r\nFN:b\r\nend:vcard\r\n')
+        self.assertEqual(list(importer.read_vcards(io.StringIO(text))),
+                         ['BEGIN:VCARD\nFN:a\nEND:VCARD\n',
+                          'begin:vcard\r\nFN:b\r\nend:vcard\r\n'])
+
+    def test_incomplete_cards_are_kept(self):
+        text = 'BEGIN:VCARD\nFN:a\n'
+        self.assertEqual(list(importer.read_vcards(io.StringIO(text))),
+                         [text])
+
+
+class ReadCsv(unittest.TestCase):
+
+    def _read(self, text, private_objects=()):
+        return list(importer.read_csv(io.StringIO(text), private_objects))
+
+    def test_columns_are_mapped_to_template_fields(self):
+        text = ('first name,Last name,Phone cell,Email,Address home City,'
+                'Organisation,Jabber\n'
+                'Jane,Doe,123,jane@example.com,Berlin,"Acme\nOther",jd@x\n')
+        self.assertEqual(self._read(text, ['Jabber']), [{
+            'First name': 'Jane', 'Last name': 'Doe',
+            'Phone': {'cell': '123'},
+            'Email': {'internet': 'jane@example.com'},
+            'Address': {'home': {'City': 'Berlin'}},
+            'Organisation': ['Acme', 'Other'],
+            'Private': {'Jabber': 'jd@x'}}])
+
+    def test_unknown_columns_and_empty_rows_are_ignored(self):
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertEqual(self._read('Last name,Foo\nDoe,x\n,\n'),
+                             [{'Last name': 'Doe'}])
+        self.assertIn('Foo', logs.output[0])
+
+
+class ReadLdif(unittest.TestCase):
+
+    def test_attributes_are_mapped_to_template_fields(self):
+        text = ('version: 1\n\n'
+                '# a comment\n'
+                'dn: cn=John Q Public,mail=john@example.com\n'
+                'cn: John Q Public\n'
+                'mail: john@example.com\n'
+                'mozillaSecondEmail: jp@example.org\n'
+                'mobile: +1 555\n'
+                'description:: TXVsdGkKbGluZQ==\n'
+                'l: Spring\n'
+                ' field\n')
+        self.assertEqual(list(importer.read_ldif(io.StringIO(text))), [{
+            'First name': 'John Q', 'Last name': 'Public',
+            'Email': {'internet': ['john@example.com', 'jp@example.org']},
+            'Phone': {'cell': '+1 555'},
+            'Note': 'Multi\nline',
+            'Address': {'work': {'City': 'Springfield'}}}])
+
+
+class ConvertRecords(unittest.TestCase):
+
+    def test_uids_are_kept_or_assigned(self):
+        results = importer.convert_records(
+            ['BEGIN:VCARD\nVERSION:3.0\nFN:a\nN:;a;;;\nUID:x\nEND:VCARD\n',
+             'BEGIN:VCARD\nVERSION:3.0\nFN:b\nN:;b;;;\nEND:VCARD\n',
+             {'First name': 'c', 'UID': 'y'}, {'First name': 'd'}],
+            '3.0', [])
+        uids = [uid for uid, _ in results]
+        self.assertEqual(uids[0], 'x')
+        self.assertEqual(uids[2], 'y')
+        self.assertTrue(uids[1] and uids[3])
+        self.assertIn('UID:{}'.format(uids[1]), results[1][1])
+
+    def test_errors_are_returned(self):
+        results = importer.convert_records(
+            ['BEGIN:VCARD\nFN:a\n', {'Note': 'no name'}], '3.0', [])
+        self.assertEqual([uid for uid, _ in results], [None, None])
+
+
+class ImportContacts(TmpVdir, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.abook = address_book.VdirAddressBook('test', self.vdir)
+        self.abook.load()
+
+    def _import(self, records, **kwargs):
+        return importer.import_contacts(self.abook, records, '3.0', [],
+                                        **kwargs)
+
+    def test_contacts_are_written_and_existing_uids_skipped(self):
+        with open('test/fixture/foo.abook/contact1.vcf') as fh:
+            existing = fh.read()
+        new = ('BEGIN:VCARD\nVERSION:3.0\nFN:new\nN:;new;;;\nUID:new\n'
+               'END:VCARD\n')
+        with self.assertLogs(level='WARNING'):
+            result = self._import([existing, new, new, {'Note': 'x'}])
+        self.assertEqual((result.imported, result.duplicates, result.errors),
+                         (1, 2, 1))
+        fresh = address_book.VdirAddressBook('test', self.vdir)
+        fresh.load()
+        self.assertEqual(fresh.contacts['new'].formatted_name, 'new')
+        self.assertEqual(len(fresh.contacts), 4)
+        self.assertEqual(sorted(os.listdir(self.vdir)),
+                         ['contact1.vcf', 'contact2.vcf', 'new.vcf',
+                          'text-bday.vcf'])
+
+    def test_progress_is_reported_per_batch(self):
+        totals = []
+        self._import([{'First name': str(i)} for i in range(5)],
+                     batch_size=2, progress=lambda r: totals.append(r.total))
+        self.assertEqual(totals, [2, 4, 5])
+
+    def test_unsafe_uids_get_another_file_name(self):
+        self._import(['BEGIN:VCARD\nVERSION:3.0\nFN:a\nN:;a;;;\nUID:../a\n'
+                      'END:VCARD\n'])
+        files = [name for name in os.listdir(self.vdir)
+                 if name not in os.listdir('test/fixture/foo.abook')]
+        self.assertEqual(len(files), 1)
+        self.assertNotIn('a.vcf', files)
+
+    def test_workers_give_the_same_result(self):
+        records = [{'First name': str(i)} for i in range(6)]
+        result = self._import(records, workers=2, batch_size=2)
+        self.assertEqual(result.imported, 6)
+        self.assertEqual(len(os.listdir(self.vdir)), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""Tests for the counters, timers and traces of khard runs."""
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from khard import address_book
+from khard import instrumentation
+from khard import khard
+
+
+class Registry(unittest.TestCase):
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_nothing_is_collected_when_disabled(self):
+        instrumentation.count('files', 3, 'book')
+        with instrumentation.timer('load', 'book'):
+            pass
+        self.assertEqual(instrumentation._counters, {})
+        self.assertEqual(instrumentation._times, {})
+
+    def test_values_are_collected_per_scope(self):
+        instrumentation.enable()
+        instrumentation.count('files', 3, 'book')
+        instrumentation.count('files', 2, 'book')
+        instrumentation.count('files', 1, 'other')
+        instrumentation.add_time('load', 0.5, 'book')
+        instrumentation.add_time('load', 0.25, 'book')
+        self.assertEqual(instrumentation._counters,
+                         {('book', 'files'): 5, ('other', 'files'): 1})
+        self.assertEqual(instrumentation._times, {('book', 'load'): 0.75})
+
+    def test_running_timers_are_stopped_by_the_report(self):
+        instrumentation.enable()
+        instrumentation.timer('render')
+        stream = io.StringIO()
+        instrumentation.report(stream)
+        self.assertIn((None, 'render'), instrumentation._times)
+        self.assertIn('render', stream.getvalue())
+
+
+class Counters(unittest.TestCase):
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def test_loading_counts_files_and_errors(self):
+        instrumentation.enable()
+        abook = address_book.VdirAddressBook(
+            'broken', 'test/fixture/broken.abook', skip=True)
+        with self.assertLogs(level='WARNING'):
+            abook.load()
+        abook = address_book.VdirAddressBook('foo', 'test/fixture/foo.abook')
+        abook.load()
+        counters = instrumentation._counters
+        self.assertEqual(counters[('broken', 'parse errors')], 1)
+        self.assertEqual(counters[('foo', 'files found')], 3)
+        self.assertEqual(counters[('foo', 'files parsed')], 3)
+        self.assertGreater(counters[('foo', 'bytes read')], 0)
+        self.assertNotIn(('foo', 'parse errors'), counters)
+
+    def test_source_file_prefilter_is_counted(self):
+        instrumentation.enable()
+        abook = address_book.VdirAddressBook('foo', 'test/fixture/foo.abook')
+        abook.load('second', search_in_source_files=True)
+        self.assertEqual(
+            instrumentation._counters[('foo', 'skipped by prefilter')], 2)
+
+
+class Tracing(unittest.TestCase):
+
+    def tearDown(self):
+        instrumentation.disable()
+
+    def _events(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            instrumentation.write_trace(tmp)
+            filename, = os.listdir(tmp)
+            with open(os.path.join(tmp, filename)) as fh:
+                return json.load(fh)['traceEvents']
+
+    def test_timers_and_spans_are_traced_but_not_counted(self):
+        instrumentation.enable_tracing()
+        with instrumentation.timer('load', 'book'):
+            with instrumentation.span('load file', file='a.vcf'):
+                pass
+        events = self._events()
+        self.assertEqual([event['name'] for event in events],
+                         ['process_name', 'load file', 'load'])
+        self.assertEqual(events[1]['args'], {'file': 'a.vcf'})
+        self.assertEqual(events[2]['args'], {'address book': 'book'})
+        self.assertLessEqual(events[2]['ts'], events[1]['ts'])
+        self.assertEqual(instrumentation._times, {})
+
+    def test_short_spans_are_left_out(self):
+        instrumentation.enable_tracing(threshold=60)
+        with instrumentation.span('fast', threshold=True):
+            pass
+        with instrumentation.span('always'):
+            pass
+        self.assertEqual([event['name'] for event in self._events()],
+                         ['process_name', 'always'])
+
+    def test_unwritable_trace_file_is_a_warning(self):
+        instrumentation.enable_tracing()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'missing', 'trace.json')
+            with self.assertLogs(level='WARNING'):
+                instrumentation.write_trace(path)
+
+    def test_nothing_is_written_when_disabled(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            instrumentation.write_trace(tmp)
+            self.assertEqual(os.listdir(tmp), [])
+
+
+@mock.patch('khard.config.find_executable', lambda x: x)
+@mock.patch.dict('os.environ', KHARD_CONFIG='test/fixture/minimal.conf')
+class StatsOption(unittest.TestCase):
+
+    def test_trace_is_written_to_the_file_from_the_environment(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'trace.json')
+            with mock.patch.dict('os.environ', KHARD_TRACE=filename):
+                with mock.patch('sys.stdout', io.StringIO()):
+                    khard.main(['list', '--parsable'])
+            with open(filename) as fh:
+                names = {event['name'] for event in
+                         json.load(fh)['traceEvents']}
+        for name in ['khard', 'config', 'load address books', 'load',
+                     'get contacts', 'render']:
+            self.assertIn(name, names)
+        self.assertFalse(instrumentation.tracing)
+
+    def test_report_is_printed_to_stderr(self):
+        with mock.patch('sys.stdout', io.StringIO()):
+            with mock.patch('sys.stderr', io.StringIO()) as stderr:
+                khard.main(['--stats', 'list', '--parsable'])
+        report = stderr.getvalue()
+        self.assertTrue(report.startswith('Statistics, total time'))
+        for phase in ['config', 'load', 'search', 'sort', 'render']:
+            self.assertIn(phase, report)
+        self.assertFalse(instrumentation.enabled)
+
+
+if __name__ == "__main__":
+    unittest.main()
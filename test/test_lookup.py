@@ -0,0 +1,149 @@
+"""Tests for the phone number and email address indexes."""
+
+import unittest
+from unittest import mock
+
+from khard import lookup
+
+
+def _contact(phone_numbers):
+    return mock.Mock(phone_numbers=phone_numbers)
+
+
+class IsPhoneNumberQuery(unittest.TestCase):
+
+    def test_digits_are_a_phone_number(self):
+        self.assertEqual(lookup.is_phone_number_query('0301234'), '0301234')
+
+    def test_escaped_phone_number_is_unescaped(self):
+        self.assertEqual(lookup.is_phone_number_query(r'\+49\ 30.*123'),
+                         '+49 30 123')
+
+    def test_names_are_no_phone_numbers(self):
+        self.assertIsNone(lookup.is_phone_number_query('john'))
+        self.assertIsNone(lookup.is_phone_number_query('12ab34'))
+
+    def test_short_numbers_are_no_phone_numbers(self):
+        self.assertIsNone(lookup.is_phone_number_query('12'))
+        self.assertIsNone(lookup.is_phone_number_query('030'))
+        self.assertIsNone(lookup.is_phone_number_query('12345'))
+
+    def test_numbers_without_prefix_are_no_complete_numbers(self):
+        self.assertIsNone(lookup.is_phone_number_query('123456'))
+        self.assertIsNone(lookup.is_phone_number_query('301234', ''))
+        self.assertEqual(lookup.is_phone_number_query('00493012', ''),
+                         '00493012')
+
+    def test_match_all_query_is_no_phone_number(self):
+        self.assertIsNone(lookup.is_phone_number_query('.*'))
+
+
+class PhoneNumberIndexNormalize(unittest.TestCase):
+
+    def test_international_prefix_and_country_code_are_removed(self):
+        index = lookup.PhoneNumberIndex('49')
+        self.assertEqual(index.normalize('+49 30 123456'), '30123456')
+        self.assertEqual(index.normalize('0049 30 123456'), '30123456')
+
+    def test_trunk_prefix_is_removed(self):
+        index = lookup.PhoneNumberIndex('49')
+        self.assertEqual(index.normalize('030 / 12 34 56'), '30123456')
+
+    def test_foreign_numbers_keep_their_country_code(self):
+        index = lookup.PhoneNumberIndex('49')
+        self.assertEqual(index.normalize('+1 555 1234'), '15551234')
+
+
+class PhoneNumberIndexLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.index = lookup.PhoneNumberIndex('49')
+        self.alice = _contact({'cell': ['030 123456'], 'work': ['+1 555 9876']})
+        self.bob = _contact({'home': ['+49 (40) 555123']})
+        self.index.add_contact(self.alice)
+        self.index.add_contact(self.bob)
+
+    def test_international_query_finds_national_number(self):
+        self.assertEqual(self.index.lookup('+4930123456'),
+                         [(self.alice, 'cell', '030 123456')])
+
+    def test_suffix_query_finds_numbers(self):
+        self.assertEqual(self.index.lookup('555123'),
+                         [(self.bob, 'home', '+49 (40) 555123')])
+
+    def test_stored_number_is_found_as_suffix_of_longer_query(self):
+        index = lookup.PhoneNumberIndex()
+        index.add_contact(self.alice)
+        self.assertEqual(index.lookup('+4930123456'),
+                         [(self.alice, 'cell', '030 123456')])
+
+    def test_unknown_number_returns_nothing(self):
+        self.assertEqual(self.index.lookup('999999'), [])
+
+    def test_removed_contacts_are_not_found(self):
+        self.index.remove_contact(self.alice)
+        self.assertEqual(self.index.lookup('030123456'), [])
+        self.assertEqual(len(self.index.lookup('555123')), 1)
+
+    def test_contacts_can_be_removed_after_a_lookup(self):
+        self.index.lookup('555123')
+        self.index.remove_contact(self.bob)
+        self.assertEqual(self.index.lookup('555123'), [])
+        self.assertEqual(len(self.index.lookup('123456')), 1)
+
+
+class IsEmailAddressQuery(unittest.TestCase):
+
+    def test_email_address(self):
+        self.assertEqual(lookup.is_email_address_query(r'user@example\.com'),
+                         'user@example.com')
+
+    def test_domain(self):
+        self.assertEqual(lookup.is_email_address_query(r'@example\.com'),
+                         '@example.com')
+
+    def test_other_queries(self):
+        self.assertIsNone(lookup.is_email_address_query('user'))
+        self.assertIsNone(lookup.is_email_address_query('user@'))
+        self.assertIsNone(lookup.is_email_address_query('a.*b@c.de'))
+
+
+class EmailAddressIndexLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.index = lookup.EmailAddressIndex()
+        self.alice = mock.Mock(emails={'work': ['Alice@Example.com'],
+                                       'home': ['alice@other.org']})
+        self.bob = mock.Mock(emails={'home': ['bob@example.com']})
+        self.index.add_contact(self.alice)
+        self.index.add_contact(self.bob)
+
+    def test_lookup_is_case_insensitive(self):
+        self.assertEqual(self.index.lookup('alice@EXAMPLE.com'),
+                         [(self.alice, 'work', 'Alice@Example.com')])
+
+    def test_lookup_domain(self):
+        self.assertEqual(len(self.index.lookup('@example.com')), 2)
+
+    def test_lookup_finds_addresses_containing_the_query(self):
+        banjo = mock.Mock(emails={'work': ['banjo@example.com'],
+                                  'home': ['jo@example.com.au']})
+        self.index.add_contact(banjo)
+        self.assertEqual(self.index.lookup('jo@example.com'),
+                         [(banjo, 'work', 'banjo@example.com'),
+                          (banjo, 'home', 'jo@example.com.au')])
+        self.assertEqual(len(self.index.lookup('@example.com')), 4)
+
+    def test_contains(self):
+        self.assertIn('bob@example.com', self.index)
+        self.assertNotIn('carol@example.com', self.index)
+
+    def test_removed_contacts_are_not_found(self):
+        self.index.remove_contact(self.alice)
+        self.assertEqual(self.index.lookup('@example.com'),
+                         [(self.bob, 'home', 'bob@example.com')])
+        self.assertEqual(self.index.lookup('alice@other.org'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""Tests for the profiling helpers and the import time of khard."""
+
+import io
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from khard import profiling
+
+
+class RemoveGlobalFlag(unittest.TestCase):
+
+    def test_flag_is_removed(self):
+        self.assertEqual(
+            profiling.remove_global_flag(['--debug', '--startup-profile',
+                                          'list'], '--startup-profile'),
+            (True, ['--debug', 'list']))
+
+    def test_config_value_is_skipped(self):
+        self.assertEqual(
+            profiling.remove_global_flag(['-c', '--startup-profile', 'ls'],
+                                         '--startup-profile'),
+            (False, ['-c', '--startup-profile', 'ls']))
+
+    def test_options_of_subcommands_are_ignored(self):
+        self.assertEqual(
+            profiling.remove_global_flag(['ls', '--startup-profile'],
+                                         '--startup-profile'),
+            (False, ['ls', '--startup-profile']))
+
+
+class RemoveGlobalOption(unittest.TestCase):
+
+    def test_option_and_value_are_removed(self):
+        self.assertEqual(
+            profiling.remove_global_option(['-c', 'conf', '--profile', 'out',
+                                            'list'], '--profile'),
+            ('out', ['-c', 'conf', 'list']))
+
+    def test_value_can_be_given_with_equals_sign(self):
+        self.assertEqual(
+            profiling.remove_global_option(['--profile=out', 'list'],
+                                           '--profile'),
+            ('out', ['list']))
+
+    def test_missing_value_is_left_for_the_parser(self):
+        self.assertEqual(
+            profiling.remove_global_option(['--profile'], '--profile'),
+            (None, ['--profile']))
+
+    def test_options_of_subcommands_are_ignored(self):
+        self.assertEqual(
+            profiling.remove_global_option(['ls', '--profile', 'out'],
+                                           '--profile'),
+            (None, ['ls', '--profile', 'out']))
+
+    def test_value_is_not_taken_for_a_flag(self):
+        self.assertEqual(
+            profiling.remove_global_flag(['--profile', '--startup-profile',
+                                          'ls'], '--startup-profile'),
+            (False, ['--profile', '--startup-profile', 'ls']))
+
+
+class Profile(unittest.TestCase):
+
+    def test_statistics_are_written_when_the_function_exits(self):
+        def function():
+            sys.exit(3)
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'khard.prof')
+            with mock.patch('sys.stderr', io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit):
+                    profiling.profile(function, filename)
+            stats = pstats.Stats(filename)
+        self.assertIn('Profile written to ' + filename, stderr.getvalue())
+        self.assertIn('function', stderr.getvalue())
+        self.assertTrue(any(name == 'function'
+                            for _, _, name in stats.stats))
+
+
+class ParseImportTimes(unittest.TestCase):
+
+    output = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       100 |        100 |     vobject.base\n"
+              "some other output\n"
+              "import time:        50 |        150 |   vobject\n"
+              "import time:        20 |        170 | khard.khard\n")
+
+    def test_imports_and_other_output_are_separated(self):
+        imports, other = profiling.parse_import_times(self.output)
+        self.assertEqual(imports, [('vobject.base', 100, 100, 2),
+                                   ('vobject', 50, 150, 1),
+                                   ('khard.khard', 20, 170, 0)])
+        self.assertEqual(other, "some other output\n")
+
+    def test_times_are_summed_by_package(self):
+        imports, _ = profiling.parse_import_times(self.output)
+        self.assertEqual(profiling.import_times_by_package(imports),
+                         [('vobject', 150), ('khard', 20)])
+
+
+class LazyImports(unittest.TestCase):
+
+    def test_slow_modules_are_not_imported_at_start_up(self):
+        slow = ['configobj', 'distutils', 'email.policy', 'ruamel.yaml',
+                'unidecode', 'vobject']
+        code = ('import sys, khard.khard; print(" ".join(m for m in {!r} '
+                'if m in sys.modules))'.format(slow))
+        output = subprocess.check_output([sys.executable, '-c', code],
+                                         universal_newlines=True)
+        self.assertEqual(output.strip(), '')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+"""Tests for the search query language."""
+
+import os
+import tempfile
+import unittest
+
+from khard import address_book
+from khard import query
+from khard import search_index
+
+from .helpers import TmpVdir
+
+
+_VCARD = """BEGIN:VCARD
+VERSION:3.0
+FN:Alice Smith
+N:Smith;Alice;;;
+UID:alice
+ORG:Acme;Research
+CATEGORIES:work,friends
+TEL;TYPE=cell:+49 (30) 1234-567
+EMAIL:alice@acme.org
+END:VCARD
+"""
+
+
+def _load_contact():
+    with tempfile.TemporaryDirectory() as path:
+        with open(os.path.join(path, 'alice.vcf'), 'w') as fh:
+            fh.write(_VCARD)
+        abook = address_book.VdirAddressBook('test', path)
+        abook.load()
+    return abook.contacts['alice']
+
+
+class Parse(unittest.TestCase):
+
+    def _assert_parsed(self, text, expected, default_field=None):
+        self.assertEqual(str(query.parse(text, default_field)), expected)
+
+    def test_empty_query_matches_all(self):
+        self.assertIsInstance(query.parse([]), query.All)
+        self.assertIsInstance(query.parse(''), query.All)
+
+    def test_terms_are_joined_with_and(self):
+        self._assert_parsed(['foo', 'bar'], '(foo AND bar)')
+        self._assert_parsed('foo AND bar', '(foo AND bar)')
+
+    def test_and_binds_stronger_than_or(self):
+        self._assert_parsed('a b OR c', '((a AND b) OR c)')
+        self._assert_parsed('a (b OR c)', '(a AND (b OR c))')
+
+    def test_not(self):
+        self._assert_parsed('a NOT b', '(a AND NOT b)')
+        self._assert_parsed('NOT (a OR b)', 'NOT (a OR b)')
+
+    def test_lower_case_operators_are_terms(self):
+        self._assert_parsed('a or b', '(a AND or AND b)')
+
+    def test_fields(self):
+        self._assert_parsed('name:foo EMAIL:bar', '(name:foo AND email:bar)')
+
+    def test_unknown_fields_are_part_of_the_term(self):
+        self._assert_parsed('foo:bar', 'foo:bar')
+
+    def test_quoted_phrases(self):
+        query_ = query.parse('name:"foo bar" "OR"')
+        self.assertEqual([term.text for term in query_.terms()],
+                         ['foo bar', 'OR'])
+        self.assertEqual(query_.queries[0].field, 'name')
+
+    def test_quotes_inside_words_are_part_of_the_term(self):
+        self._assert_parsed('foo"bar', 'foo"bar')
+        self._assert_parsed('foo"bar "a b"', '(foo"bar AND "a b")')
+
+    def test_parentheses_are_split_from_words(self):
+        self._assert_parsed('(a OR b) (c)', '((a OR b) AND c)')
+
+    def test_default_field(self):
+        self._assert_parsed('foo email:bar', '(name:foo AND email:bar)',
+                            default_field='name')
+
+    def test_syntax_errors(self):
+        for text in ['"foo', '(foo', 'foo)', 'foo OR', 'NOT', 'name:)']:
+            with self.subTest(text=text):
+                with self.assertRaises(query.QueryError):
+                    query.parse(text)
+
+
+class Matches(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.contact = _load_contact()
+
+    def _assert_matches(self, text, expected=True):
+        self.assertEqual(query.parse(text).matches(self.contact), expected)
+
+    def test_terms_without_field_search_everything(self):
+        self._assert_matches('smith')
+        self._assert_matches('research')
+        self._assert_matches('bob', False)
+
+    def test_phone_numbers_are_found_without_special_characters(self):
+        self._assert_matches('301234567')
+        self._assert_matches('phone:301234567')
+        self._assert_matches('phone:1234-567')
+        self._assert_matches('phone:99', False)
+
+    def test_fields_are_searched_separately(self):
+        self._assert_matches('name:alice')
+        self._assert_matches('name:acme', False)
+        self._assert_matches('email:acme.org')
+        self._assert_matches('org:"acme, research"')
+        self._assert_matches('cat:friends')
+        self._assert_matches('cat:alice', False)
+
+    def test_uids_are_matched_by_prefix(self):
+        self._assert_matches('uid:ali')
+        self._assert_matches('uid:lice', False)
+
+    def test_boolean_operators(self):
+        self._assert_matches('alice NOT bob')
+        self._assert_matches('bob OR cat:work')
+        self._assert_matches('alice bob', False)
+        self._assert_matches('NOT org:acme', False)
+
+
+class Candidates(unittest.TestCase):
+
+    index = {'a': {'1', '2'}, 'b': {'2', '3'}}
+
+    def _candidates(self, text):
+        return query.parse(text).candidates(
+            lambda term: self.index.get(term.text))
+
+    def test_and_intersects_known_candidates(self):
+        self.assertEqual(self._candidates('a b'), {'2'})
+        self.assertEqual(self._candidates('a unknown'), {'1', '2'})
+        self.assertEqual(self._candidates('a NOT b'), {'1', '2'})
+
+    def test_or_needs_candidates_for_all_subqueries(self):
+        self.assertEqual(self._candidates('a OR b'), {'1', '2', '3'})
+        self.assertIsNone(self._candidates('a OR unknown'))
+
+    def test_negation_needs_all_contacts(self):
+        self.assertIsNone(self._candidates('NOT a'))
+        self.assertIsNone(self._candidates(''))
+
+
+class MayMatchSource(unittest.TestCase):
+
+    def _assert_may_match(self, text, expected=True):
+        self.assertEqual(query.parse(text).may_match_source(_VCARD), expected)
+
+    def test_all_contacts_that_match_pass(self):
+        contact = _load_contact()
+        for text in ['alice', 'name:"alice smith"', 'phone:301234567',
+                     '301234567', 'org:"acme, research"', 'cat:friends',
+                     'uid:ali', 'NOT bob', 'bob OR alice']:
+            with self.subTest(text=text):
+                self.assertTrue(query.parse(text).matches(contact))
+                self._assert_may_match(text)
+
+    def test_files_without_the_terms_are_filtered(self):
+        self._assert_may_match('bob', False)
+        self._assert_may_match('alice bob', False)
+        self._assert_may_match('phone:999', False)
+
+    def test_regular_expressions_are_still_supported(self):
+        self.assertTrue(query.source_filter('ali.*smith')(_VCARD))
+        self.assertFalse(query.source_filter('smith.*bob')(_VCARD))
+
+
+class Regex(unittest.TestCase):
+
+    def test_regex_matches_the_terms_that_are_not_negated(self):
+        self.assertEqual(query.parse('a.b OR (c NOT d)').regex(), r'a\.b|c')
+
+    def test_terms_joined_with_and_keep_their_order(self):
+        self.assertEqual(query.parse('smith alice').regex(), 'smith.*alice')
+        self.assertEqual(query.parse('(a OR b) c NOT d').regex(),
+                         '(?:a|b).*c')
+
+    def test_regex_matches_everything_without_terms(self):
+        self.assertEqual(query.parse('').regex(), '.*')
+        self.assertEqual(query.parse('NOT a').regex(), '.*')
+
+
+class PlainTerms(unittest.TestCase):
+
+    def test_terms_joined_with_and(self):
+        self.assertEqual(query.plain_terms(query.parse('+49 30')),
+                         ['+49', '30'])
+
+    def test_allowed_fields(self):
+        self.assertIsNone(query.plain_terms(query.parse('phone:30')))
+        self.assertEqual(
+            query.plain_terms(query.parse('phone:30'), (None, 'phone')),
+            ['30'])
+
+    def test_other_queries(self):
+        self.assertIsNone(query.plain_terms(query.parse('a OR b')))
+        self.assertIsNone(query.plain_terms(query.parse('NOT a')))
+        self.assertIsNone(query.plain_terms(query.parse('')))
+
+
+class AddressBookSearch(TmpVdir, unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        with open(os.path.join(self.vdir, 'alice.vcf'), 'w') as fh:
+            fh.write(_VCARD)
+
+    def _search(self, text, **kwargs):
+        abook = address_book.VdirAddressBook('test', self.vdir, **kwargs)
+        return sorted(c.uid for c in abook.search(query.parse(text)))
+
+    def test_search_with_query(self):
+        self.assertEqual(self._search('contact NOT second'), ['testuid2'])
+        self.assertEqual(self._search('uid:testuid'),
+                         ['testuid1', 'testuid2', 'testuid3'])
+        self.assertEqual(self._search('email:example OR org:acme'),
+                         ['alice', 'testuid1'])
+
+    def test_source_files_are_filtered_when_loading(self):
+        abook = address_book.VdirAddressBook('test', self.vdir)
+        abook.load(query.parse('name:third OR phone:301234567'),
+                   search_in_source_files=True)
+        self.assertEqual(sorted(abook.contacts), ['alice', 'testuid2'])
+
+    @unittest.skipUnless(search_index.SearchIndex.available(),
+                         "sqlite does not support FTS5 with trigrams")
+    def test_search_index_gives_the_same_results(self):
+        for text in ['contact NOT second', 'name:contact', 'email:example',
+                     'phone:301234567', 'phone:1234-567', '301234567',
+                     'org:"acme, research"', 'cat:friends', 'uid:test',
+                     'birthday OR (third AND contact)', 'ir', 'NOT th']:
+            with self.subTest(text=text):
+                self.assertEqual(self._search(text, use_search_index=True),
+                                 self._search(text))
+
+    @unittest.skipUnless(search_index.SearchIndex.available(),
+                         "sqlite does not support FTS5 with trigrams")
+    def test_search_index_limits_the_checked_contacts(self):
+        abook = address_book.VdirAddressBook('test', self.vdir,
+                                             use_search_index=True)
+        abook.load()
+        self.assertEqual(
+            query.parse('name:third OR email:acme').candidates(
+                abook._term_candidates), {'alice', 'testuid2'})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Tests for the full text search index."""
+
+import os
+import unittest
+
+from khard import address_book
+from khard import search_index
+
+from .helpers import TmpVdir
+
+
+class LiteralTerms(unittest.TestCase):
+
+    def test_single_term(self):
+        self.assertEqual(search_index.literal_terms('foo'), ['foo'])
+
+    def test_terms_joined_by_dot_star(self):
+        self.assertEqual(search_index.literal_terms('foo.*bar'),
+                         ['foo', 'bar'])
+
+    def test_escaped_characters_are_unescaped(self):
+        self.assertEqual(search_index.literal_terms(r'a\.b\+c\ d'),
+                         ['a.b+c d'])
+
+    def test_match_all_query_has_no_terms(self):
+        self.assertEqual(search_index.literal_terms('.*'), [])
+        self.assertEqual(search_index.literal_terms(''), [])
+
+    def test_regex_syntax_returns_none(self):
+        self.assertIsNone(search_index.literal_terms('fo+'))
+        self.assertIsNone(search_index.literal_terms('^.*(foo).*$'))
+        self.assertIsNone(search_index.literal_terms(r'\d'))
+
+
+@unittest.skipUnless(search_index.SearchIndex.available(),
+                     "sqlite does not support FTS5 with trigrams")
+class IndexedSearch(TmpVdir, unittest.TestCase):
+
+    def _search(self, query, method, **kwargs):
+        abook = address_book.VdirAddressBook('test', self.vdir, **kwargs)
+        return sorted(c.uid for c in abook.search(query, method=method))
+
+    def _assert_same_results(self, query, method="all"):
+        expected = self._search(query, method)
+        actual = self._search(query, method, use_search_index=True)
+        self.assertEqual(actual, expected)
+        return actual
+
+    def test_search_all_with_index(self):
+        self.assertEqual(self._assert_same_results('example'), ['testuid1'])
+
+    def test_search_all_with_several_terms(self):
+        self.assertEqual(self._assert_same_results('second.*example'),
+                         ['testuid1'])
+        self.assertEqual(self._assert_same_results('example.*second'), [])
+
+    def test_search_phone_number_with_special_chars(self):
+        with open(os.path.join(self.vdir, 'contact2.vcf'), 'w') as fh:
+            fh.write('BEGIN:VCARD\nVERSION:4.0\nFN:third contact\n'
+                     'UID:testuid2\nTEL:+49 (30) 1234\nEND:VCARD\n')
+        self.assertEqual(self._assert_same_results('49301234'), ['testuid2'])
+
+    def test_search_names_with_index(self):
+        self.assertEqual(self._assert_same_results('contact', 'name'),
+                         ['testuid1', 'testuid2'])
+
+    def test_short_terms_and_regexes_fall_back_to_scanning(self):
+        self._assert_same_results('ir')
+        self._assert_same_results('th.rd')
+
+    def test_index_is_not_used_for_unchanged_contacts_again(self):
+        self._search('foo', 'all', use_search_index=True)
+        abook = address_book.VdirAddressBook('test', self.vdir,
+                                             use_search_index=True)
+        abook.load()
+        self.assertEqual(abook.search_index.update(
+            abook.contacts.values(), abook._stats, True), 0)
+
+    def test_index_is_updated_for_changed_contacts(self):
+        self._search('foo', 'all', use_search_index=True)
+        with open(os.path.join(self.vdir, 'contact2.vcf'), 'w') as fh:
+            fh.write('BEGIN:VCARD\nVERSION:4.0\nFN:changed contact\n'
+                     'UID:testuid2\nEND:VCARD\n')
+        self.assertEqual(self._assert_same_results('changed'), ['testuid2'])
+        self.assertEqual(self._assert_same_results('third'), [])
+
+    def test_index_is_updated_incrementally(self):
+        abook = address_book.VdirAddressBook('test', self.vdir,
+                                             use_search_index=True)
+        abook.load()
+        filename = os.path.join(self.vdir, 'contact2.vcf')
+        with open(filename, 'w') as fh:
+            fh.write('BEGIN:VCARD\nVERSION:4.0\nFN:changed contact\n'
+                     'UID:testuid2\nEND:VCARD\n')
+        abook.update_files([filename])
+        self.assertEqual(abook.search_index.update(
+            abook.contacts.values(), abook._stats, True), 0)
+        self.assertEqual(abook.search_index.candidates(['changed'], ['name']),
+                         {'testuid2'})
+
+
+if __name__ == "__main__":
+    unittest.main()
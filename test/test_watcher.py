@@ -0,0 +1,79 @@
+"""Tests for the watchers of vdir address books."""
+
+import os
+import shutil
+import unittest
+
+from khard import watcher
+
+from .helpers import TmpVdir
+
+
+class _Watcher(TmpVdir):
+    """Tests that every watcher has to pass."""
+
+    def setUp(self):
+        super().setUp()
+        self.watcher = self.create([self.vdir])
+
+    def tearDown(self):
+        self.watcher.close()
+
+    def _write(self, name, text='BEGIN:VCARD\nEND:VCARD\n'):
+        path = os.path.join(self.vdir, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.changes(), {})
+
+    def test_new_and_removed_files(self):
+        new = self._write('new.vcf')
+        removed = os.path.join(self.vdir, 'contact1.vcf')
+        os.remove(removed)
+        self.assertEqual(self.watcher.changes(), {self.vdir: {new, removed}})
+        self.assertEqual(self.watcher.changes(), {})
+
+    def test_changed_files(self):
+        path = self._write('contact2.vcf', 'changed contents')
+        self.assertEqual(self.watcher.changes(), {self.vdir: {path}})
+
+    def test_renamed_files(self):
+        old = os.path.join(self.vdir, 'contact1.vcf')
+        new = os.path.join(self.vdir, 'renamed.vcf')
+        os.rename(old, new)
+        self.assertEqual(self.watcher.changes(), {self.vdir: {old, new}})
+
+    def test_other_files_are_ignored(self):
+        self._write('.hidden.vcf')
+        self._write('notes.txt')
+        self.assertEqual(self.watcher.changes(), {})
+
+    def test_removed_directory(self):
+        shutil.rmtree(self.vdir)
+        self.assertEqual(self.watcher.changes(), {self.vdir: None})
+
+
+class PollingWatcher(_Watcher, unittest.TestCase):
+
+    def create(self, paths):
+        return watcher.PollingWatcher(paths)
+
+
+class InotifyWatcher(_Watcher, unittest.TestCase):
+
+    def create(self, paths):
+        try:
+            return watcher.InotifyWatcher(paths)
+        except OSError as err:
+            self.skipTest('inotify is not available: {}'.format(err))
+
+    def test_lost_events_cause_a_full_reload(self):
+        self.watcher._read = lambda: watcher.InotifyWatcher._event.pack(
+            -1, watcher.InotifyWatcher.IN_Q_OVERFLOW, 0, 0)
+        self.assertEqual(self.watcher.changes(), {self.vdir: None})
+
+
+if __name__ == "__main__":
+    unittest.main()